@@ -121,17 +121,38 @@ environment variables:
 
    HTTPS proxy, in the form 'protocol://hostname:port'
 
+Each process keeps its connections to the API server and to storage
+endpoints open for reuse. The number of connections kept per host is
+sized automatically from the thread pools in use (see
+:func:`dxpy.reserve_connection_pool_capacity`), and can be overridden
+with :func:`dxpy.set_connection_pool_options` or the following
+environment variables:
+
+.. envvar:: DX_CONNECTION_POOL_SIZE
+
+   Maximum number of connections to keep open to each host
+
+.. envvar:: DX_CONNECTION_POOL_BLOCK
+
+   If set to "1", a request that finds all connections to its host in
+   use waits for one to be released, instead of opening an extra
+   connection that is closed (rather than reused) afterwards
+
+:func:`dxpy.get_connection_pool_stats` reports how often requests
+reused an open connection.
+
 '''
 
 from __future__ import (print_function, unicode_literals)
 
-import os, sys, json, time, logging, platform, collections, ssl, traceback
+import os, sys, json, time, logging, platform, collections, ssl, traceback, threading
 import errno
 import requests
 import socket
 
 from requests.exceptions import ConnectionError, HTTPError, Timeout
 from requests.auth import AuthBase
+from requests.adapters import HTTPAdapter
 from .compat import USING_PYTHON2, expanduser
 
 logger = logging.getLogger(__name__)
@@ -172,11 +193,199 @@ APISERVER_PROTOCOL = DEFAULT_APISERVER_PROTOCOL
 APISERVER_HOST = DEFAULT_APISERVER_HOST
 APISERVER_PORT = DEFAULT_APISERVER_PORT
 
-SESSION_HANDLERS = collections.defaultdict(requests.session)
+DEFAULT_CONNECTION_POOL_SIZE = 10
+
+_connection_pool_lock = threading.Lock()
+_connection_pool_options = {"pool_maxsize": None, "pool_block": False}
+_connection_pool_capacity = 0
+# Connection pools handed out to requests, whose counters are reported
+# by get_connection_pool_stats, and the totals of pools since closed
+_connection_pools = []
+_closed_connection_pool_stats = {"requests": 0, "misses": 0}
+
+if os.environ.get('DX_CONNECTION_POOL_SIZE'):
+    try:
+        _connection_pool_options["pool_maxsize"] = int(os.environ['DX_CONNECTION_POOL_SIZE'])
+    except ValueError:
+        print("WARNING: Expected DX_CONNECTION_POOL_SIZE to be an integer, but got",
+              os.environ['DX_CONNECTION_POOL_SIZE'], file=sys.stderr)
+_connection_pool_options["pool_block"] = os.environ.get('DX_CONNECTION_POOL_BLOCK') == '1'
+
+
+def _get_connection_pool_maxsize():
+    if _connection_pool_options["pool_maxsize"] is not None:
+        return _connection_pool_options["pool_maxsize"]
+    # One connection for each thread that may be making a request, plus
+    # one for the main thread
+    return max(DEFAULT_CONNECTION_POOL_SIZE, _connection_pool_capacity + 1)
+
+
+def _retire_closed_connection_pools():
+    # Must be called with _connection_pool_lock held. A pool's "pool"
+    # attribute is set to None when it is closed (e.g. when the pool
+    # manager evicts it).
+    for pool in [pool for pool in _connection_pools if pool.pool is None]:
+        _closed_connection_pool_stats["requests"] += pool.num_requests
+        _closed_connection_pool_stats["misses"] += pool.num_connections
+        _connection_pools.remove(pool)
+
+
+class _DXHTTPAdapter(HTTPAdapter):
+    '''
+    HTTPAdapter that registers the connection pools it uses, so that
+    their request and connection counters can be reported, and whose
+    pool size can be raised for the pools it creates from then on.
+    '''
+    def get_connection(self, *args, **kwargs):
+        pool = HTTPAdapter.get_connection(self, *args, **kwargs)
+        with _connection_pool_lock:
+            if not any(registered is pool for registered in _connection_pools):
+                _retire_closed_connection_pools()
+                _connection_pools.append(pool)
+        return pool
+
+    def grow_pool_maxsize(self, maxsize):
+        '''
+        Raises the size of the connection pools created after this call
+        to *maxsize*. Existing pools, and the connections they keep
+        open, are left as they are.
+        '''
+        if maxsize <= self._pool_maxsize:
+            return
+        self._pool_maxsize = maxsize
+        for manager in [self.poolmanager] + list(self.proxy_manager.values()):
+            manager.connection_pool_kw["maxsize"] = maxsize
+
+    def close(self):
+        HTTPAdapter.close(self)
+        for manager in self.proxy_manager.values():
+            manager.clear()
+
+
+def _mount_adapters(session):
+    for prefix in ('http://', 'https://'):
+        session.mount(prefix, _DXHTTPAdapter(pool_maxsize=_get_connection_pool_maxsize(),
+                                             pool_block=_connection_pool_options["pool_block"]))
+
+
+def _new_session():
+    session = requests.Session()
+    _mount_adapters(session)
+    return session
+
+
+def set_connection_pool_options(pool_maxsize=None, pool_block=None):
+    '''
+    :param pool_maxsize: Maximum number of connections to keep open to each host, or None to size the pools automatically
+    :type pool_maxsize: int or None
+    :param pool_block: If True, a request that finds all connections to its host in use waits for one to be released instead of opening an extra connection that is closed afterwards (unchanged if None)
+    :type pool_block: boolean or None
+
+    Configures the connection pools of the sessions used by
+    :func:`DXHTTPRequest`. The pools are replaced, so open connections
+    are dropped; call this before making requests.
+    '''
+    with _connection_pool_lock:
+        _connection_pool_options["pool_maxsize"] = pool_maxsize
+        if pool_block is not None:
+            _connection_pool_options["pool_block"] = pool_block
+        for session in list(SESSION_HANDLERS.values()):
+            for adapter in set(session.adapters.values()):
+                adapter.close()
+            _mount_adapters(session)
+
+
+def reserve_connection_pool_capacity(num_connections):
+    '''
+    :param num_connections: Number of additional requests that may be made concurrently
+    :type num_connections: int
+
+    Grows the automatically sized connection pools so that
+    *num_connections* more requests can run at once, each on a
+    connection that is kept open for reuse. Thread pools created with
+    :func:`dxpy.utils.get_futures_threadpool` call this for their
+    workers, and release the capacity when they are shut down.
+
+    The larger size applies to the pools created afterwards (one is
+    created for each host the first time a request is made to it).
+    Pools already in use keep their size and their open connections.
+    '''
+    global _connection_pool_capacity
+    with _connection_pool_lock:
+        _connection_pool_capacity += num_connections
+        maxsize = _get_connection_pool_maxsize()
+        for session in list(SESSION_HANDLERS.values()):
+            for adapter in set(session.adapters.values()):
+                if isinstance(adapter, _DXHTTPAdapter):
+                    adapter.grow_pool_maxsize(maxsize)
+
+
+def release_connection_pool_capacity(num_connections):
+    '''
+    :param num_connections: Number of connections reserved with :func:`reserve_connection_pool_capacity` that are no longer needed
+    :type num_connections: int
+
+    Gives back capacity reserved for requests that will no longer be
+    made, so that the pools created afterwards are sized only for the
+    reservations still held. Pools already in use keep their size.
+    '''
+    global _connection_pool_capacity
+    with _connection_pool_lock:
+        _connection_pool_capacity = max(0, _connection_pool_capacity - num_connections)
+
+
+def get_connection_pool_stats():
+    '''
+    :returns: Counts of "requests" made on pooled connections, "misses" (a new connection was opened), and "hits" (an open connection was reused)
+    :rtype: dict
+    '''
+    with _connection_pool_lock:
+        _retire_closed_connection_pools()
+        stats = dict(_closed_connection_pool_stats)
+        for pool in _connection_pools:
+            stats["requests"] += pool.num_requests
+            stats["misses"] += pool.num_connections
+    stats["hits"] = max(0, stats["requests"] - stats["misses"])
+    return stats
+
+
+SESSION_HANDLERS = collections.defaultdict(_new_session)
 
 DEFAULT_RETRIES = 6
 DEFAULT_TIMEOUT = 600
 DEFAULT_RETRY_AFTER_503_INTERVAL = 60
+# Size of the pieces in which responses requested with stream_json_array
+# are read and parsed
+STREAMED_RESPONSE_CHUNK_SIZE = 64 * 1024
+
+from .utils.retry_coordinator import RetryCoordinator
+from .utils.json_stream import JSONObjectStream
+from .utils import json_codec
+_retry_coordinator = RetryCoordinator(max_delay=DEFAULT_TIMEOUT)
+
+def set_retry_coordinator(coordinator, session_handler=None):
+    '''
+    :param coordinator: Policy for waiting between and limiting retries
+    :type coordinator: :class:`~dxpy.utils.retry_coordinator.RetryCoordinator`
+    :param session_handler: Session whose requests should use *coordinator*, or None to set the default used by all sessions that have not been given their own
+    :type session_handler: :class:`requests.Session`
+
+    Sets the retry policy of :func:`DXHTTPRequest`. By default all
+    requests made by the process share one retry budget and one set of
+    per-host circuit breakers.
+    '''
+    global _retry_coordinator
+    if session_handler is None:
+        _retry_coordinator = coordinator
+    else:
+        session_handler._dx_retry_coordinator = coordinator
+
+def get_retry_coordinator(session_handler=None):
+    '''
+    :returns: The retry policy used for requests made with *session_handler* (or by default, if None)
+    :rtype: :class:`~dxpy.utils.retry_coordinator.RetryCoordinator`
+    '''
+    return getattr(session_handler, '_dx_retry_coordinator', None) or _retry_coordinator
 
 _DEBUG = 0  # debug verbosity level
 _UPGRADE_NOTIFY = True
@@ -266,11 +475,86 @@ def _extract_retry_after_timeout(response):
     return max(1, seconds_to_wait)
 
 
+_request_hooks = []
+
+def add_request_hook(hook):
+    '''
+    :param hook: Callable that accepts a single dict argument
+
+    Registers *hook* to be called after every :func:`DXHTTPRequest`
+    completes (successfully or not, and including all of its retries)
+    with a dict describing the request:
+
+    * "method": HTTP method
+    * "route": API server route (e.g. "/file-xxxx/describe"), or the scheme and host of a fully qualified URL
+    * "status": HTTP status code of the last response received, or None
+    * "bytes_sent", "bytes_received": Sizes of the last request and response bodies, or None if not known
+    * "seconds": Total time taken, including retries and waits
+    * "retries": Number of retries performed
+    * "wait_503_seconds": Time spent waiting after 503 (Service Unavailable) responses
+    * "encode_seconds", "decode_seconds": Time spent serializing the request to JSON and parsing the response from JSON
+    * "error": The exception raised, or None
+
+    Hooks are called from the thread that made the request; exceptions
+    they raise are logged and otherwise ignored.
+    '''
+    _request_hooks.append(hook)
+
+def remove_request_hook(hook):
+    '''
+    Unregisters a hook added with :func:`add_request_hook`.
+    '''
+    _request_hooks.remove(hook)
+
+def _new_request_record(method, route):
+    return {"method": method, "route": route, "status": None, "bytes_sent": None, "bytes_received": None,
+            "seconds": None, "retries": 0, "wait_503_seconds": 0, "encode_seconds": 0.0, "decode_seconds": 0.0,
+            "error": None}
+
+def _report_request(request_record, start_time, try_index, data, response, error=None):
+    if not _request_hooks:
+        return
+    request_record["seconds"] = time.time() - start_time
+    request_record["retries"] = try_index
+    request_record["error"] = error
+    try:
+        request_record["bytes_sent"] = len(data)
+    except TypeError:
+        pass
+    if response is not None:
+        request_record["status"] = response.status_code
+        if response.headers.get('content-length') is not None:
+            request_record["bytes_received"] = int(response.headers['content-length'])
+    for hook in list(_request_hooks):
+        try:
+            hook(request_record)
+        except Exception:
+            logger.exception("Error in request hook %r", hook)
+
+def _iterate_streamed_response(response, request_record, start_time, try_index, data):
+    num_bytes, error = 0, None
+    try:
+        for chunk in response.iter_content(chunk_size=STREAMED_RESPONSE_CHUNK_SIZE):
+            num_bytes += len(chunk)
+            yield chunk
+        if 'content-length' in response.headers and int(response.headers['content-length']) != num_bytes:
+            raise exceptions.ContentLengthError(
+                "Received response with content-length header set to %s but content length is %d" %
+                (response.headers['content-length'], num_bytes)
+            )
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        response.close()
+        request_record["bytes_received"] = num_bytes
+        _report_request(request_record, start_time, try_index, data, response, error=error)
+
 def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
                   timeout=DEFAULT_TIMEOUT,
                   use_compression=None, jsonify_data=True, want_full_response=False,
                   decode_response_body=True, prepend_srv=True, session_handler=None,
-                  max_retries=DEFAULT_RETRIES, always_retry=False, **kwargs):
+                  max_retries=DEFAULT_RETRIES, always_retry=False, stream_json_array=None, **kwargs):
     '''
     :param resource: API server route, e.g. "/record/new". If *prepend_srv* is False, a fully qualified URL is expected. If this argument is a callable, it will be called just before each request attempt, and expected to return a tuple (URL, headers). Headers returned by the callback are updated with *headers* (including headers set by this method).
     :type resource: string
@@ -301,12 +585,16 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
                         - A response is received from the server, the "Content-Length" header is not set, and the response JSON cannot be parsed.
                         - No response is received from the server, and either *always_retry* is True or the request *method* is "GET".
 
+                        Retries are also subject to the retry budget of the session (see :func:`set_retry_coordinator`).
+
     :type max_retries: int
     :param always_retry: If True, indicates that it is safe to retry a request on failure
 
                         - Note: It is not guaranteed that the request will *always* be retried on failure; rather, this is an indication to the function that it would be safe to do so.
 
     :type always_retry: boolean
+    :param stream_json_array: Name of a top-level field of the JSON response whose value is an array. If given (and *want_full_response* is False and *decode_response_body* is True), the response body is parsed incrementally as it arrives, and a :class:`~dxpy.utils.json_stream.JSONObjectStream` yielding the elements of that array is returned as soon as the response headers have been received. Errors that occur while the body is being read are raised during iteration and are not retried.
+    :type stream_json_array: string
     :returns: Response from API server in the format indicated by *want_full_response* and *decode_response_body*.
     :raises: :exc:`exceptions.DXAPIError` or a subclass if the server returned a non-200 status code; :exc:`requests.exceptions.HTTPError` if an invalid response was received from the server; or :exc:`requests.exceptions.ConnectionError` if a connection cannot be established.
 
@@ -329,6 +617,8 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
 
     url = APISERVER + resource if prepend_srv else resource
     method = method.upper() # Convert method name to uppercase, to ease string comparisons later
+    start_time = time.time()
+    request_record = _new_request_record(method, resource if prepend_srv else None)
     if _DEBUG >= 3:
         print(method, url, "=>\n" + json.dumps(data, indent=2), file=sys.stderr)
     elif _DEBUG == 2:
@@ -348,7 +638,9 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
             urllib3.disable_warnings()
 
     if jsonify_data:
-        data = json.dumps(data)
+        encode_start_time = time.time()
+        data = json_codec.dumps_bytes(data)
+        request_record["encode_seconds"] = time.time() - encode_start_time
         if 'Content-Type' not in headers and method == 'POST':
             headers['Content-Type'] = 'application/json'
 
@@ -363,12 +655,29 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
     if hasattr(data, 'seek') and hasattr(data, 'tell'):
         rewind_input_buffer_offset = data.tell()
 
+    stream_response = stream_json_array is not None and decode_response_body and not want_full_response
+    if stream_response:
+        kwargs['stream'] = True
+
+    retry_coordinator = get_retry_coordinator(session_handler)
     try_index = 0
+    retry_delay = None
     while True:
         success, streaming_response_truncated = True, False
         response = None
         try:
             _method, _url, _headers = _process_method_url_headers(method, url, headers)
+            host = '/'.join(_url.split('/')[:3])
+            if not prepend_srv:
+                # Only the host of a fully qualified URL (e.g. a storage
+                # endpoint) is meaningful for aggregation
+                request_record["route"] = host
+            circuit_wait = retry_coordinator.get_circuit_wait(host)
+            if circuit_wait > 0:
+                logger.warn("%s %s: Waiting %d seconds for the server to become available...", method, url,
+                            circuit_wait)
+                time.sleep(circuit_wait)
+                request_record["wait_503_seconds"] += circuit_wait
             response = session_handler.request(_method, _url, headers=_headers, data=data,
                                                timeout=timeout, auth=auth, **kwargs)
 
@@ -386,7 +695,7 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
             if response.status_code // 100 != 2:
                 # response.headers key lookup is case-insensitive
                 if response.headers.get('content-type', '').startswith('application/json'):
-                    content = json.loads(response.content.decode('utf-8'))
+                    content = json_codec.loads(response.content)
                     try:
                         error_class = getattr(exceptions, content["error"]["type"], exceptions.DXAPIError)
                     except Exception:
@@ -396,7 +705,13 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
                 response.raise_for_status()
 
             if want_full_response:
+                _report_request(request_record, start_time, try_index, data, response)
                 return response
+            elif stream_response:
+                # The request is reported once the body has been read
+                return JSONObjectStream(_iterate_streamed_response(response, request_record, start_time, try_index,
+                                                                   data),
+                                        stream_json_array)
             else:
                 if 'content-length' in response.headers:
                     if int(response.headers['content-length']) != len(response.content):
@@ -409,10 +724,11 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
                 content = response.content
 
                 if decode_response_body:
-                    content = content.decode('utf-8')
                     if response.headers.get('content-type', '').startswith('application/json'):
                         try:
-                            content = json.loads(content)
+                            decode_start_time = time.time()
+                            content = json_codec.loads(content)
+                            request_record["decode_seconds"] = time.time() - decode_start_time
                             t = int(response.elapsed.total_seconds() * 1000)
                             if _DEBUG >= 3:
                                 print(method, url, "<=", response.status_code, "(%dms)" % t,
@@ -432,6 +748,9 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
                             # should be able to recover.
                             streaming_response_truncated = 'content-length' not in response.headers
                             raise HTTPError("Invalid JSON received from server")
+                    else:
+                        content = content.decode('utf-8')
+                _report_request(request_record, start_time, try_index, data, response)
                 return content
             raise AssertionError('Should never reach this line: expected a result to have been returned by now')
         except Exception as e:
@@ -439,10 +758,12 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
             exception_msg = _extract_msg_from_last_exception()
             if isinstance(e, _expected_exceptions):
                 if response is not None and response.status_code == 503:
-                    seconds_to_wait = _extract_retry_after_timeout(response)
+                    seconds_to_wait = retry_coordinator.get_unavailable_wait(host,
+                                                                             _extract_retry_after_timeout(response))
                     logger.warn("%s %s: %s. Waiting %d seconds due to server unavailability...",
                                 method, url, exception_msg, seconds_to_wait)
                     time.sleep(seconds_to_wait)
+                    request_record["wait_503_seconds"] += seconds_to_wait
                     # Note, we escape the "except" block here without
                     # incrementing try_index because 503 responses with
                     # Retry-After should not count against the number of
@@ -464,13 +785,18 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
                     else:
                         ok_to_retry = 500 <= response.status_code < 600
 
+                if ok_to_retry and not retry_coordinator.acquire_retry():
+                    logger.warn("%s %s: %s. Not retrying because too many requests are being retried",
+                                method, url, exception_msg)
+                    ok_to_retry = False
+
                 if ok_to_retry:
                     if rewind_input_buffer_offset is not None:
                         data.seek(rewind_input_buffer_offset)
-                    delay = min(2 ** try_index, DEFAULT_TIMEOUT)
+                    retry_delay = retry_coordinator.get_retry_delay(retry_delay)
                     logger.warn("%s %s: %s. Waiting %d seconds before retry %d of %d...",
-                                method, url, exception_msg, delay, try_index + 1, max_retries)
-                    time.sleep(delay)
+                                method, url, exception_msg, retry_delay, try_index + 1, max_retries)
+                    time.sleep(retry_delay)
                     try_index += 1
                     continue
 
@@ -478,6 +804,7 @@ def DXHTTPRequest(resource, data, method='POST', headers=None, auth=True,
             # retryable. Print the latest error and propagate it back to the caller.
             if not isinstance(e, exceptions.DXAPIError):
                 logger.error("%s %s: %s", method, url, exception_msg)
+            _report_request(request_record, start_time, try_index, data, response, error=e)
             raise
         finally:
             if success and try_index > 0:
@@ -610,3 +937,7 @@ config = _DXConfig()
 from .bindings import *
 from .dxlog import DXLogHandler
 from .utils.exec_utils import run, entry_point
+
+if os.environ.get('DX_REQUEST_METRICS') == '1':
+    from .utils.request_metrics import enable_request_metrics as _enable_request_metrics
+    _enable_request_metrics()
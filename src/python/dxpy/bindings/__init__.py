@@ -22,9 +22,10 @@ base class for all remote data object handlers.
 
 from __future__ import (print_function, unicode_literals)
 
-import time, copy, re
+import time, copy, re, functools
 
 import dxpy.api
+from ..utils.describe_cache import DescribeCache, DEFAULT_DESCRIBE_CACHE_TTL
 from ..exceptions import (DXError, DXAPIError, DXFileError, DXGTableError, DXSearchError, DXAppletError,
                           DXJobFailureError, AppError, AppInternalError, DXCLIError)
 
@@ -50,6 +51,21 @@ def verify_string_dxid(dxid, expected_classes):
 
         raise DXError('Invalid ID of class %s: %r' % (str_expected_classes, dxid))
 
+def _invalidates_describe_cache(method):
+    '''
+    Decorator for methods of :class:`DXDataObject` that modify the
+    remote object, which drops any cached descriptions of it.
+    '''
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        dxid = self._dxid
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if DXDataObject._describe_cache is not None and dxid is not None:
+                DXDataObject._describe_cache.invalidate(dxid)
+    return wrapper
+
 class DXObject(object):
     """Abstract base class for all remote object handlers."""
 
@@ -192,6 +208,32 @@ class DXDataObject(DXObject):
 
     """
 
+    _describe_cache = None
+
+    @classmethod
+    def set_describe_cache_size(cls, max_entries, ttl=DEFAULT_DESCRIBE_CACHE_TTL):
+        '''
+        :param max_entries: Maximum number of descriptions to keep, or 0 to disable the cache
+        :type max_entries: int
+        :param ttl: Number of seconds for which a description that may still change is reused
+        :type ttl: int
+
+        Enables (or disables) a process-wide cache of the results of
+        :meth:`describe`, shared by all data object handlers and keyed
+        by object ID, project, and the fields requested. Descriptions of
+        objects that are not yet closed are never cached; those of
+        closed objects are reused for *ttl* seconds, or indefinitely if
+        they contain only fields that cannot change once an object is
+        closed (see
+        :data:`~dxpy.utils.describe_cache.IMMUTABLE_FIELDS_OF_CLOSED_OBJECTS`).
+        Methods of the handlers that modify an object drop its cached
+        descriptions. Least recently used entries are evicted first.
+        '''
+        if max_entries > 0:
+            DXDataObject._describe_cache = DescribeCache(max_entries, ttl)
+        else:
+            DXDataObject._describe_cache = None
+
     def __init__(self, dxid=None, project=None):
         if not hasattr(self, '_class'):
             raise NotImplementedError(
@@ -364,10 +406,27 @@ class DXDataObject(DXObject):
         if self._proj is not None:
             describe_input["project"] = self._proj
 
-        self._desc = self._describe(self._dxid, describe_input, **kwargs)
-
+        describe_cache = self._describe_cache
+        if describe_cache is None:
+            self._desc = self._describe(self._dxid, describe_input, **kwargs)
+            return self._desc
+
+        # Only descriptions of closed objects are cached, so the state is
+        # requested (and then removed) if it is not among the fields
+        added_state = 'fields' in describe_input and 'state' not in describe_input['fields']
+        desc = describe_cache.get(self._dxid, describe_input)
+        if desc is None:
+            request_input = describe_input
+            if added_state:
+                request_input = dict(describe_input, fields=dict(describe_input['fields'], state=True))
+            desc = self._describe(self._dxid, request_input, **kwargs)
+            describe_cache.put(self._dxid, describe_input, desc)
+        if added_state:
+            desc.pop('state', None)
+        self._desc = desc
         return self._desc
 
+    @_invalidates_describe_cache
     def add_types(self, types, **kwargs):
         """
         :param types: Types to add to the object
@@ -381,6 +440,7 @@ class DXDataObject(DXObject):
 
         self._add_types(self._dxid, {"types": types}, **kwargs)
 
+    @_invalidates_describe_cache
     def remove_types(self, types, **kwargs):
         """
         :param types: Types to remove from the object
@@ -403,6 +463,7 @@ class DXDataObject(DXObject):
 
         return self._get_details(self._dxid, **kwargs)
 
+    @_invalidates_describe_cache
     def set_details(self, details, **kwargs):
         """
         :param details: Details to set for the object
@@ -418,6 +479,7 @@ class DXDataObject(DXObject):
 
         return self._set_details(self._dxid, details, **kwargs)
 
+    @_invalidates_describe_cache
     def hide(self, **kwargs):
         """
         :raises: :class:`~dxpy.exceptions.DXAPIError` if the object is not in the "open" state
@@ -428,6 +490,7 @@ class DXDataObject(DXObject):
 
         return self._set_visibility(self._dxid, {"hidden": True}, **kwargs)
 
+    @_invalidates_describe_cache
     def unhide(self, **kwargs):
         """
         :raises: :class:`~dxpy.exceptions.DXAPIError` if the object is not in the "open" state
@@ -438,6 +501,7 @@ class DXDataObject(DXObject):
 
         return self._set_visibility(self._dxid, {"hidden": False}, **kwargs)
 
+    @_invalidates_describe_cache
     def rename(self, name, **kwargs):
         """
         :param name: New name for the object
@@ -466,6 +530,7 @@ class DXDataObject(DXObject):
         """
         return self.describe(incl_properties=True, **kwargs)["properties"]
 
+    @_invalidates_describe_cache
     def set_properties(self, properties, **kwargs):
         """
         :param properties: Property names and values given as key-value pairs of strings
@@ -497,6 +562,7 @@ class DXDataObject(DXObject):
                                           "properties": properties},
                              **kwargs)
 
+    @_invalidates_describe_cache
     def add_tags(self, tags, **kwargs):
         """
         :param tags: Tags to add to the object
@@ -513,6 +579,7 @@ class DXDataObject(DXObject):
         self._add_tags(self._dxid, {"project": self._proj, "tags": tags},
                        **kwargs)
 
+    @_invalidates_describe_cache
     def remove_tags(self, tags, **kwargs):
         """
         :param tags: Tags to remove from the object
@@ -529,6 +596,7 @@ class DXDataObject(DXObject):
         self._remove_tags(self._dxid, {"project": self._proj, "tags": tags},
                           **kwargs)
 
+    @_invalidates_describe_cache
     def close(self, **kwargs):
         """
         Closes the object for further modification to its types,
@@ -549,6 +617,7 @@ class DXDataObject(DXObject):
 
         return self._list_projects(self._dxid, **kwargs)
 
+    @_invalidates_describe_cache
     def remove(self, **kwargs):
         '''
         :raises: :exc:`~dxpy.exceptions.DXError` if no project is associated with the object
@@ -568,6 +637,7 @@ class DXDataObject(DXObject):
         self._proj = None
         self._desc = {}
 
+    @_invalidates_describe_cache
     def move(self, folder, **kwargs):
         '''
         :param folder: Folder route to which to move the object
@@ -653,14 +723,17 @@ from .dxfile import DXFile, DXFILE_HTTP_THREADS, DEFAULT_BUFFER_SIZE
 from .dxfile_functions import open_dxfile, new_dxfile, download_dxfile, upload_local_file, upload_string
 from .dxgtable import DXGTable, NULL, DXGTABLE_HTTP_THREADS
 from .dxgtable_functions import open_dxgtable, new_dxgtable
+from .dxgtable_writer import DXGTableParallelWriter
 from .dxrecord import DXRecord, new_dxrecord
 from .dxproject import DXContainer, DXProject
 from .dxjob import DXJob, new_dxjob
 from .dxanalysis import DXAnalysis
+from .dxexecution_functions import iterate_finished_executions, wait_on_all
 from .dxapplet import DXExecutable, DXApplet
 from .dxapp import DXApp
 from .dxworkflow import DXWorkflow, new_dxworkflow
 from .auth import user_info, whoami
-from .dxdataobject_functions import dxlink, is_dxlink, get_dxlink_ids, get_handler, describe, get_details, remove
+from .dxdataobject_functions import (dxlink, is_dxlink, get_dxlink_ids, get_handler, describe, describe_many,
+                                     get_details, remove)
 from .search import (find_data_objects, find_executions, find_jobs, find_analyses, find_projects, find_apps,
                      find_one_data_object, find_one_project, find_one_app, resolve_data_objects)
@@ -28,10 +28,28 @@ full object handler.
 
 from __future__ import (print_function, unicode_literals)
 
+import threading
+
 import dxpy
-from . import DXDataObject
+from . import DXObject, DXDataObject
 from . import __dict__ as all_bindings
-from ..exceptions import DXError
+from ..exceptions import DXError, ResourceNotFound, InvalidInput
+
+# Maximum number of objects described by one /system/describeDataObjects
+# call
+DESCRIBE_BATCH_SIZE = 1000
+# Number of concurrent /xxxx/describe calls made by describe_many for
+# objects that cannot be described in batches
+DESCRIBE_MANY_THREADS = 8
+
+_describe_threadpool = None
+_describe_threadpool_lock = threading.Lock()
+# Set once the API server turns out not to support
+# /system/describeDataObjects
+_batch_describe_unsupported = False
+# Message of the error returned by the API server for a route it does
+# not have, as opposed to an object that does not exist
+_UNKNOWN_ROUTE_MESSAGE = "The specified URL could not be found"
 
 def dxlink(object_id, project_id=None):
     '''
@@ -181,3 +199,120 @@ def remove(id_or_link, **kwargs):
     '''
     handler = get_handler(id_or_link)
     return handler.remove(**kwargs)
+
+def _get_describe_threadpool():
+    global _describe_threadpool
+    with _describe_threadpool_lock:
+        if _describe_threadpool is None:
+            _describe_threadpool = dxpy.utils.get_futures_threadpool(max_workers=DESCRIBE_MANY_THREADS)
+    return _describe_threadpool
+
+def _describe_one(handler, fields, default_fields, **kwargs):
+    if isinstance(handler, DXDataObject):
+        return handler.describe(fields=fields, default_fields=default_fields, **kwargs)
+    elif fields is not None and not isinstance(handler, dxpy.DXContainer):
+        # Executions and apps take the fields as a dict
+        return handler.describe(fields={field_name: True for field_name in fields}, **kwargs)
+    return handler.describe(**kwargs)
+
+def _describe_batch(handlers, fields, default_fields, **kwargs):
+    describe_input = {}
+    if default_fields is not None:
+        describe_input['defaultFields'] = default_fields
+    if fields is not None:
+        describe_input['fields'] = {field_name: True for field_name in fields}
+    describe_cache = DXDataObject._describe_cache
+    objects, uncached_handlers = [], []
+    for handler in handlers:
+        # Same as the input DXDataObject.describe would use, so that
+        # cache entries are shared with it
+        handler_describe_input = dict(describe_input)
+        if handler.get_proj_id() is not None:
+            handler_describe_input["project"] = handler.get_proj_id()
+        if describe_cache is not None:
+            desc = describe_cache.get(handler.get_id(), handler_describe_input)
+            if desc is not None:
+                handler._desc = desc
+                continue
+        obj = {"id": handler.get_id(), "describe": describe_input}
+        if handler.get_proj_id() is not None:
+            obj["project"] = handler.get_proj_id()
+        objects.append(obj)
+        uncached_handlers.append((handler, handler_describe_input))
+    if not objects:
+        return
+    results = dxpy.DXHTTPRequest('/system/describeDataObjects', {"objects": objects}, always_retry=True,
+                                 **kwargs)["results"]
+    for (handler, handler_describe_input), result in zip(uncached_handlers, results):
+        if result.get("describe") is not None:
+            handler._desc = result["describe"]
+            if describe_cache is not None:
+                describe_cache.put(handler.get_id(), handler_describe_input, handler._desc)
+        else:
+            # Let the individual describe raise the appropriate error
+            _describe_one(handler, fields, default_fields, **kwargs)
+
+def _is_unknown_route_error(error):
+    return error.code == 404 and (isinstance(error, InvalidInput) or
+                                  error.msg.startswith(_UNKNOWN_ROUTE_MESSAGE))
+
+def describe_many(ids_or_handlers, fields=None, default_fields=None, **kwargs):
+    """
+    :param ids_or_handlers: Object IDs, DXLinks, or object handlers
+    :type ids_or_handlers: iterable
+    :param fields: set of fields to include in the output (see :meth:`~dxpy.bindings.DXDataObject.describe`)
+    :type fields: set or sequence of str
+    :param default_fields: if True, include the default fields in addition to those in *fields*
+    :type default_fields: bool
+    :returns: Descriptions of the objects, in the same order
+    :rtype: list of dicts
+
+    Describes many objects with as few round trips as possible. Data
+    objects are described in batches of up to
+    :data:`DESCRIBE_BATCH_SIZE` with the /system/describeDataObjects
+    API method; other objects (and all objects, if the API server does
+    not provide that method) are described with up to
+    :data:`DESCRIBE_MANY_THREADS` concurrent /xxxx/describe calls.
+
+    Any handlers given have their cached description updated, so that
+    subsequently accessing their attributes does not make further API
+    calls.
+
+    Example::
+
+        for desc in describe_many(["file-xxxx", "record-yyyy"], fields={"name"}):
+            print(desc["name"])
+    """
+    global _batch_describe_unsupported
+
+    handlers = [item if isinstance(item, DXObject) else get_handler(item) for item in ids_or_handlers]
+    data_objects = [handler for handler in handlers if isinstance(handler, DXDataObject)]
+    others = [handler for handler in handlers if not isinstance(handler, DXDataObject)]
+
+    if not _batch_describe_unsupported:
+        for i in range(0, len(data_objects), DESCRIBE_BATCH_SIZE):
+            batch = data_objects[i:i + DESCRIBE_BATCH_SIZE]
+            try:
+                _describe_batch(batch, fields, default_fields, **kwargs)
+            except (ResourceNotFound, InvalidInput) as e:
+                if not _is_unknown_route_error(e):
+                    if not isinstance(e, ResourceNotFound):
+                        raise
+                    # One of the objects does not exist; let the
+                    # individual describes raise the appropriate error
+                    for handler in batch:
+                        _describe_one(handler, fields, default_fields, **kwargs)
+                    continue
+                _batch_describe_unsupported = True
+                others.extend(data_objects[i:])
+                break
+    else:
+        others.extend(data_objects)
+
+    if others:
+        threadpool = _get_describe_threadpool()
+        futures = [threadpool.submit(_describe_one, handler, fields, default_fields, **kwargs) for handler in others]
+        for future in futures:
+            future.result()
+
+    return [handler._desc for handler in handlers]
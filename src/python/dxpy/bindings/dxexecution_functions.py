@@ -0,0 +1,181 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+'''
+Helper Functions
+****************
+
+The following functions wait on many jobs or analyses at once, checking
+their states with as few API calls as possible.
+
+'''
+
+from __future__ import (print_function, unicode_literals, division)
+
+import collections, time
+
+import dxpy
+from . import DXObject
+from .dxdataobject_functions import get_handler, describe_many
+from ..exceptions import DXJobFailureError
+
+# When at least this many of the executions being waited on share a
+# root execution, their states are obtained by searching the executions
+# under that root (one paginated /system/findExecutions call) rather
+# than by describing each of them. The others are searched for in the
+# same way by project (and the range of their creation times), if at
+# least this many of them are in the same project.
+MIN_EXECUTIONS_TO_SEARCH = 5
+
+_WAIT_DESCRIBE_FIELDS = {"id", "state", "rootExecution", "project", "created", "failureReason", "failureMessage",
+                         "failureFrom"}
+_FAILED_STATES = {"failed", "partially_failed", "terminated"}
+
+
+def _get_failure_message(desc):
+    noun = "Analysis" if desc["id"].startswith("analysis-") else "Job"
+    if desc["state"] == "terminated":
+        return "{noun} {id} was terminated.".format(noun=noun, id=desc["id"])
+    err_msg = "{noun} {id} has failed because of {reason}: {message}".format(
+        noun=noun, id=desc["id"], reason=desc.get("failureReason"), message=desc.get("failureMessage"))
+    if desc.get("failureFrom") is not None and desc["failureFrom"]["id"] != desc["id"]:
+        err_msg += " (failure from {id})".format(id=desc['failureFrom']['id'])
+    return err_msg
+
+
+def _get_states(pending, **kwargs):
+    '''
+    Returns a dict mapping the ID of each execution in *pending* (a dict
+    mapping IDs to handlers whose cached descriptions include the root
+    execution, project, and creation time) to its current description.
+    '''
+    by_root = collections.defaultdict(list)
+    for handler in pending.values():
+        by_root[handler._desc.get("rootExecution")].append(handler)
+    searches, by_project = [], collections.defaultdict(list)
+    for root_execution, handlers in by_root.items():
+        if root_execution is not None and len(handlers) >= MIN_EXECUTIONS_TO_SEARCH:
+            searches.append(({"root_execution": root_execution}, handlers))
+        else:
+            for handler in handlers:
+                by_project[handler._desc.get("project")].append(handler)
+
+    to_describe = []
+    for project, handlers in by_project.items():
+        if project is not None and len(handlers) >= MIN_EXECUTIONS_TO_SEARCH:
+            searches.append(({"project": project}, handlers))
+        else:
+            to_describe.extend(handlers)
+
+    descs = {}
+    for search_kwargs, handlers in searches:
+        created = [handler._desc["created"] for handler in handlers]
+        search_kwargs.update(kwargs)
+        for result in dxpy.find_executions(created_after=min(created) - 1, created_before=max(created) + 1,
+                                           describe={"fields": {field: True for field in _WAIT_DESCRIBE_FIELDS}},
+                                           **search_kwargs):
+            if result["id"] in pending:
+                descs[result["id"]] = result["describe"]
+        # Anything the search missed is described individually
+        to_describe.extend(handler for handler in handlers if handler.get_id() not in descs)
+
+    if to_describe:
+        for handler, desc in zip(to_describe, describe_many(to_describe, fields=_WAIT_DESCRIBE_FIELDS, **kwargs)):
+            descs[handler.get_id()] = desc
+    return descs
+
+
+def iterate_finished_executions(executions, timeout=3600*24*7, min_interval=2, max_interval=60, fail_fast=True,
+                                **kwargs):
+    '''
+    :param executions: Jobs and analyses to wait on
+    :type executions: iterable of IDs or :class:`~dxpy.bindings.dxjob.DXJob` / :class:`~dxpy.bindings.dxanalysis.DXAnalysis` handlers
+    :param timeout: Maximum amount of time to wait, in seconds, until all the executions have finished
+    :type timeout: integer
+    :param min_interval: Initial number of seconds between checks of the executions' states
+    :type min_interval: number
+    :param max_interval: Maximum number of seconds between checks of the executions' states
+    :type max_interval: number
+    :param fail_fast: If True, raises as soon as any execution fails; otherwise failed executions are yielded like the others
+    :type fail_fast: boolean
+    :returns: Generator yielding a handler for each execution as soon as it has finished, with its description (which includes at least "id" and "state") cached
+    :raises: :exc:`~dxpy.exceptions.DXJobFailureError` if the timeout is reached, or (if *fail_fast* is True) if any execution fails or is terminated
+
+    Waits on all the *executions* at once. Executions that share a root
+    execution are checked together with a single search of that root's
+    descendants, and the remaining executions in the same project with
+    a single search of that project; the rest (groups of fewer than
+    :data:`MIN_EXECUTIONS_TO_SEARCH` executions) are described
+    concurrently, with one request per execution. The interval
+    between checks grows with the time spent waiting (a tenth of it,
+    bounded by *min_interval* and *max_interval*), so long-running
+    executions are polled less often.
+
+    Example::
+
+        for job in dxpy.iterate_finished_executions(subjobs):
+            print(job.get_id(), "finished")
+    '''
+    handlers = [item if isinstance(item, DXObject) else get_handler(item) for item in executions]
+    pending = collections.OrderedDict((handler.get_id(), handler) for handler in handlers)
+    if not pending:
+        return
+
+    start_time = time.time()
+    # The first check also obtains the root execution and creation time
+    # of each execution, which later checks use to group them.
+    describe_many(list(pending.values()), fields=_WAIT_DESCRIBE_FIELDS, **kwargs)
+    descs = {dxid: handler._desc for dxid, handler in pending.items()}
+    while True:
+        for dxid, desc in descs.items():
+            handler = pending[dxid]
+            handler._desc = desc
+            if desc["state"] == "done" or desc["state"] in _FAILED_STATES:
+                del pending[dxid]
+                if fail_fast and desc["state"] in _FAILED_STATES:
+                    raise DXJobFailureError(_get_failure_message(desc))
+                yield handler
+        if not pending:
+            return
+
+        elapsed = time.time() - start_time
+        if elapsed >= timeout:
+            raise DXJobFailureError("Reached timeout while waiting for {n} executions to finish".format(n=len(pending)))
+        time.sleep(min(max_interval, max(min_interval, elapsed / 10.0), timeout - elapsed))
+        descs = _get_states(pending, **kwargs)
+
+
+def wait_on_all(executions, callback=None, fail_fast=True, **kwargs):
+    '''
+    :param executions: Jobs and analyses to wait on
+    :type executions: iterable of IDs or :class:`~dxpy.bindings.dxjob.DXJob` / :class:`~dxpy.bindings.dxanalysis.DXAnalysis` handlers
+    :param callback: Function to call with the handler of each execution as soon as it has finished
+    :type callback: function
+    :param fail_fast: If True, raises as soon as any execution fails; otherwise waits for all of them to finish before raising
+    :type fail_fast: boolean
+    :raises: :exc:`~dxpy.exceptions.DXJobFailureError` if any execution fails or is terminated, or if the timeout is reached
+
+    Waits until all the *executions* have finished running. Accepts the
+    same keyword arguments as :func:`iterate_finished_executions`.
+    '''
+    failures = []
+    for handler in iterate_finished_executions(executions, fail_fast=fail_fast, **kwargs):
+        if callback is not None:
+            callback(handler)
+        if handler._desc["state"] in _FAILED_STATES:
+            failures.append(_get_failure_message(handler._desc))
+    if failures:
+        raise DXJobFailureError("\n".join(failures))
@@ -23,26 +23,125 @@ This remote file handler is a Python file-like object.
 
 from __future__ import (print_function, unicode_literals)
 
-import os, sys, logging, traceback, hashlib, copy, time
+import os, sys, logging, traceback, hashlib, copy, time, collections, threading
 import concurrent.futures
 
 import dxpy
-from . import DXDataObject
+from . import DXDataObject, _invalidates_describe_cache
 from ..exceptions import DXFileError
 from ..utils import warn
-from ..compat import BytesIO
+from ..utils.thread_pool import _chain_result
+from ..utils.transfer_controller import AIMDTransferController
+from ..utils.file_cache import get_file_cache
+from ..compat import BytesIO, str, bytes
 
-# TODO: adaptive buffer size
 DXFILE_HTTP_THREADS = 8
+# Threads used to compute part checksums ahead of the HTTP threads
+DXFILE_MD5_THREADS = 2
 DEFAULT_BUFFER_SIZE = 1024*1024*16
 if dxpy.JOB_ID:
     # Increase HTTP request buffer size when we are running within the
     # platform.
     DEFAULT_BUFFER_SIZE = 1024*1024*96
 
+# Bounds on the request size chosen for adaptive transfers (see the
+# *adaptive* parameter of DXFile)
+MIN_ADAPTIVE_READ_CHUNK_SIZE = 1024*64
+MAX_ADAPTIVE_BUFFER_SIZE = 1024*1024*256
+
+# Size of the aligned blocks held by the read cache (see
+# DXFile.set_read_cache_size)
+DEFAULT_READ_CACHE_BLOCK_SIZE = 1024*1024*4
+
 MD5_READ_CHUNK_SIZE = 1024*1024*4
 FILE_REQUEST_TIMEOUT = 60
 
+def _get_md5_hexdigest(data):
+    """Returns the hex MD5 digest of *data*, which may be a string or a
+    buffer such as an mmap object. A buffer is read in
+    MD5_READ_CHUNK_SIZE slices and rewound to its original position
+    afterwards.
+
+    """
+    md5 = hashlib.md5()
+    if hasattr(data, 'seek') and hasattr(data, 'tell'):
+        # data is a buffer; record initial position (so we can rewind back)
+        rewind_input_buffer_offset = data.tell()
+        while True:
+            bytes_read = data.read(MD5_READ_CHUNK_SIZE)
+            if bytes_read:
+                md5.update(bytes_read)
+            else:
+                break
+        # rewind the buffer to original position
+        data.seek(rewind_input_buffer_offset)
+    else:
+        md5.update(data)
+    return md5.hexdigest()
+
+class _BlockCache(object):
+    """Process-wide LRU cache of fixed-size, aligned blocks of closed
+    (and therefore immutable) files, keyed by (file ID, block index).
+
+    Each entry is a Future for the block's contents, so a block that is
+    still being downloaded can be shared by every reader that needs it.
+    Entries whose download fails are dropped so that they are fetched
+    again next time. Blocks are evicted, least recently used first, once
+    the total size of the cached blocks exceeds *max_bytes*.
+
+    """
+
+    def __init__(self, max_bytes, block_size):
+        self.max_bytes = max_bytes
+        self.block_size = block_size
+        self.hits, self.misses = 0, 0
+        self._blocks = collections.OrderedDict()
+        self._size = 0
+        # Reentrant because a failure callback may run synchronously
+        # from within get_or_fetch
+        self._lock = threading.RLock()
+
+    def get_or_fetch(self, key, block_len, fetch_fn):
+        """
+        Returns the Future for the block *key*, calling *fetch_fn* (which
+        must return a Future) to start downloading it if it is not
+        cached or in flight.
+        """
+        with self._lock:
+            future = self._blocks.pop(key, None)
+            if future is not None:
+                self.hits += 1
+                self._blocks[key] = future
+                return future
+
+            self.misses += 1
+            future = fetch_fn()
+            future.block_len = block_len
+            self._blocks[key] = future
+            self._size += block_len
+
+            while self._size > self.max_bytes and len(self._blocks) > 1:
+                _evicted_key, evicted = self._blocks.popitem(last=False)
+                self._size -= evicted.block_len
+
+        def drop_if_failed(f):
+            if f.exception() is not None:
+                self._discard(key, f)
+        future.add_done_callback(drop_if_failed)
+        return future
+
+    def _discard(self, key, future):
+        with self._lock:
+            if self._blocks.get(key) is future:
+                del self._blocks[key]
+                self._size -= future.block_len
+
+    def clear(self):
+        with self._lock:
+            self._blocks.clear()
+            self._size = 0
+
+
 class DXFile(DXDataObject):
     '''Remote file object handler.
 
@@ -52,6 +151,8 @@ class DXFile(DXDataObject):
     :type project: string
     :param mode: One of "r", "w", or "a" for read, write, and append modes, respectively
     :type mode: string
+    :param adaptive: If True, the size of each HTTP request and the number of requests in flight are chosen on the fly from the throughput and latency of the requests already completed (see :class:`~dxpy.utils.transfer_controller.AIMDTransferController`), instead of being fixed by the buffer sizes and the HTTP thread pool size. The buffer sizes then act as the minimum part size for writes and, multiplied by the thread pool size, as the cap on bytes in flight.
+    :type adaptive: boolean
 
     .. note:: The attribute values below are current as of the last time
               :meth:`~dxpy.bindings.DXDataObject.describe` was run.
@@ -85,6 +186,9 @@ class DXFile(DXDataObject):
 
     _http_threadpool = None
     _http_threadpool_size = DXFILE_HTTP_THREADS
+    _md5_threadpool = None
+    _md5_threadpool_size = DXFILE_MD5_THREADS
+    _read_cache = None
 
     @classmethod
     def set_http_threadpool_size(cls, num_threads):
@@ -95,8 +199,38 @@ class DXFile(DXDataObject):
         if cls._http_threadpool is None:
             cls._http_threadpool = dxpy.utils.get_futures_threadpool(max_workers=cls._http_threadpool_size)
 
+    @classmethod
+    def set_read_cache_size(cls, max_bytes, block_size=DEFAULT_READ_CACHE_BLOCK_SIZE):
+        '''
+        :param max_bytes: Maximum number of bytes of file data to keep in memory, or 0 to disable the cache
+        :type max_bytes: int
+        :param block_size: Size of the aligned blocks that are fetched and cached
+        :type block_size: int
+
+        Enables (or disables) a process-wide read cache shared by all
+        DXFile handlers. While it is enabled, reads are served from
+        fixed-size aligned blocks keyed by file ID and offset, so a seek
+        to a region that has already been read (or is being read) does
+        not fetch it again; only missing blocks are downloaded. Blocks
+        are evicted in least recently used order.
+        '''
+        if max_bytes > 0:
+            DXFile._read_cache = _BlockCache(max_bytes, block_size)
+        else:
+            DXFile._read_cache = None
+
+    @classmethod
+    def _ensure_md5_threadpool(cls):
+        if cls._md5_threadpool is None:
+            cls._md5_threadpool = dxpy.utils.get_futures_threadpool(max_workers=cls._md5_threadpool_size,
+                                                                    reserve_connections=False)
+
     def __init__(self, dxid=None, project=None, mode=None,
-                 read_buffer_size=DEFAULT_BUFFER_SIZE, write_buffer_size=DEFAULT_BUFFER_SIZE):
+                 read_buffer_size=DEFAULT_BUFFER_SIZE, write_buffer_size=DEFAULT_BUFFER_SIZE, adaptive=False):
+        # Local copy of the file from the on-disk file cache, if any
+        # (looked up on the first read). Set before
+        # DXDataObject.__init__, which calls set_ids.
+        self._file_cache_checked, self._file_cache_fh = False, None
         DXDataObject.__init__(self, dxid=dxid, project=project)
         if mode is None:
             self._close_on_exit = True
@@ -106,7 +240,10 @@ class DXFile(DXDataObject):
             self._close_on_exit = (mode == 'w')
 
         self._read_buf = BytesIO()
-        self._write_buf = BytesIO()
+        # The part currently being filled (allocated on demand, since
+        # handlers that only read never need it) and the number of bytes
+        # of it that are in use
+        self._write_buf, self._write_buf_len = None, 0
 
         if write_buffer_size < 5*1024*1024:
             raise DXFileError("Write buffer size must be at least 5 MB")
@@ -114,9 +251,33 @@ class DXFile(DXDataObject):
         self._read_bufsize = read_buffer_size
         self._write_bufsize = write_buffer_size
 
+        self._read_controller, self._write_controller = None, None
+        if adaptive:
+            initial_concurrency = max(1, self._http_threadpool_size // 2)
+            self._read_controller = AIMDTransferController(
+                initial_chunk_size=MIN_ADAPTIVE_READ_CHUNK_SIZE,
+                min_chunk_size=MIN_ADAPTIVE_READ_CHUNK_SIZE,
+                max_chunk_size=max(MAX_ADAPTIVE_BUFFER_SIZE, MIN_ADAPTIVE_READ_CHUNK_SIZE),
+                initial_concurrency=initial_concurrency,
+                max_concurrency=self._http_threadpool_size,
+                max_inflight_bytes=read_buffer_size * self._http_threadpool_size
+            )
+            # Parts never get smaller than write_buffer_size, so that the
+            # 10,000 part limit computed by the caller still holds (and
+            # mmap'd offsets stay aligned).
+            self._write_controller = AIMDTransferController(
+                initial_chunk_size=write_buffer_size,
+                min_chunk_size=write_buffer_size,
+                max_chunk_size=max(MAX_ADAPTIVE_BUFFER_SIZE, write_buffer_size),
+                initial_concurrency=initial_concurrency,
+                max_concurrency=self._http_threadpool_size,
+                max_inflight_bytes=write_buffer_size * self._http_threadpool_size
+            )
+
         self._download_url, self._download_url_headers, self._download_url_expires = None, None, None
         self._request_iterator, self._response_iterator = None, None
         self._http_threadpool_futures = set()
+        self._cache_sequential_pos, self._cache_readahead = 0, 0
 
         # Initialize state
         self._pos = 0
@@ -170,7 +331,7 @@ class DXFile(DXDataObject):
             # DXFile object
             return
 
-        if self._write_buf.tell() > 0 or len(self._http_threadpool_futures) > 0:
+        if self._write_buf_len > 0 or len(self._http_threadpool_futures) > 0:
             warn("=== WARNING! ===")
             warn("There is still unflushed data in the destructor of a DXFile object!")
             warn("We will attempt to flush it now, but if an error were to occur, we could not report it back to you.")
@@ -218,6 +379,9 @@ class DXFile(DXDataObject):
         DXDataObject.set_ids(self, dxid, project)
 
         # Reset state
+        if self._file_cache_fh is not None:
+            self._file_cache_fh.close()
+        self._file_cache_checked, self._file_cache_fh = False, None
         self._pos = 0
         self._file_length = None
         self._cur_part = 1
@@ -250,6 +414,11 @@ class DXFile(DXDataObject):
         orig_pos = self._pos
         self._pos = reference_pos + offset
 
+        if self._read_cache is not None or self._file_cache_fh is not None:
+            # Reads are served from the block cache or the local copy,
+            # neither of which is tied to the cursor position.
+            return
+
         in_buf = False
         orig_buf_pos = self._read_buf.tell()
         if offset < orig_pos:
@@ -282,6 +451,18 @@ class DXFile(DXDataObject):
             # TODO: if the offset is within the next response(s), don't throw out the queues
             self._request_iterator, self._response_iterator = None, None
 
+    def get_transfer_stats(self):
+        '''
+        :returns: dict with keys "read" and "write", each mapping to a :class:`~dxpy.utils.transfer_controller.TransferStats`, or None if the handler was not created with *adaptive* set
+        :rtype: dict or None
+
+        Returns the measurements and the current chunk size and
+        concurrency decisions of the adaptive transfer controllers.
+        '''
+        if self._read_controller is None:
+            return None
+        return {"read": self._read_controller.get_stats(), "write": self._write_controller.get_stats()}
+
     def tell(self):
         '''
         Returns the current position of the file read cursor.
@@ -295,9 +476,8 @@ class DXFile(DXDataObject):
         '''
         Flushes the internal write buffer.
         '''
-        if self._write_buf.tell() > 0:
-            data = self._write_buf.getvalue()
-            self._write_buf = BytesIO()
+        if self._write_buf_len > 0:
+            data = self._take_write_buf()
 
             if multithread:
                 self._async_upload_part_request(data, index=self._cur_part, **kwargs)
@@ -305,6 +485,7 @@ class DXFile(DXDataObject):
                 self.upload_part(data, self._cur_part, **kwargs)
 
             self._cur_part += 1
+            self._update_write_bufsize()
 
         if len(self._http_threadpool_futures) > 0:
             dxpy.utils.wait_for_all_futures(self._http_threadpool_futures)
@@ -315,24 +496,56 @@ class DXFile(DXDataObject):
             finally:
                 self._http_threadpool_futures = set()
 
-    def _async_upload_part_request(self, *args, **kwargs):
+    def _async_upload_part_request(self, data, **kwargs):
+        """
+        Uploads *data* as a part in two pipelined stages: the part's MD5
+        is computed in the checksum thread pool, and only then is the
+        part handed to the HTTP thread pool. This way hashing one part
+        overlaps with the network transfer of the parts before it,
+        instead of holding up an HTTP thread.
+        """
         self._ensure_http_threadpool()
+        self._ensure_md5_threadpool()
 
-        while len(self._http_threadpool_futures) >= self._http_threadpool_size:
+        if self._write_controller is not None:
+            max_active_uploads = self._write_controller.concurrency
+            upload_fn = self._write_controller.measure(self.upload_part, num_bytes=len(data))
+        else:
+            max_active_uploads = self._http_threadpool_size
+            upload_fn = self.upload_part
+
+        while len(self._http_threadpool_futures) >= max_active_uploads:
             future = dxpy.utils.wait_for_a_future(self._http_threadpool_futures)
             if future.exception() != None:
                 raise future.exception()
             self._http_threadpool_futures.remove(future)
 
-        future = self._http_threadpool.submit(self.upload_part, *args, **kwargs)
-        self._http_threadpool_futures.add(future)
+        upload_future = concurrent.futures.Future()
+
+        def submit_upload(md5_future):
+            try:
+                md5 = md5_future.result()
+                future = self._http_threadpool.submit(upload_fn, data, md5=md5, **kwargs)
+            except BaseException as e:
+                upload_future.set_exception(e)
+            else:
+                future.add_done_callback(_chain_result(upload_future))
+
+        md5_future = self._md5_threadpool.submit(_get_md5_hexdigest, data)
+        md5_future.add_done_callback(submit_upload)
+        self._http_threadpool_futures.add(upload_future)
+
+    def _update_write_bufsize(self):
+        # Called between parts, when the write buffer is empty
+        if self._write_controller is not None:
+            self._write_bufsize = self._write_controller.chunk_size
 
     def write(self, data, multithread=True, **kwargs):
         '''
         :param data: Data to be written
-        :type data: str or mmap object
+        :type data: str, bytes, bytearray, or mmap object
 
-        Writes the data *data* to the file.
+        Writes the data *data* to the file. Text is encoded as UTF-8.
 
         .. note::
 
@@ -347,8 +560,12 @@ class DXFile(DXDataObject):
             else:
                 self.upload_part(data_for_write_req, self._cur_part, **kwargs)
             self._cur_part += 1
+            self._update_write_bufsize()
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
 
-        if self._write_buf.tell() == 0 and self._write_bufsize == len(data):
+        if self._write_buf_len == 0 and self._write_bufsize == len(data):
             # In the special case of a write that is the same size as
             # our write buffer size, and no unflushed data in the
             # buffer, just directly dispatch the write and bypass the
@@ -356,28 +573,52 @@ class DXFile(DXDataObject):
             #
             # This saves a buffer copy, which is especially helpful if
             # 'data' is actually mmap'd from a file.
-            #
-            # TODO: an additional optimization could be made to allow
-            # the last request from an mmap'd upload to take this path
-            # too (in general it won't because it's not of length
-            # _write_bufsize). This is probably inconsequential though.
             write_request(data)
             return
 
-        remaining_space = self._write_bufsize - self._write_buf.tell()
-
-        if len(data) <= remaining_space:
-            self._write_buf.write(data)
-        else:
-            self._write_buf.write(data[:remaining_space])
-
-            temp_data = self._write_buf.getvalue()
-            self._write_buf = BytesIO()
-            write_request(temp_data)
-
-            # TODO: check if repeat string splitting is bad for
-            # performance when len(data) >> _write_bufsize
-            self.write(data[remaining_space:], **kwargs)
+        try:
+            view = memoryview(data)
+        except TypeError:
+            # mmap objects don't support the new buffer protocol on
+            # Python 2; slicing them copies, but only on that path.
+            view = data
+        # Whole parts can be sent straight out of the caller's data only
+        # if the caller can't modify it while the upload is in flight.
+        data_is_immutable = isinstance(data, bytes)
+
+        pos, data_len = 0, len(data)
+        while pos < data_len:
+            if self._write_buf_len == 0 and data_is_immutable and data_len - pos >= self._write_bufsize:
+                part_len = self._write_bufsize
+                # Sliced as bytes rather than as a memoryview: requests
+                # form-encodes memoryview bodies (adding a Content-Type
+                # header that the upload URL may not have been signed
+                # for)
+                write_request(data[pos:pos + part_len])
+                pos += part_len
+                continue
+
+            if self._write_buf is None:
+                self._write_buf = bytearray(self._write_bufsize)
+            num_bytes = min(len(self._write_buf) - self._write_buf_len, data_len - pos)
+            self._write_buf[self._write_buf_len:self._write_buf_len + num_bytes] = view[pos:pos + num_bytes]
+            self._write_buf_len += num_bytes
+            pos += num_bytes
+
+            if self._write_buf_len == len(self._write_buf):
+                write_request(self._take_write_buf())
+
+    def _take_write_buf(self):
+        """
+        Returns the buffered part data (without copying it) and resets
+        the write buffer; a fresh part buffer is allocated on the next
+        write, since the returned one may still be in flight.
+        """
+        data = self._write_buf
+        if self._write_buf_len < len(data):
+            del data[self._write_buf_len:]
+        self._write_buf, self._write_buf_len = None, 0
+        return data
 
     def closed(self, **kwargs):
         '''
@@ -391,6 +632,7 @@ class DXFile(DXDataObject):
 
         return self.describe(fields={'state'}, **kwargs)["state"] == "closed"
 
+    @_invalidates_describe_cache
     def close(self, block=False, **kwargs):
         '''
         :param block: If True, this function blocks until the remote file has closed.
@@ -430,12 +672,14 @@ class DXFile(DXDataObject):
         '''
         self._wait_on_close(timeout, **kwargs)
 
-    def upload_part(self, data, index=None, display_progress=False, report_progress_fn=None, **kwargs):
+    def upload_part(self, data, index=None, display_progress=False, report_progress_fn=None, md5=None, **kwargs):
         """
         :param data: Data to be uploaded in this part
         :type data: str or mmap object
         :param index: Index of part to be uploaded; must be in [1, 10000]
         :type index: integer
+        :param md5: Optional: hex MD5 digest of *data*, if it has already been computed
+        :type md5: string or None
         :param display_progress: Whether to print "." to stderr when done
         :type display_progress: boolean
         :param report_progress_fn: Optional: a function to call that takes in two arguments (self, # bytes transmitted)
@@ -452,22 +696,10 @@ class DXFile(DXDataObject):
         if index is not None:
             req_input["index"] = int(index)
 
-        md5 = hashlib.md5()
-        if hasattr(data, 'seek') and hasattr(data, 'tell'):
-            # data is a buffer; record initial position (so we can rewind back)
-            rewind_input_buffer_offset = data.tell()
-            while True:
-                bytes_read = data.read(MD5_READ_CHUNK_SIZE)
-                if bytes_read:
-                    md5.update(bytes_read)
-                else:
-                    break
-            # rewind the buffer to original position
-            data.seek(rewind_input_buffer_offset)
-        else:
-            md5.update(data)
+        if md5 is None:
+            md5 = _get_md5_hexdigest(data)
 
-        req_input["md5"] = md5.hexdigest()
+        req_input["md5"] = md5
         req_input["size"] = len(data)
 
         def get_upload_url_and_headers():
@@ -558,31 +790,96 @@ class DXFile(DXDataObject):
                     cur_chunk_size = min(cur_chunk_size * ramp, limit_chunk_size)
                 i += 1
 
-        for chunk_start_pos, chunk_end_pos in chunk_ranges(start_pos, end_pos):
-            url, headers = self.get_download_url(**kwargs)
-            headers = copy.copy(headers)
-            headers['Range'] = "bytes=" + str(chunk_start_pos) + "-" + str(chunk_end_pos)
-            yield dxpy.DXHTTPRequest, [url, ''], {'method': 'GET',
-                                                  'headers': headers,
-                                                  'auth': None,
-                                                  'jsonify_data': False,
-                                                  'prepend_srv': False,
-                                                  'always_retry': True,
-                                                  'timeout': FILE_REQUEST_TIMEOUT,
-                                                  'decode_response_body': False}
+        def adaptive_chunk_ranges(start_pos, end_pos):
+            cur_chunk_start = start_pos
+            while cur_chunk_start < end_pos:
+                # Ranges are generated lazily, so each one picks up the
+                # controller's latest decision.
+                cur_chunk_size = self._read_controller.chunk_size
+                yield cur_chunk_start, min(cur_chunk_start + cur_chunk_size - 1, end_pos)
+                cur_chunk_start += cur_chunk_size
+
+        if self._read_controller is not None:
+            ranges = adaptive_chunk_ranges(start_pos, end_pos)
+        else:
+            ranges = chunk_ranges(start_pos, end_pos)
+
+        for chunk_start_pos, chunk_end_pos in ranges:
+            callable_, args, request_kwargs = self._get_range_request(chunk_start_pos, chunk_end_pos, **kwargs)
+            if self._read_controller is not None:
+                callable_ = self._read_controller.measure(callable_)
+            yield callable_, args, request_kwargs
+
+    def _get_range_request(self, start_pos, end_pos, **kwargs):
+        """
+        Returns a (callable, args, kwargs) tuple that, when invoked,
+        fetches the bytes in the inclusive range [start_pos, end_pos] of
+        the remote file.
+        """
+        url, headers = self.get_download_url(**kwargs)
+        headers = copy.copy(headers)
+        headers['Range'] = "bytes=" + str(start_pos) + "-" + str(end_pos)
+        return dxpy.DXHTTPRequest, [url, ''], {'method': 'GET',
+                                               'headers': headers,
+                                               'auth': None,
+                                               'jsonify_data': False,
+                                               'prepend_srv': False,
+                                               'always_retry': True,
+                                               'timeout': FILE_REQUEST_TIMEOUT,
+                                               'decode_response_body': False}
 
     def _next_response_content(self):
         self._ensure_http_threadpool()
 
         if self._response_iterator is None:
+            if self._read_controller is not None:
+                max_active_tasks = lambda: self._read_controller.concurrency
+            else:
+                max_active_tasks = self._http_threadpool_size
             self._response_iterator = dxpy.utils.response_iterator(
                 self._request_iterator,
                 self._http_threadpool,
-                max_active_tasks=self._http_threadpool_size,
+                max_active_tasks=max_active_tasks,
                 queue_id=id(self)
             )
         return next(self._response_iterator)
 
+    def _read_from_cache(self, cache, length, **kwargs):
+        block_size = cache.block_size
+        start_pos, end_pos = self._pos, self._pos + length
+        first_block, last_block = start_pos // block_size, (end_pos - 1) // block_size
+
+        # Keep a window of blocks in flight past the end of this read
+        # while the file is being read sequentially.
+        if start_pos == self._cache_sequential_pos:
+            self._cache_readahead = min(max(1, self._cache_readahead * 2), self._http_threadpool_size)
+        else:
+            self._cache_readahead = 0
+        self._cache_sequential_pos = end_pos
+        num_file_blocks = (self._file_length + block_size - 1) // block_size
+        readahead_end = min(last_block + self._cache_readahead, num_file_blocks - 1)
+
+        self._ensure_http_threadpool()
+        futures = []
+        for block_index in range(first_block, readahead_end + 1):
+            block_start = block_index * block_size
+            block_end = min(block_start + block_size, self._file_length)
+
+            def fetch(block_start=block_start, block_end=block_end):
+                callable_, args, request_kwargs = self._get_range_request(block_start, block_end - 1, **kwargs)
+                return self._http_threadpool.submit_to_queue(id(self), None, callable_, *args, **request_kwargs)
+
+            futures.append(cache.get_or_fetch((self._dxid, block_index), block_end - block_start, fetch))
+
+        chunks = []
+        for block_index, future in zip(range(first_block, last_block + 1), futures):
+            block = future.result()
+            block_start = block_index * block_size
+            chunks.append(block[max(start_pos - block_start, 0):end_pos - block_start])
+
+        self._pos = end_pos
+        return b"".join(chunks)
+
     def read(self, length=None, use_compression=None, **kwargs):
         '''
         :param size: Maximum number of bytes to be read
@@ -593,6 +890,10 @@ class DXFile(DXDataObject):
         file (if no *size* is given or there are fewer than *size* bytes
         left in the file).
 
+        If the on-disk file cache is enabled (see
+        :mod:`dxpy.utils.file_cache`) and holds this file, the bytes are
+        read from the local copy instead of being downloaded.
+
         .. note:: After the first call to read(), passthrough kwargs are
            not respected while using the same response iterator (i.e.
            until next seek).
@@ -604,6 +905,12 @@ class DXFile(DXDataObject):
                 raise DXFileError("Cannot read from file until it is in the closed state")
             self._file_length = int(desc["size"])
 
+        if not self._file_cache_checked:
+            self._file_cache_checked = True
+            file_cache = get_file_cache()
+            if file_cache is not None:
+                self._file_cache_fh = file_cache.open(self._dxid, self._file_length)
+
         # If running on a worker, wait for the first file download chunk
         # to come back before issuing any more requests. This ensures
         # that all subsequent requests can take advantage of caching,
@@ -623,6 +930,15 @@ class DXFile(DXDataObject):
         if length == None or length > self._file_length - self._pos:
             length = self._file_length - self._pos
 
+        if self._file_cache_fh is not None:
+            self._file_cache_fh.seek(self._pos)
+            data = self._file_cache_fh.read(length)
+            self._pos += len(data)
+            return data
+
+        if self._read_cache is not None:
+            return self._read_from_cache(self._read_cache, length, **kwargs)
+
         buf = self._read_buf
         buf_remaining_bytes = dxpy.utils.string_buffer_length(buf) - buf.tell()
         if length <= buf_remaining_bytes:
@@ -24,15 +24,21 @@ The following helper functions are useful shortcuts for interacting with File ob
 
 from __future__ import (print_function, unicode_literals)
 
-import os, sys, math, mmap, stat
+import os, sys, math, mmap, stat, threading, json
 
 import dxpy
 from . import dxfile, DXFile
+from ..exceptions import DXFileError
+from ..utils.file_cache import get_file_cache
 
-def open_dxfile(dxid, project=None, read_buffer_size=dxfile.DEFAULT_BUFFER_SIZE):
+DOWNLOAD_JOURNAL_SUFFIX = ".dxjournal"
+
+def open_dxfile(dxid, project=None, read_buffer_size=dxfile.DEFAULT_BUFFER_SIZE, adaptive=False):
     '''
     :param dxid: file ID
     :type dxid: string
+    :param adaptive: If True, request sizes and concurrency adapt to observed throughput (see :class:`~dxpy.bindings.dxfile.DXFile`)
+    :type adaptive: boolean
     :rtype: :class:`~dxpy.bindings.dxfile.DXFile`
 
     Given the object ID of an uploaded file, returns a remote file
@@ -49,12 +55,14 @@ def open_dxfile(dxid, project=None, read_buffer_size=dxfile.DEFAULT_BUFFER_SIZE)
       DXFile(dxid)
 
     '''
-    return DXFile(dxid, project=project, read_buffer_size=read_buffer_size)
+    return DXFile(dxid, project=project, read_buffer_size=read_buffer_size, adaptive=adaptive)
 
-def new_dxfile(mode=None, write_buffer_size=dxfile.DEFAULT_BUFFER_SIZE, **kwargs):
+def new_dxfile(mode=None, write_buffer_size=dxfile.DEFAULT_BUFFER_SIZE, adaptive=False, **kwargs):
     '''
     :param mode: One of "w" or "a" for write and append modes, respectively
     :type mode: string
+    :param adaptive: If True, part sizes and concurrency adapt to observed throughput (see :class:`~dxpy.bindings.dxfile.DXFile`)
+    :type adaptive: boolean
     :rtype: :class:`~dxpy.bindings.dxfile.DXFile`
 
     Additional optional parameters not listed: all those under
@@ -75,12 +83,145 @@ def new_dxfile(mode=None, write_buffer_size=dxfile.DEFAULT_BUFFER_SIZE, **kwargs
         dxFile.new(**kwargs)
 
     '''
-    dx_file = DXFile(mode=mode, write_buffer_size=write_buffer_size)
+    dx_file = DXFile(mode=mode, write_buffer_size=write_buffer_size, adaptive=adaptive)
     dx_file.new(**kwargs)
     return dx_file
 
+_seek_and_write_lock = threading.Lock()
+
+def _write_at_offset(fileno, data, offset):
+    """Writes all of *data* to the file descriptor *fileno* starting at
+    byte *offset*, without relying on (or disturbing, where os.pwrite is
+    available) the shared file position.
+
+    """
+    data = memoryview(data)
+    if hasattr(os, 'pwrite'):
+        while len(data) > 0:
+            bytes_written = os.pwrite(fileno, data, offset)
+            data, offset = data[bytes_written:], offset + bytes_written
+    else:
+        # Python 2 has no pwrite; serialize the seek+write pairs instead.
+        with _seek_and_write_lock:
+            os.lseek(fileno, offset, os.SEEK_SET)
+            while len(data) > 0:
+                bytes_written = os.write(fileno, data)
+                data = data[bytes_written:]
+
+def _get_missing_chunk_ranges(file_size, chunksize, completed_ranges=()):
+    """Yields (start, length) pairs for chunks of at most *chunksize*
+    bytes that together cover every byte in [0, *file_size*) that is not
+    covered by one of the (start, length) pairs in *completed_ranges*.
+
+    """
+    pos = 0
+    for start, length in sorted(completed_ranges) + [(file_size, 0)]:
+        while pos < start:
+            chunk_length = min(chunksize, start - pos)
+            yield pos, chunk_length
+            pos += chunk_length
+        pos = max(pos, start + length)
+
+def _download_dxfile_parallel(dxfile, fd, file_size, chunksize, max_inflight_bytes=None, completed_ranges=(),
+                              chunk_done_fn=None, progress_fn=None, **kwargs):
+    """Downloads the remote file associated with the handler *dxfile*
+    (of size *file_size*) into the open local file *fd*.
+
+    The local file is preallocated to its final size and the remote file
+    is fetched with ranged requests of *chunksize* bytes, issued through
+    the DXFile HTTP thread pool. Each chunk is written directly at its
+    final offset as soon as it arrives, so chunks may complete in any
+    order. At most *max_inflight_bytes* bytes are requested but not yet
+    written to disk at any time.
+
+    Byte ranges listed in *completed_ranges* are assumed to be present
+    in the local file already and are not fetched.
+
+    If supplied, *chunk_done_fn* is called (from the calling thread)
+    with (start, length) after each chunk has been written, and
+    *progress_fn* is called with (bytes downloaded, file size).
+
+    """
+    if max_inflight_bytes is None:
+        max_inflight_bytes = chunksize * dxfile._http_threadpool_size
+    max_inflight_bytes = max(max_inflight_bytes, chunksize)
+
+    fd.truncate(file_size)
+    fileno = fd.fileno()
+
+    def fetch_chunk(request, start_pos, length):
+        callable_, args, request_kwargs = request
+        content = callable_(*args, **request_kwargs)
+        if len(content) != length:
+            raise DXFileError("Expected %d bytes at offset %d of %s but received %d" %
+                              (length, start_pos, dxfile.get_id(), len(content)))
+        _write_at_offset(fileno, content, start_pos)
+        return start_pos, length
+
+    # Maps each outstanding future to the number of bytes it will write
+    futures = {}
+    state = {"inflight_bytes": 0,
+             "bytes_downloaded": sum(length for _start, length in completed_ranges)}
+
+    def reap_one():
+        future = dxpy.utils.wait_for_a_future(futures)
+        del futures[future]
+        start_pos, length = future.result()
+        state["inflight_bytes"] -= length
+        state["bytes_downloaded"] += length
+        if chunk_done_fn is not None:
+            chunk_done_fn(start_pos, length)
+        if progress_fn is not None:
+            progress_fn(state["bytes_downloaded"], file_size)
+
+    dxfile._ensure_http_threadpool()
+    try:
+        for start_pos, length in _get_missing_chunk_ranges(file_size, chunksize, completed_ranges):
+            while futures and state["inflight_bytes"] + length > max_inflight_bytes:
+                reap_one()
+            request = dxfile._get_range_request(start_pos, start_pos + length - 1, **kwargs)
+            future = dxfile._http_threadpool.submit_to_queue(id(dxfile), None, fetch_chunk, request, start_pos, length)
+            futures[future] = length
+            state["inflight_bytes"] += length
+        while futures:
+            reap_one()
+    except:
+        # Workers still hold the file descriptor; don't let the caller
+        # close it out from under them.
+        dxpy.utils.wait_for_all_futures(futures)
+        raise
+
+def _read_download_journal(journal_filename, dxid, file_size):
+    """Returns the list of (start, length) byte ranges that the journal
+    at *journal_filename* records as completely written, or None if there
+    is no journal or it describes a remote file other than *dxid* with
+    size *file_size*.
+
+    """
+    try:
+        with open(journal_filename) as fh:
+            lines = fh.read().splitlines()
+    except (IOError, OSError):
+        return None
+    try:
+        header = json.loads(lines[0])
+    except (IndexError, ValueError):
+        return None
+    if not isinstance(header, dict) or header.get("id") != dxid or header.get("size") != file_size:
+        return None
+    completed_ranges = []
+    for line in lines[1:]:
+        try:
+            start, length = json.loads(line)
+        except (ValueError, TypeError):
+            # Torn final line from a write that was interrupted
+            break
+        completed_ranges.append((start, length))
+    return completed_ranges
+
 def download_dxfile(dxid, filename, chunksize=dxfile.DEFAULT_BUFFER_SIZE, append=False, show_progress=False,
-                    project=None, **kwargs):
+                    project=None, parallel=False, max_inflight_bytes=None, resume=False, describe_output=None,
+                    **kwargs):
     '''
     :param dxid: Remote file ID
     :type dxid: string
@@ -88,10 +229,23 @@ def download_dxfile(dxid, filename, chunksize=dxfile.DEFAULT_BUFFER_SIZE, append
     :type filename: string
     :param append: If True, appends to the local file (default is to truncate local file if it exists)
     :type append: boolean
+    :param parallel: If True, downloads chunks concurrently and writes each one directly at its offset in the local file. Ignored if *append* is True or *filename* is not a regular file.
+    :type parallel: boolean
+    :param max_inflight_bytes: In parallel mode, the maximum number of bytes that may be requested but not yet written to disk (default: *chunksize* times the DXFile HTTP thread pool size)
+    :type max_inflight_bytes: int
+    :param resume: If True, downloads as in parallel mode while recording completed byte ranges in a journal file next to *filename* (named *filename* + ".dxjournal"). If a previous download of the same file was interrupted, only the ranges missing from its journal are fetched. The journal is removed when the download completes.
+    :type resume: boolean
+    :param describe_output: Description of the file, including at least its "state" and "size" (e.g. from a search with describe=True), to use instead of describing the file again
+    :type describe_output: dict
 
     Downloads the remote file with object ID *dxid* and saves it to
     *filename*.
 
+    If the on-disk file cache is enabled (see
+    :mod:`dxpy.utils.file_cache`), the contents are copied from the
+    cache when present there, and added to it after being downloaded.
+    The cache is not used if *append* is True.
+
     Example::
 
         download_dxfile("file-xxxx", "localfilename.fastq")
@@ -123,24 +277,84 @@ def download_dxfile(dxid, filename, chunksize=dxfile.DEFAULT_BUFFER_SIZE, append
     _bytes = 0
 
     mode = 'ab' if append else 'wb'
-    with DXFile(dxid, mode='r', project=project, read_buffer_size=chunksize) as dxfile, open(filename, mode) as fd:
-        if show_progress:
-            print_progress(0, None)
-        while True:
-            file_content = dxfile.read(chunksize, **kwargs)
-            if file_size is None:
-                file_size = dxfile._file_length
-
+    ranged = (parallel or resume) and not append
+    completed_ranges = None
+    journal_filename = filename + DOWNLOAD_JOURNAL_SUFFIX
+    file_cache = None if append else get_file_cache()
+    with DXFile(dxid, mode='r', project=project, read_buffer_size=chunksize) as dxfile:
+        if ranged or file_cache is not None:
+            desc = describe_output if describe_output is not None else dxfile.describe(**kwargs)
+            if desc["state"] != "closed":
+                raise DXFileError("Cannot read from file until it is in the closed state")
+            file_size = int(desc["size"])
+            dxfile._file_length = file_size
+            if file_cache is not None and file_cache.copy_to(dxfile.get_id(), file_size, filename):
+                if os.path.exists(journal_filename):
+                    os.remove(journal_filename)
+                if show_progress:
+                    print_progress(file_size, file_size)
+                    sys.stderr.write("\n")
+                return
+            if resume and os.path.isfile(filename):
+                completed_ranges = _read_download_journal(journal_filename, dxfile.get_id(), file_size)
+                if completed_ranges is not None:
+                    # Keep the partial contents instead of truncating them
+                    mode = 'r+b'
+
+        with open(filename, mode) as fd:
             if show_progress:
-                _bytes += len(file_content)
-                print_progress(_bytes, file_size)
-
-            if len(file_content) == 0:
+                print_progress(0, None)
+            if ranged and stat.S_ISREG(os.fstat(fd.fileno()).st_mode):
+                chunk_done_fn = None
+                journal = None
+                if resume:
+                    if completed_ranges is None:
+                        completed_ranges = []
+                        journal = open(journal_filename, 'w')
+                        journal.write(json.dumps({"id": dxfile.get_id(), "size": file_size}) + "\n")
+                    else:
+                        journal = open(journal_filename, 'a')
+
+                    def chunk_done_fn(start_pos, length):
+                        # Make sure the chunk itself is durable before
+                        # recording that it need not be fetched again.
+                        os.fsync(fd.fileno())
+                        journal.write(json.dumps([start_pos, length]) + "\n")
+                        journal.flush()
+                        os.fsync(journal.fileno())
+                try:
+                    _download_dxfile_parallel(dxfile, fd, file_size, chunksize, max_inflight_bytes=max_inflight_bytes,
+                                              completed_ranges=completed_ranges or (), chunk_done_fn=chunk_done_fn,
+                                              progress_fn=print_progress if show_progress else None, **kwargs)
+                finally:
+                    if journal is not None:
+                        journal.close()
+                if resume:
+                    os.remove(journal_filename)
                 if show_progress:
                     sys.stderr.write("\n")
-                break
-
-            fd.write(file_content)
+            else:
+                while True:
+                    file_content = dxfile.read(chunksize, **kwargs)
+                    if file_size is None:
+                        file_size = dxfile._file_length
+
+                    if show_progress:
+                        _bytes += len(file_content)
+                        print_progress(_bytes, file_size)
+
+                    if len(file_content) == 0:
+                        if show_progress:
+                            sys.stderr.write("\n")
+                        break
+
+                    fd.write(file_content)
+
+        if file_cache is not None and os.path.isfile(filename):
+            try:
+                file_cache.store(dxfile.get_id(), file_size, filename)
+            except (IOError, OSError) as e:
+                dxpy.logger.warn("Could not add %s to the file cache: %s", dxfile.get_id(), e)
 
 def _get_buffer_size_for_file(file_size, file_is_mmapd=False):
     """Returns an upload buffer size that is appropriate to use for a file
@@ -21,14 +21,15 @@ DXGTable Handler
 
 from __future__ import (print_function, unicode_literals)
 
-import os, sys, json, traceback
+import os, sys, traceback, collections, json
 import concurrent.futures
 
 import dxpy
-from . import DXDataObject
+from . import DXDataObject, _invalidates_describe_cache
 from ..exceptions import DXError
-from ..compat import StringIO
-from ..utils import warn
+from ..compat import StringIO, basestring
+from .. import compat
+from ..utils import warn, json_codec
 
 DXGTABLE_HTTP_THREADS = 4
 
@@ -53,6 +54,105 @@ DEFAULT_TABLE_WRITE_REQUEST_SIZE = 1024*1024*64 # bytes
 # Available in apps as dxpy.NULL
 NULL = - (1 << 31)
 
+# NumPy data types of the arrays holding the values of each type of
+# column (see DXGTable.iterate_row_batches)
+NUMPY_DTYPES = {"boolean": "bool", "uint8": "uint8", "int16": "int16", "uint16": "uint16", "int32": "int32",
+                "uint32": "uint32", "int64": "int64", "float": "float32", "double": "float64", "string": "object"}
+
+# Types of the columns in which NULL can be stored
+_NULLABLE_TYPES = {"int32", "int64", "float", "double"}
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise DXError("NumPy is required to use arrays of GTable column values; install it with \"pip install numpy\"")
+    return numpy
+
+def _make_masked_array(numpy, values, typename):
+    '''
+    Returns a masked array of the *values* of a column of type *typename*,
+    in which JSON nulls and (in the columns that can store it) NULL are
+    masked.
+    '''
+    mask = numpy.ma.nomask
+    if None in values:
+        mask = numpy.fromiter((value is None for value in values), dtype=bool, count=len(values))
+        if typename != "string":
+            values = [0 if value is None else value for value in values]
+    array = numpy.array(values, dtype=NUMPY_DTYPES.get(typename, "object"))
+    if typename in _NULLABLE_TYPES:
+        mask = numpy.ma.mask_or(mask, array == NULL)
+    return numpy.ma.masked_array(array, mask=mask)
+
+_BOOLEAN_TOKENS = {True: "true", False: "false"}
+
+# Python types of integers (values of NumPy arrays of uint32 and uint64
+# become longs on Python 2)
+_INTEGER_TYPES = {compat.builtin_int, compat.int}
+
+# Ranges of the values that can be stored in the integer columns
+_INTEGER_RANGES = {"uint8": (0, (1 << 8) - 1), "int16": (-(1 << 15), (1 << 15) - 1), "uint16": (0, (1 << 16) - 1),
+                   "int32": (-(1 << 31), (1 << 31) - 1), "uint32": (0, (1 << 32) - 1),
+                   "int64": (-(1 << 63), (1 << 63) - 1)}
+
+# NumPy kinds of arrays holding valid values of each type of column
+_NUMPY_KINDS = {"string": "USO", "boolean": "b", "float": "iuf", "double": "iuf"}
+
+def _get_column_tokens(values, column, index, validate=True):
+    '''
+    Returns the JSON encodings of the *values* (a sequence or NumPy
+    array) of the column *column*, which is the *index*-th column of the
+    table. Masked values are encoded as NULL.
+    '''
+    typename = column["type"]
+    mask = None
+    if hasattr(values, "dtype"):
+        if hasattr(values, "mask") and values.mask.any():
+            if typename not in _NULLABLE_TYPES:
+                raise ValueError("Column %d (%s) has masked values, which cannot be stored in a column of type %s" %
+                                 (index, column["name"], typename))
+            mask = values.mask.tolist()
+            values = values.data
+        kind = values.dtype.kind
+        if validate and kind not in _NUMPY_KINDS.get(typename, "iu"):
+            raise ValueError("Expected values in column %d (%s) to be of type %s, got an array of %s instead" %
+                             (index, column["name"], typename, values.dtype))
+        values = values.tolist()
+        if kind == "S":
+            values = [value.decode("utf-8") for value in values]
+    if validate:
+        types = set(map(type, values))
+        if typename == "string":
+            valid = all(issubclass(t, basestring) for t in types)
+        elif typename == "boolean":
+            valid = types <= {bool} | _INTEGER_TYPES and set(values) <= {True, False}
+        elif typename == "float" or typename == "double":
+            valid = types <= {float} | _INTEGER_TYPES
+        else:
+            valid = types <= _INTEGER_TYPES
+            if valid and typename in _INTEGER_RANGES and len(values) > 0:
+                low, high = _INTEGER_RANGES[typename]
+                if min(values) < low or max(values) > high:
+                    raise ValueError("Expected values in column %d (%s) to be of type %s, got values outside of "
+                                     "[%d, %d] instead" % (index, column["name"], typename, low, high))
+        if not valid:
+            raise ValueError("Expected values in column %d (%s) to be of type %s, got values of type %s instead" %
+                             (index, column["name"], typename, ", ".join(sorted(t.__name__ for t in types))))
+
+    if typename == "string":
+        tokens = list(map(json.encoder.encode_basestring_ascii, values))
+    elif typename == "boolean":
+        tokens = list(map(_BOOLEAN_TOKENS.__getitem__, values))
+    elif typename == "float" or typename == "double":
+        tokens = list(map(repr, map(float, values)))
+    else:
+        tokens = list(map(str, values))
+    if mask is not None:
+        null_token = str(NULL)
+        tokens = [null_token if masked else token for token, masked in zip(tokens, mask)]
+    return tokens
+
 class DXGTable(DXDataObject):
     '''
     Remote GTable object handler.
@@ -173,10 +273,10 @@ class DXGTable(DXDataObject):
                 if value != True and value != False:
                     raise ValueError("Expected value in column %d to be a boolean, got %r instead" % (index, value))
             elif column['type'] == 'float' or column['type'] == 'double':
-                if type(value) is not int and type(value) is not float:
+                if type(value) not in _INTEGER_TYPES and type(value) is not float:
                     raise ValueError("Expected value in column %d to be a number (int or float), got %r instead" % (index, value))
             elif column['type'].startswith('int') or column['type'].startswith('uint'):
-                if type(value) is not int:
+                if type(value) not in _INTEGER_TYPES:
                     raise ValueError("Expected value in column %d to be an int, got %r instead" % (index, value))
 
     def _new(self, dx_hash, **kwargs):
@@ -310,7 +410,7 @@ class DXGTable(DXDataObject):
             self._col_names = [col["name"] for col in self.get_columns(**kwargs)]
         return self._col_names
 
-    def iterate_rows(self, start=0, end=None, columns=None, want_dict=False, **kwargs):
+    def iterate_rows(self, start=0, end=None, columns=None, want_dict=False, stream_json=False, **kwargs):
         """
         :param start: The row ID of the first row to return
         :type start: integer
@@ -320,6 +420,8 @@ class DXGTable(DXDataObject):
         :type columns: list of strings
         :param want_dict: If True, return a mapping of column names to values, instead of an array of values
         :type want_dict: boolean
+        :param stream_json: If True, rows are yielded as soon as they have been received, rather than once all the rows of a request have been received (see the *stream_json_array* argument of :func:`dxpy.DXHTTPRequest`)
+        :type stream_json: boolean
         :rtype: generator
 
         Returns a generator that yields rows with IDs in the interval
@@ -334,32 +436,101 @@ class DXGTable(DXDataObject):
 
         DXGTable._ensure_http_threadpool()
 
-        request_iterator = self._generate_read_requests(start_row=start, end_row=end, columns=columns, **kwargs)
+        request_iterator = self._generate_read_requests(start_row=start, end_row=end, columns=columns,
+                                                        stream_json=stream_json, **kwargs)
 
         for response in dxpy.utils.response_iterator(request_iterator, self._http_threadpool, max_active_tasks=self._http_threadpool_size):
+            rows = response if stream_json else response['data']
             if want_dict:
-                for row in response['data']:
+                for row in rows:
                     yield dict(zip(col_names, row))
             else:
-                for row in response['data']:
+                for row in rows:
                     yield row
 
-    def iterate_query_rows(self, query=None, columns=None, limit=None, want_dict=False, **kwargs):
+    def iterate_row_batches(self, start=0, end=None, columns=None, as_arrays=True, **kwargs):
         """
-        :param query: Query with which to filter the rows. See :meth:`genomic_range_query()` and :meth:`lexicographic_query()`.
-        :type query: dict
+        :param start: The row ID of the first row to return
+        :type start: integer
+        :param end: Return all rows before this row (return all rows until the end if None)
+        :type end: integer or None
+        :param columns: List of column names to be included in the output. If not specified, the output contains the row ID (column ``__id__``) followed by all the columns.
+        :type columns: list of strings
+        :param as_arrays: If True, the values of each column are returned as a NumPy masked array (which requires NumPy); otherwise, as a list
+        :type as_arrays: boolean
+        :rtype: generator
+
+        Returns a generator that yields the rows with IDs in the interval
+        [*start*, *end*) in batches, one for each request made to the
+        API server. Each batch is an ordered mapping from the column
+        names to the values of that column in the batch, which avoids
+        creating an object for each row.
+
+        With *as_arrays*, the data type of each array follows the type of
+        the column (see :data:`NUMPY_DTYPES`; strings are stored as
+        objects), and null values are masked: :data:`NULL` in columns of
+        type int32, int64, float, or double, and JSON nulls in any
+        column.
+
+        Example::
+
+            for batch in dxgtable.iterate_row_batches(columns=["chr", "lo", "qual"]):
+                total_qual += batch["qual"].sum()
+
+        """
+        if as_arrays:
+            numpy = _import_numpy()
+            column_types = {column["name"]: column["type"] for column in self.get_columns(**kwargs)}
+            column_types["__id__"] = "int64"
+        col_names = ['__id__'] + self.get_col_names(**kwargs) if columns is None else columns
+
+        DXGTable._ensure_http_threadpool()
+
+        request_iterator = self._generate_read_requests(start_row=start, end_row=end, columns=columns, **kwargs)
+
+        for response in dxpy.utils.response_iterator(request_iterator, self._http_threadpool, max_active_tasks=self._http_threadpool_size):
+            rows = response['data']
+            if len(rows) == 0:
+                continue
+            batch = collections.OrderedDict()
+            for name, values in zip(col_names, zip(*rows)):
+                if as_arrays:
+                    batch[name] = _make_masked_array(numpy, values, column_types[name])
+                else:
+                    batch[name] = list(values)
+            yield batch
+
+    def iterate_query_rows(self, query=None, columns=None, limit=None, want_dict=False, num_windows=None, **kwargs):
+        """
+        :param query: Query with which to filter the rows, or a list of queries (e.g. one per chromosome) to be run concurrently. See :meth:`genomic_range_query()` and :meth:`lexicographic_query()`.
+        :type query: dict or list of dicts
         :param columns: List of column names to be included in the output. If not specified, each result contains the row ID followed by all column values. You can explicitly obtain the row ID by requesting the column ``__id__``.
         :type columns: list of strings
         :param limit: Maximum number of rows to return (default is to return all matching rows)
         :type limit: int
         :param want_dict: If True, return a mapping of column names to values, instead of an array of values
         :type want_dict: boolean
+        :param num_windows: If given, each genomic range query in "overlap" mode is split into this many windows of equal length, which are fetched concurrently
+        :type num_windows: int
         :rtype: generator
 
         Returns a generator that yields the rows of the table that match
         the given query parameters. If *query* is not given, all rows
         are returned in order of the row ID.
 
+        If *query* is a list, or *num_windows* is given, the queries and
+        windows are fetched concurrently using the GTable thread pool
+        (see :meth:`set_http_threadpool_size`), and their rows are
+        yielded in the order of the queries and then of the windows.
+        Each row belongs to the window that contains its low
+        coordinate, so rows overlapping several windows are yielded
+        once, and the rows of each window are held in memory until they
+        have been yielded. Windows are of equal length rather than of
+        equal number of rows, so the range should not extend much past
+        the data (for example, it can be bounded by the length of the
+        chromosome). Queries are not split into windows if *limit* is
+        small enough for each query to be fetched in a single request.
+
         Example::
 
             dxgtable = open_dxgtable(dxid)
@@ -372,6 +543,12 @@ class DXGTable(DXDataObject):
                 col_names = ['__id__'] + self.get_col_names(**kwargs)
             else:
                 col_names = columns
+        if isinstance(query, list) or num_windows is not None:
+            rows = self._iterate_query_rows_concurrently(query if isinstance(query, list) else [query], columns,
+                                                         limit, num_windows, **kwargs)
+            for row in rows:
+                yield dict(zip(col_names, row)) if want_dict else row
+            return
         cursor = 0
         returned = 0
         while cursor is not None:
@@ -393,14 +570,90 @@ class DXGTable(DXDataObject):
                     returned += 1
                     yield row
 
+    def _get_query_windows(self, query, num_windows, indices):
+        # Returns (query, min_lo, max_lo) for each window of a genomic
+        # range query, where the window keeps the rows whose low
+        # coordinate lies in [min_lo, max_lo) (None meaning unbounded)
+        if query is None or num_windows is None or query["parameters"].get("mode") != "overlap":
+            return [(query, None, None)]
+        index = indices.get(query["index"])
+        if index is None or index["type"] != "genomic":
+            return [(query, None, None)]
+        chr, lo, hi = query["parameters"]["coords"]
+        boundaries = sorted(set(lo + (hi - lo) * i // num_windows for i in range(num_windows)))
+        windows = []
+        for i, window_lo in enumerate(boundaries):
+            window_hi = boundaries[i + 1] if i + 1 < len(boundaries) else hi
+            windows.append((self.genomic_range_query(chr, window_lo, window_hi, mode="overlap", index=query["index"]),
+                            window_lo if i > 0 else None,
+                            window_hi if i + 1 < len(boundaries) else None))
+        return windows
+
+    def _get_window_rows(self, query, columns, limit, lo_column, min_lo, max_lo, strip_lo, **kwargs):
+        rows = []
+        cursor = 0
+        while cursor is not None and (limit is None or len(rows) < limit):
+            resp = self.get_rows(query=query, columns=columns, starting=cursor,
+                                 limit=(self._read_row_buffer_size if limit is None else
+                                        min(limit - len(rows), self._read_row_buffer_size)),
+                                 **kwargs)
+            if len(resp['data']) < 1:
+                break
+            for row in resp['data']:
+                if (min_lo is None or row[lo_column] >= min_lo) and (max_lo is None or row[lo_column] < max_lo):
+                    rows.append(row[:-1] if strip_lo else row)
+            cursor = resp['next']
+        return rows if limit is None else rows[:limit]
+
+    def _iterate_query_rows_concurrently(self, queries, columns, limit, num_windows, **kwargs):
+        if limit is not None and limit <= self._read_row_buffer_size:
+            # A single request per query returns all of the rows needed
+            num_windows = None
+        indices = {}
+        if num_windows is not None and any(query is not None and query["parameters"].get("mode") == "overlap"
+                                           for query in queries):
+            # Described once for all of the queries
+            indices = {index["name"]: index for index in self.describe(**kwargs).get("indices", [])}
+        windows = [window for query in queries for window in self._get_query_windows(query, num_windows, indices)]
+        lo_column, strip_lo = None, False
+        split_queries = [query for query, min_lo, max_lo in windows if min_lo is not None or max_lo is not None]
+        if split_queries:
+            # Rows are assigned to windows by their low coordinate, which
+            # is fetched even if it is not among the requested columns
+            lo_name = indices[split_queries[0]["index"]]["lo"]
+            if columns is None:
+                lo_column = 1 + self.get_col_names(**kwargs).index(lo_name)
+            elif lo_name in columns:
+                lo_column = columns.index(lo_name)
+            else:
+                columns = columns + [lo_name]
+                lo_column, strip_lo = -1, True
+
+        def request_iterator():
+            for query, min_lo, max_lo in windows:
+                window_kwargs = dict(kwargs)
+                window_kwargs.update(query=query, columns=columns, limit=limit, lo_column=lo_column, min_lo=min_lo,
+                                     max_lo=max_lo, strip_lo=strip_lo)
+                yield self._get_window_rows, [], window_kwargs
+
+        DXGTable._ensure_http_threadpool()
+
+        returned = 0
+        for rows in dxpy.utils.response_iterator(request_iterator(), self._http_threadpool,
+                                                 max_active_tasks=self._http_threadpool_size):
+            for row in rows:
+                yield row
+                returned += 1
+                if limit is not None and returned == limit:
+                    return
+
     def __iter__(self):
         return self.iterate_rows()
 
-    # TODO: make this consume recarrays
     def add_rows(self, data, part=None, validate=True, **kwargs):
         '''
-        :param data: List of rows to be added
-        :type data: List of lists, list of mappings from column names to values (TODO), or mapping from column names to lists of values (TODO)
+        :param data: List of rows to be added, or their values by column (see :meth:`add_rows_from_columns`)
+        :type data: List of lists, list of mappings from column names to values (TODO), mapping from column names to sequences of values, or NumPy record array
         :param part: The part ID to label the rows in data. Optional; it will be selected automatically if not given.
         :type part: integer
         :raises: :exc:`~dxpy.exceptions.DXGTableError`
@@ -418,6 +671,8 @@ class DXGTable(DXDataObject):
 
         '''
 
+        if hasattr(data, "keys") or getattr(getattr(data, "dtype", None), "names", None):
+            return self.add_rows_from_columns(data, part=part, validate=validate, **kwargs)
         if validate:
             for row in data:
                 self._check_row_is_valid(row)
@@ -426,15 +681,74 @@ class DXGTable(DXDataObject):
                 self._row_buf.append(row)
                 if len(self._row_buf) >= self._write_row_buffer_size:
                     self._flush_row_buf_to_string_buf()
-                    if self._string_row_buf.tell() > self._write_request_size:
-                        self._finalize_string_row_buf()
-                        request_data = self._string_row_buf.getvalue()
-                        self._string_row_buf = None
-                        self._async_add_rows_request(self._dxid, request_data, jsonify_data=False, **kwargs)
-                        del request_data
+                    self._send_full_string_row_buf(**kwargs)
         else:
             dxpy.api.gtable_add_rows(self._dxid, {"data": data, "part": part}, **kwargs)
 
+    def add_rows_from_columns(self, data, part=None, validate=True, **kwargs):
+        '''
+        :param data: Values of the rows to be added, by column
+        :type data: Mapping from each column name to a sequence or NumPy array of values, or NumPy record (or structured) array with a field for each column
+        :param part: The part ID to label the rows in data. Optional; it will be selected automatically if not given.
+        :type part: integer
+        :param validate: If True, checks that the type of the values of each column matches the type of the column
+        :type validate: boolean
+        :raises: :exc:`ValueError` if the columns do not match those of the GTable or contain values of the wrong type
+
+        Adds rows given as one sequence of values per column to the
+        current GTable, as :meth:`add_rows` does. Each column is
+        validated and serialized in one pass, without creating an
+        object for each row. In NumPy masked arrays, masked values are
+        stored as :data:`NULL` (only possible in columns of type int32,
+        int64, float, or double).
+
+        Example::
+
+            with new_dxgtable([dxpy.DXGTable.make_column_desc("chr", "string"),
+                               dxpy.DXGTable.make_column_desc("lo", "int32")], mode='w') as dxgtable:
+                dxgtable.add_rows_from_columns({"chr": ["chr1", "chr2"], "lo": numpy.array([100, 200])})
+
+        '''
+        if not hasattr(data, "keys"):
+            data = collections.OrderedDict((name, data[name]) for name in data.dtype.names)
+        columns = self.get_columns(**kwargs)
+        col_names = [column["name"] for column in columns]
+        if set(data.keys()) != set(col_names):
+            raise ValueError("Expected values for the columns %s, got values for %s instead" %
+                             (", ".join(col_names), ", ".join(data.keys())))
+        num_rows = len(data[col_names[0]])
+        for name in col_names:
+            if len(data[name]) != num_rows:
+                raise ValueError("Expected %d values for each column, got %d for column %s" %
+                                 (num_rows, len(data[name]), name))
+
+        # Rows are serialized in slices of the size of the row buffer, so
+        # that requests do not grow much past the maximum request size
+        slice_size = self._write_row_buffer_size if part is None else max(num_rows, 1)
+        for slice_start in range(0, num_rows, slice_size):
+            slice_end = slice_start + slice_size
+            token_columns = [_get_column_tokens(data[column["name"]][slice_start:slice_end], column, index,
+                                                validate=validate)
+                             for index, column in enumerate(columns)]
+            rows_string = "[" + "], [".join(map(", ".join, zip(*token_columns))) + "]"
+            if part is None:
+                # Keeps rows queued by add_rows in order
+                self._flush_row_buf_to_string_buf()
+                self._string_row_buf.write(rows_string)
+                self._string_row_buf.write(", ")
+                self._send_full_string_row_buf(**kwargs)
+            else:
+                request_data = '{"data": [%s], "part": %d}' % (rows_string, part)
+                dxpy.api.gtable_add_rows(self._dxid, request_data, jsonify_data=False, **kwargs)
+
+    def _send_full_string_row_buf(self, **kwargs):
+        if self._string_row_buf.tell() > self._write_request_size:
+            self._finalize_string_row_buf()
+            request_data = self._string_row_buf.getvalue()
+            self._string_row_buf = None
+            self._async_add_rows_request(self._dxid, request_data, jsonify_data=False, **kwargs)
+            del request_data
+
     def add_row(self, row, **kwargs):
         '''
         :param row: Row to be added
@@ -472,7 +786,7 @@ class DXGTable(DXDataObject):
             self._string_row_buf.write('{"data": [')
 
         if len(self._row_buf) > 0:
-            self._string_row_buf.write(json.dumps(self._row_buf)[1:])
+            self._string_row_buf.write(json_codec.dumps(self._row_buf)[1:])
             self._string_row_buf.seek(-1, os.SEEK_END) # chop off trailing "]"
             self._string_row_buf.write(", ")
             self._row_buf = []
@@ -516,6 +830,7 @@ class DXGTable(DXDataObject):
             finally:
                 self._http_threadpool_futures = set()
 
+    @_invalidates_describe_cache
     def close(self, block=False, **kwargs):
         '''
         :param block: If True, blocks until the remote GTable has closed
@@ -678,11 +993,14 @@ class DXGTable(DXDataObject):
         future = self._http_threadpool.submit(dxpy.api.gtable_add_rows, *args, **kwargs)
         self._http_threadpool_futures.add(future)
 
-    def _generate_read_requests(self, start_row=0, end_row=None, query=None, columns=None, **kwargs):
+    def _generate_read_requests(self, start_row=0, end_row=None, query=None, columns=None, stream_json=False,
+                                **kwargs):
         if end_row is None:
             end_row = int(self.describe(**kwargs)['length'])
         kwargs['query'] = query
         kwargs['columns'] = columns
+        if stream_json:
+            kwargs['stream_json_array'] = 'data'
         cursor = start_row
         while cursor < end_row:
             request_size = min(self._read_row_buffer_size, end_row - cursor)
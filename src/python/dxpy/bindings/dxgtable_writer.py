@@ -0,0 +1,195 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+'''
+Parallel Writer
+***************
+
+:class:`DXGTableParallelWriter` adds rows to a GTable from several worker
+processes, so that serializing and uploading the rows is not limited to
+one CPU core.
+
+'''
+
+from __future__ import (print_function, unicode_literals, division)
+
+import collections
+
+import dxpy
+from . import DXGTable
+
+# Number of rows in each part written by a worker process
+DEFAULT_PARALLEL_WRITE_PART_SIZE = 20000
+
+
+def _initialize_worker(apiserver_host, apiserver_port, apiserver_protocol, security_context):
+    # Worker processes that are not forked from the parent (e.g. on
+    # Windows) would otherwise only see the settings from the environment
+    dxpy.set_api_server_info(host=apiserver_host, port=apiserver_port, protocol=apiserver_protocol)
+    dxpy.set_security_context(security_context)
+
+
+def _write_part(dxid, columns, part, rows, validate, kwargs):
+    if validate:
+        dxgtable = DXGTable(dxid)
+        dxgtable._columns = columns
+        for row in rows:
+            dxgtable._check_row_is_valid(row)
+    kwargs = dict(kwargs)
+    kwargs.setdefault('always_retry', True)
+    dxpy.api.gtable_add_rows(dxid, {"data": rows, "part": part}, **kwargs)
+
+
+class DXGTableParallelWriter(object):
+    '''
+    :param dxgtable: GTable to add rows to
+    :type dxgtable: :class:`~dxpy.bindings.dxgtable.DXGTable`
+    :param num_processes: Number of worker processes (default: the number of CPUs)
+    :type num_processes: int
+    :param part_size: Number of rows in each part
+    :type part_size: int
+    :param validate: If True, the worker processes check that each row matches the columns of the GTable
+    :type validate: boolean
+
+    Adds rows to *dxgtable* from a pool of worker processes. Rows are
+    grouped into parts of *part_size* rows, whose part IDs are obtained
+    in the order in which the rows were added, and each part is
+    validated, serialized, and uploaded by one of the workers. Extra
+    keyword arguments are passed to the API calls made by the workers.
+
+    An exception raised while writing a part (after the retries made
+    by :func:`dxpy.DXHTTPRequest`) is reraised by the next call to
+    :meth:`add_rows` or :meth:`close`, and the workers are then stopped.
+    Used as a context manager, the writer closes the GTable on exit
+    unless an exception was raised.
+
+    Example::
+
+        with new_dxgtable(columns, mode='w') as dxgtable:
+            with DXGTableParallelWriter(dxgtable) as writer:
+                for row in rows:
+                    writer.add_row(row)
+
+    '''
+
+    def __init__(self, dxgtable, num_processes=None, part_size=DEFAULT_PARALLEL_WRITE_PART_SIZE, validate=True,
+                 **kwargs):
+        # Imported here since multiprocessing is slow to load, and is not
+        # otherwise needed by dxpy
+        import multiprocessing
+        self._dxgtable = dxgtable
+        self._num_processes = num_processes or multiprocessing.cpu_count()
+        self._part_size = part_size
+        self._validate = validate
+        self._kwargs = kwargs
+        # Workers need the columns to validate rows, and some are only
+        # known after describing the GTable
+        self._columns = dxgtable.get_columns(**kwargs) if validate else None
+        self._rows = []
+        self._pending_parts = collections.deque()
+        self._pool = multiprocessing.Pool(self._num_processes, _initialize_worker,
+                                          (dxpy.APISERVER_HOST, dxpy.APISERVER_PORT, dxpy.APISERVER_PROTOCOL,
+                                           dxpy.SECURITY_CONTEXT))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def _wait_for_oldest_part(self):
+        result = self._pending_parts.popleft()
+        try:
+            result.get()
+        except BaseException:
+            self.terminate()
+            raise
+
+    def _submit_part(self):
+        rows, self._rows = self._rows, []
+        part = self._dxgtable.get_unused_part_id(**self._kwargs)
+        while len(self._pending_parts) >= 2 * self._num_processes:
+            self._wait_for_oldest_part()
+        self._pending_parts.append(self._pool.apply_async(
+            _write_part, (self._dxgtable.get_id(), self._columns, part, rows, self._validate, self._kwargs)))
+
+    def add_rows(self, data):
+        '''
+        :param data: Rows to be added
+        :type data: list of lists
+
+        Queues rows to be added to the GTable. Blocks while the workers
+        have a backlog of more than two parts each.
+        '''
+        if self._pool is None:
+            raise dxpy.DXGTableError("Cannot add rows to a writer that has been closed")
+        while self._pending_parts and self._pending_parts[0].ready():
+            self._wait_for_oldest_part()
+        for row in data:
+            self._rows.append(row)
+            if len(self._rows) >= self._part_size:
+                self._submit_part()
+
+    def add_row(self, row):
+        '''
+        :param row: Row to be added
+        :type row: list
+        '''
+        self.add_rows([row])
+
+    def flush(self):
+        '''
+        Sends any queued rows to the workers and waits until all the
+        parts have been written.
+        '''
+        if self._rows:
+            self._submit_part()
+        while self._pending_parts:
+            self._wait_for_oldest_part()
+
+    def close(self, close_table=True, block=False):
+        '''
+        :param close_table: If True, closes the GTable once all the rows have been written
+        :type close_table: boolean
+        :param block: If True, waits until the GTable has closed
+        :type block: boolean
+
+        Waits until all the rows have been written and stops the
+        workers.
+        '''
+        if self._pool is None:
+            return
+        self.flush()
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+        if close_table:
+            self._dxgtable.close(block=block, **self._kwargs)
+
+    def terminate(self):
+        '''
+        Stops the workers without waiting for the rows that have not
+        been written yet.
+        '''
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+        self._pending_parts.clear()
+        self._rows = []
@@ -34,7 +34,6 @@ import os, time
 import dxpy
 from . import DXObject, DXDataObject, DXJobFailureError, verify_string_dxid
 from ..exceptions import DXError
-from ..utils.local_exec_utils import queue_entry_point
 
 #########
 # DXJob #
@@ -171,6 +170,9 @@ class DXJob(DXObject):
             resp = dxpy.api.job_new(req_input, **kwargs)
             self.set_id(resp["id"])
         else:
+            # Imported here since it is only needed (and slow to load)
+            # when running jobs locally
+            from ..utils.local_exec_utils import queue_entry_point
             self.set_id(queue_entry_point(function=fn_name, input_hash=fn_input,
                                           depends_on=final_depends_on,
                                           name=name))
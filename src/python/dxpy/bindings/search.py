@@ -22,10 +22,14 @@ provides search functionality over all data objects in the system. The
 (whether they are running, failed, or done).
 '''
 
-from __future__ import (print_function, unicode_literals)
+from __future__ import (print_function, unicode_literals, division)
+
+import copy, itertools, threading, time
 
 import dxpy
 from . import DXApplet, DXApp, DXWorkflow, DXProject, DXJob, DXAnalysis
+from ..compat import queue
+from ..utils.json_stream import JSONObjectStream
 from ..exceptions import DXError, DXSearchError
 
 
@@ -70,40 +74,194 @@ def resolve_data_objects(objects, project=None, folder=None, batchsize=1000):
     return results
 
 
-def _find(api_method, query, limit, return_handler, first_page_size, **kwargs):
-    ''' Takes an API method handler (dxpy.api.find...) and calls it with *query*, then wraps a generator around its
-    output. Used by the methods below.
-    '''
-    num_results = 0
+# Maximum number of pages that a prefetching search requests ahead of
+# the page being consumed
+FIND_PREFETCH_PAGES = 2
+
 
+def _iterate_pages(api_method, query, first_page_size, **kwargs):
     if "limit" not in query:
         query["limit"] = first_page_size
 
     while True:
         resp = api_method(query, **kwargs)
-
-        by_parent = resp.get('byParent')
-        descriptions = resp.get('describe')
-        def format_result(result):
-            if return_handler:
-                result = dxpy.get_handler(result['id'], project=result.get('project'))
-            if by_parent is not None:
-                return result, by_parent, descriptions
-            else:
-                return result
-
-        for i in resp["results"]:
-            if num_results == limit:
-                raise StopIteration()
-            num_results += 1
-            yield format_result(i)
+        yield resp
 
         # set up next query
-        if resp["next"] is not None:
-            query["starting"] = resp["next"]
-            query["limit"] = min(query["limit"]*2, 1000)
+        if isinstance(resp, JSONObjectStream):
+            # Available once the results have been consumed
+            next_page = resp.fields.get("next")
         else:
-            raise StopIteration()
+            next_page = resp["next"]
+        if next_page is None:
+            return
+        query["starting"] = next_page
+        query["limit"] = min(query["limit"]*2, 1000)
+
+
+class _PagePrefetcher(object):
+    '''
+    Iterates over the pages of a search while a background thread
+    requests them, keeping at most *max_pages* pages that have not yet
+    been consumed. Errors raised while requesting a page are re-raised
+    to the consumer when it reaches that page.
+    '''
+    def __init__(self, pages, max_pages=FIND_PREFETCH_PAGES):
+        self._queue = queue.Queue(maxsize=max_pages)
+        self._stopped = threading.Event()
+        thread = threading.Thread(target=self._run, args=(pages,))
+        thread.daemon = True
+        thread.start()
+
+    def _put(self, item):
+        # Waits for room in the queue, giving up if the consumer has gone away
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self, pages):
+        try:
+            for page in pages:
+                if not self._put((page, None)):
+                    return
+        except Exception as e:
+            self._put((None, e))
+            return
+        self._put((None, None))
+
+    def __iter__(self):
+        while True:
+            page, error = self._queue.get()
+            if error is not None:
+                raise error
+            if page is None:
+                return
+            yield page
+
+    def stop(self):
+        self._stopped.set()
+
+
+def _get_time_shard_queries(query, shard_field, time_shards):
+    '''
+    Splits *query* into one query per time window of *shard_field* (either
+    "created" or "modified"). *time_shards* is either a list of boundary
+    timestamps or a number of windows of equal length between the lower
+    bound already in the query (or the creation time of the project
+    searched) and now. The first and last windows are open-ended, so that
+    together the windows cover exactly what the original query covers.
+    '''
+    if shard_field not in ("created", "modified"):
+        raise DXError('_find: shard_field must be "created" or "modified"')
+    window = query.get(shard_field, {})
+    lower, upper = window.get("after"), window.get("before")
+
+    if isinstance(time_shards, int):
+        if time_shards < 1:
+            raise DXError('_find: time_shards must be a positive integer')
+        start = lower
+        if start is None:
+            project = query.get("scope", {}).get("project") or query.get("project")
+            if project is None:
+                raise DXError('_find: a lower time bound or a project is required to split a search into ' +
+                              'time_shards windows')
+            start = dxpy.api.project_describe(project, {"fields": {"created": True}})["created"]
+        end = upper if upper is not None else int(time.time()*1000)
+        boundaries = [start + (end - start) * i // time_shards for i in range(1, time_shards)]
+    else:
+        boundaries = sorted(dxpy.utils.normalize_time_input(boundary) for boundary in time_shards)
+    boundaries = [boundary for boundary in boundaries
+                  if (lower is None or boundary > lower) and (upper is None or boundary <= upper)]
+
+    # "after" and "before" are both inclusive, so each window ends 1 ms
+    # before the next one starts
+    queries = []
+    for after, next_after in zip([lower] + boundaries, boundaries + [None]):
+        shard_query = copy.deepcopy(query)
+        shard_query[shard_field] = {}
+        if after is not None:
+            shard_query[shard_field]["after"] = after
+        if next_after is not None:
+            shard_query[shard_field]["before"] = next_after - 1
+        elif upper is not None:
+            shard_query[shard_field]["before"] = upper
+        queries.append(shard_query)
+    return queries
+
+
+def _find(api_method, query, limit, return_handler, first_page_size, prefetch=False, time_shards=None,
+          shard_field="created", stream_json=False, **kwargs):
+    ''' Takes an API method handler (dxpy.api.find...) and calls it with *query*, then wraps a generator around its
+    output. Used by the methods below.
+
+    If *prefetch* is True, the next pages are requested in the background
+    while the current one is being consumed. If *time_shards* is given,
+    the search is split into time windows (see
+    :func:`_get_time_shard_queries`) that are all requested concurrently,
+    with prefetching; results are yielded one window after the other,
+    oldest first.
+
+    If *stream_json* is True, each result is yielded as soon as it has
+    been received (see the *stream_json_array* argument of
+    :func:`dxpy.DXHTTPRequest`); the next page can then only be requested
+    once the current one has been consumed, so this cannot be combined
+    with *prefetch* or *time_shards*.
+    '''
+    num_results = 0
+
+    if stream_json:
+        if prefetch or time_shards is not None:
+            raise DXError('_find: stream_json cannot be combined with prefetch or time_shards')
+        kwargs['stream_json_array'] = 'results'
+
+    if time_shards is not None:
+        queries = _get_time_shard_queries(query, shard_field, time_shards)
+    else:
+        queries = [query]
+    if prefetch or len(queries) > 1:
+        prefetchers = [_PagePrefetcher(_iterate_pages(api_method, q, first_page_size, **kwargs)) for q in queries]
+        pages = itertools.chain.from_iterable(prefetchers)
+    else:
+        prefetchers = []
+        pages = _iterate_pages(api_method, query, first_page_size, **kwargs)
+
+    resp = None
+    try:
+        for resp in pages:
+            if isinstance(resp, JSONObjectStream):
+                # Only the fields preceding the results are known at
+                # this point
+                by_parent = resp.fields.get('byParent')
+                descriptions = resp.fields.get('describe')
+                results = resp
+            else:
+                by_parent = resp.get('byParent')
+                descriptions = resp.get('describe')
+                results = resp["results"]
+            def format_result(result):
+                if return_handler:
+                    result = dxpy.get_handler(result['id'], project=result.get('project'))
+                if by_parent is not None:
+                    return result, by_parent, descriptions
+                else:
+                    return result
+
+            for i in results:
+                if num_results == limit:
+                    return
+                num_results += 1
+                yield format_result(i)
+    finally:
+        for prefetcher in prefetchers:
+            prefetcher.stop()
+        if isinstance(resp, JSONObjectStream):
+            # Releases the connection if the results were not all consumed
+            resp.close()
+
 
 def find_data_objects(classname=None, state=None, visibility=None,
                       name=None, name_mode='exact', properties=None,
@@ -113,6 +271,7 @@ def find_data_objects(classname=None, state=None, visibility=None,
                       created_after=None, created_before=None,
                       describe=False, limit=None, level=None,
                       return_handler=False, first_page_size=100,
+                      prefetch=False, time_shards=None, shard_field="created", stream_json=False,
                       **kwargs):
     """
     :param classname:
@@ -165,6 +324,14 @@ def find_data_objects(classname=None, state=None, visibility=None,
     :type first_page_size: int
     :param return_handler: If True, yields results as dxpy object handlers (otherwise, yields each result as a dict with keys "id" and "project")
     :type return_handler: boolean
+    :param prefetch: If True, the next pages of results are requested in the background while the current one is being consumed
+    :type prefetch: boolean
+    :param time_shards: Number of time windows of equal length, or list of timestamps separating the windows, into which to split the search; the windows are searched concurrently. Splitting into a number of windows requires *project* or a lower bound on *shard_field*.
+    :type time_shards: int or list
+    :param shard_field: Timestamp by which to split the search into *time_shards* windows ("created" or "modified")
+    :type shard_field: string
+    :param stream_json: If True, each result is yielded as soon as it has been received rather than once its whole page has been received; cannot be combined with *prefetch* or *time_shards*
+    :type stream_json: boolean
     :rtype: generator
 
     Returns a generator that yields all data objects matching the query,
@@ -187,6 +354,11 @@ def find_data_objects(classname=None, state=None, visibility=None,
            items1 = list(find_data_objects(created_before="-1w"))
            items2 = list(find_data_objects(created_before=-7*24*60*60*1000))
 
+    .. note:: When *time_shards* is given, results are yielded one time
+       window after the other, oldest window first, rather than in the
+       order of an unsplit search. Splitting by "modified" may miss or
+       repeat objects that are modified while the search is running.
+
     This example iterates through all GenomicTables with property
     "project" set to "cancer project" and prints their object IDs::
 
@@ -257,7 +429,9 @@ def find_data_objects(classname=None, state=None, visibility=None,
     if limit is not None:
         query["limit"] = limit
 
-    return _find(dxpy.api.system_find_data_objects, query, limit, return_handler, first_page_size, **kwargs)
+    return _find(dxpy.api.system_find_data_objects, query, limit, return_handler, first_page_size,
+                 prefetch=prefetch, time_shards=time_shards, shard_field=shard_field, stream_json=stream_json,
+                 **kwargs)
 
 
 def find_executions(classname=None, launched_by=None, executable=None, project=None,
@@ -266,7 +440,7 @@ def find_executions(classname=None, launched_by=None, executable=None, project=N
                     created_after=None, created_before=None, describe=False,
                     name=None, name_mode="exact", tags=None, properties=None, limit=None,
                     first_page_size=100, return_handler=False, include_subjobs=True,
-                    **kwargs):
+                    prefetch=False, time_shards=None, stream_json=False, **kwargs):
     '''
     :param classname:
         Class with which to restrict the search, i.e. one of "job",
@@ -320,6 +494,12 @@ def find_executions(classname=None, launched_by=None, executable=None, project=N
     :type return_handler: boolean
     :param include_subjobs: If False, no subjobs will be returned by the API
     :type include_subjobs: boolean
+    :param prefetch: If True, the next pages of results are requested in the background while the current one is being consumed
+    :type prefetch: boolean
+    :param time_shards: Number of windows of creation time of equal length, or list of timestamps separating the windows, into which to split the search; the windows are searched concurrently and their results yielded oldest window first. Splitting into a number of windows requires *project* or *created_after*.
+    :type time_shards: int or list
+    :param stream_json: If True, each result is yielded as soon as it has been received rather than once its whole page has been received; cannot be combined with *prefetch* or *time_shards*
+    :type stream_json: boolean
     :rtype: generator
 
     Returns a generator that yields all executions (jobs or analyses) that match the query. It transparently handles
@@ -409,7 +589,8 @@ def find_executions(classname=None, launched_by=None, executable=None, project=N
     if limit is not None:
         query["limit"] = limit
 
-    return _find(dxpy.api.system_find_executions, query, limit, return_handler, first_page_size, **kwargs)
+    return _find(dxpy.api.system_find_executions, query, limit, return_handler, first_page_size,
+                 prefetch=prefetch, time_shards=time_shards, stream_json=stream_json, **kwargs)
 
 def find_jobs(*args, **kwargs):
     """
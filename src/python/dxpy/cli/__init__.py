@@ -21,12 +21,23 @@ almost exclusively by command-line tools such as dx.
 
 from __future__ import (print_function, unicode_literals)
 
-import sys
+import os, sys
 
 INTERACTIVE_CLI = True if sys.stdin.isatty() and sys.stdout.isatty() else False
 
+import dxpy
 from ..exceptions import err_exit, default_expected_exceptions, DXError
-from ..compat import input
+from ..compat import input, environ
+
+def get_daemon_socket_path():
+    '''
+    :returns: Path of the socket on which the dx daemon (see :mod:`dxpy.cli.daemon`) listens
+    :rtype: string
+
+    Defined here rather than in :mod:`dxpy.cli.daemon` so that dx can
+    check whether the socket exists without loading the daemon client.
+    '''
+    return environ.get('DX_DAEMON_SOCKET') or os.path.join(dxpy.config.get_user_conf_dir(), 'daemon', 'dx.sock')
 
 def try_call_err_exit():
     err_exit(expected_exceptions=default_expected_exceptions + (DXError,))
@@ -0,0 +1,617 @@
+# Copyright (C) 2014-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+'''
+This module implements the dx daemon (see ``dx-daemon``), a background
+process that has dxpy and the dx client already loaded, and that runs
+dx commands for ``dx`` invocations that connect to it over a Unix
+socket, so that scripts that run dx many times do not pay for starting
+it each time.
+
+The client sends its arguments, environment, working directory, and
+standard input, output, and error file descriptors. The daemon forks a
+process that takes them over and runs the command, so that the command
+behaves as it would have in the client process, and sends back its exit
+code, with which the client exits.
+
+The HTTP requests of the commands are made by a long-lived process of
+the daemon, to which the commands send them over a second Unix socket,
+so that connections to the API server and storage endpoints are kept
+open from one command to the next. The on-disk caches (see
+:mod:`dxpy.utils.file_cache` and :mod:`dxpy.utils.completion_cache`)
+are shared with commands run in the client process, as usual.
+
+Only non-interactive invocations of dx (whose standard input or output
+is not a terminal) are run in the daemon. Settings that dxpy reads from
+the environment when it is first imported (such as DX_JSON_BACKEND) are
+those of the daemon.
+
+.. envvar:: DX_DAEMON_SOCKET
+
+   Path of the socket on which the daemon listens (default:
+   ~/.dnanexus_config/daemon/dx.sock)
+'''
+
+from __future__ import (print_function, unicode_literals)
+
+import os, sys, io, json, socket, select, signal, struct, errno
+import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.response import HTTPResponse
+
+import dxpy
+from . import INTERACTIVE_CLI, get_daemon_socket_path
+from ..compat import USING_PYTHON2, environ
+from ..exceptions import DXError, err_exit, format_exception
+
+# Number of seconds to wait for a newly started daemon to accept
+# connections
+DAEMON_START_TIMEOUT = 30
+
+# True in the daemon process and the processes forked from it
+_serving = False
+
+
+def get_socket_path():
+    '''
+    :returns: Path of the socket on which the daemon listens
+    :rtype: string
+    '''
+    return get_daemon_socket_path()
+
+
+def get_log_path(socket_path):
+    '''
+    :returns: Path of the file to which the daemon listening on *socket_path* logs errors
+    :rtype: string
+    '''
+    return os.path.splitext(socket_path)[0] + '.log'
+
+
+# Messages are JSON objects preceded by their length. Each file
+# descriptor is sent (as ancillary data) in a message of its own,
+# consisting of one byte
+
+def _send_message(sock, message):
+    data = json.dumps(message).encode('utf-8')
+    sock.sendall(struct.pack(b'!I', len(data)) + data)
+
+
+def _receive_exactly(sock, size):
+    chunks, received = [], 0
+    while received < size:
+        try:
+            chunk = sock.recv(min(size - received, 1024 * 1024))
+        except socket.error as e:
+            if e.errno == errno.EINTR:
+                continue
+            raise
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        received += len(chunk)
+    return b''.join(chunks)
+
+
+def _receive_message(sock):
+    header = _receive_exactly(sock, 4)
+    if header is None:
+        return None
+    data = _receive_exactly(sock, struct.unpack(b'!I', header)[0])
+    if data is None:
+        return None
+    return json.loads(data.decode('utf-8'))
+
+
+def _send_fd(sock, fd):
+    if USING_PYTHON2:
+        from _multiprocessing import sendfd
+        sendfd(sock.fileno(), fd)
+    else:
+        import array
+        sock.sendmsg([b'F'], [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array('i', [fd]))])
+
+
+def _receive_fd(sock):
+    if USING_PYTHON2:
+        from _multiprocessing import recvfd
+        return recvfd(sock.fileno())
+    import array
+    fds = array.array('i')
+    _, ancillary_data, _, _ = sock.recvmsg(1, socket.CMSG_LEN(fds.itemsize))
+    for level, message_type, data in ancillary_data:
+        if level == socket.SOL_SOCKET and message_type == socket.SCM_RIGHTS:
+            fds.frombytes(data[:fds.itemsize])
+            return fds[0]
+    raise DXError('Expected a file descriptor from the dx client')
+
+
+def _connect(socket_path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+    except:
+        sock.close()
+        raise
+    return sock
+
+
+def _is_same_user(sock):
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return True
+    _, uid, _ = struct.unpack(b'3i', sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize(b'3i')))
+    return uid == os.getuid()
+
+
+def _get_requests_socket_path(socket_path):
+    # Socket on which the daemon makes HTTP requests for the commands it
+    # runs
+    return socket_path + '.requests'
+
+
+def _to_text(value):
+    # Header names and values may be bytes, which are sent as the
+    # characters of the same code points, as http.client would
+    return value.decode('latin-1') if isinstance(value, bytes) else value
+
+
+def _to_native_string(value):
+    return value.encode('latin-1') if USING_PYTHON2 else value
+
+
+class _DaemonHTTPAdapter(HTTPAdapter):
+    '''
+    HTTPAdapter that has the daemon make its requests, so that commands
+    run in the daemon reuse the connections it keeps open. Requests that
+    cannot be sent to the daemon are made directly.
+    '''
+    def __init__(self, requests_socket_path, **kwargs):
+        HTTPAdapter.__init__(self, **kwargs)
+        self.requests_socket_path = requests_socket_path
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        body = request.body
+        if body is not None and not isinstance(body, bytes):
+            # Streamed and file-like bodies are not forwarded
+            return HTTPAdapter.send(self, request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                    proxies=proxies)
+        try:
+            message = json.dumps({'method': _to_text(request.method), 'url': _to_text(request.url),
+                                  'headers': [[_to_text(name), _to_text(value)]
+                                              for name, value in request.headers.items()],
+                                  'body_length': None if body is None else len(body),
+                                  'timeout': timeout, 'verify': verify, 'cert': cert, 'proxies': proxies})
+        except (TypeError, ValueError):
+            message = None
+        try:
+            sock = None if message is None else _connect(self.requests_socket_path)
+        except socket.error:
+            sock = None
+        if sock is None:
+            return HTTPAdapter.send(self, request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                                    proxies=proxies)
+        try:
+            data = message.encode('utf-8')
+            sock.sendall(struct.pack(b'!I', len(data)) + data)
+            if body is not None:
+                sock.sendall(body)
+            reply = _receive_message(sock)
+            content = b'' if reply is None or 'error' in reply else _receive_exactly(sock, reply['body_length'])
+        except socket.error as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        finally:
+            sock.close()
+        if reply is None or content is None:
+            raise requests.exceptions.ConnectionError('Lost the connection to the dx daemon', request=request)
+        if 'error' in reply:
+            error_class = getattr(requests.exceptions, reply['error'], None)
+            if not (isinstance(error_class, type) and issubclass(error_class, requests.exceptions.RequestException)):
+                error_class = requests.exceptions.ConnectionError
+            raise error_class(reply['message'], request=request)
+        # The body is as received by the daemon, and is decoded here
+        # as it would have been had the request been made directly
+        response = HTTPResponse(body=io.BytesIO(content), headers=reply['headers'], status=reply['status'],
+                                reason=reply['reason'], preload_content=False)
+        return self.build_response(request, response)
+
+
+def _proxy_request(sock, session):
+    # Makes the request received on *sock* with *session*, and sends
+    # back the response
+    try:
+        if not _is_same_user(sock):
+            return
+        message = _receive_message(sock)
+        if message is None:
+            return
+        body = None
+        if message['body_length'] is not None:
+            body = _receive_exactly(sock, message['body_length'])
+            if body is None:
+                return
+        request = requests.PreparedRequest()
+        request.method, request.url = _to_native_string(message['method']), _to_native_string(message['url'])
+        request.headers = requests.structures.CaseInsensitiveDict(
+            [(_to_native_string(name), _to_native_string(value)) for name, value in message['headers']])
+        request.body = body
+        options = {name: tuple(value) if isinstance(value, list) else value
+                   for name, value in message.items() if name in ('timeout', 'verify', 'cert', 'proxies')}
+        try:
+            response = session.get_adapter(request.url).send(request, stream=True, **options)
+            try:
+                content = response.raw.read(decode_content=False)
+            finally:
+                response.close()
+        except Exception as e:
+            _send_message(sock, {'error': e.__class__.__name__, 'message': str(e)})
+            return
+        _send_message(sock, {'status': response.status_code, 'reason': response.reason,
+                             'headers': list(response.raw.headers.items()), 'body_length': len(content)})
+        sock.sendall(content)
+    except Exception as e:
+        print(format_exception(e), file=sys.stderr)
+    finally:
+        sock.close()
+
+
+def _serve_requests(listener, daemon_pid):
+    # Runs in a process forked from the daemon, which keeps the
+    # connections used by the commands the daemon runs open. Each
+    # request is handled in a thread of its own.
+    import threading
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    session = dxpy.SESSION_HANDLERS[os.getpid()]
+    while os.getppid() == daemon_pid:
+        try:
+            readable, _, _ = select.select([listener], [], [], 1)
+            if not readable:
+                continue
+            sock, _ = listener.accept()
+        except (select.error, socket.error) as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+        thread = threading.Thread(target=_proxy_request, args=(sock, session))
+        thread.daemon = True
+        thread.start()
+
+
+def _get_exit_code(system_exit):
+    # As the interpreter would exit on SystemExit
+    if system_exit.code is None:
+        return 0
+    try:
+        return int(system_exit.code)
+    except (TypeError, ValueError):
+        print(system_exit.code, file=sys.stderr)
+        return 1
+
+
+def _run_command(request):
+    # Runs in the process forked for the command, once the file
+    # descriptors of the client have been put in place
+    from ..scripts import dx
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        os.chdir(request['cwd'])
+        environ.clear()
+        environ.update(request['env'])
+        # Configuration changes (e.g. from "dx cd") are saved for the
+        # session of the client, not that of the daemon
+        dxpy.config._session_conf_dir = request['session_conf_dir']
+        dxpy.config.__init__(suppress_warning=True)
+        session = dxpy.SESSION_HANDLERS[os.getpid()]
+        for prefix in ('http://', 'https://'):
+            session.mount(prefix, _DaemonHTTPAdapter(request['requests_socket_path']))
+        sys.argv = ['dx'] + request['argv']
+        dx.args_list = request['argv']
+        dx.main()
+        exit_code = 0
+    except SystemExit as e:
+        exit_code = _get_exit_code(e)
+    except KeyboardInterrupt:
+        exit_code = 128 + signal.SIGINT
+    except Exception as e:
+        print(format_exception(e), file=sys.stderr)
+        exit_code = 1
+    for stream in sys.stdout, sys.stderr:
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    return exit_code
+
+
+def _wait_for_command(sock, pid, exit_pipe):
+    # Waits for the process running the command to exit, and terminates
+    # it if the client disconnects first. Returns its exit code as the
+    # shell would report it
+    client_connected = True
+    while True:
+        try:
+            readable, _, _ = select.select([exit_pipe] + ([sock] if client_connected else []), [], [])
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                continue
+            raise
+        if exit_pipe in readable:
+            break
+        try:
+            client_connected = len(sock.recv(1)) > 0
+        except socket.error:
+            client_connected = False
+        if not client_connected:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+    while True:
+        try:
+            _, status = os.waitpid(pid, 0)
+            break
+        except OSError as e:
+            if e.errno != errno.EINTR:
+                raise
+    if os.WIFSIGNALED(status):
+        return 128 + os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def _handle_connection(sock, daemon_status):
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if not _is_same_user(sock):
+        return
+    request = _receive_message(sock)
+    if request is None:
+        return
+    if request.get('command') == 'status':
+        _send_message(sock, daemon_status)
+        return
+    if request.get('command') == 'stop':
+        os.kill(os.getppid(), signal.SIGTERM)
+        _send_message(sock, {'stopped': True})
+        return
+    if request.get('version') != dxpy.TOOLKIT_VERSION:
+        # The client is then run in its own process
+        _send_message(sock, {'error': 'The dx daemon is running version {v} of dxpy'.format(v=dxpy.TOOLKIT_VERSION)})
+        return
+
+    request['requests_socket_path'] = daemon_status['requests_socket_path']
+    fds = [_receive_fd(sock) for _ in range(3)]
+    exit_pipe_r, exit_pipe_w = os.pipe()
+    import fcntl
+    fcntl.fcntl(exit_pipe_w, fcntl.F_SETFD, fcntl.fcntl(exit_pipe_w, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            sock.close()
+            os.close(exit_pipe_r)
+            for target_fd, fd in enumerate(fds):
+                os.dup2(fd, target_fd)
+                os.close(fd)
+            exit_code = _run_command(request)
+        finally:
+            os._exit(exit_code)
+    os.close(exit_pipe_w)
+    for fd in fds:
+        os.close(fd)
+    _send_message(sock, {'pid': pid})
+    _send_message(sock, {'exit': _wait_for_command(sock, pid, exit_pipe_r)})
+
+
+def serve(socket_path):
+    '''
+    :param socket_path: Path of the socket on which to listen
+    :type socket_path: string
+
+    Runs the daemon in this process until it receives SIGTERM or a
+    request to stop.
+    '''
+    global _serving
+    _serving = True
+    # Commands are only run in the daemon for clients that are not
+    # interactive, whatever this process is attached to
+    from .. import cli
+    cli.INTERACTIVE_CLI = False
+    # Loads the dx client up front, so that it is already loaded in the
+    # process forked for each command
+    argv, sys.argv = sys.argv, ['dx']
+    from ..scripts import dx
+    sys.argv = argv
+
+    if get_daemon_status(socket_path) is not None:
+        raise DXError('A dx daemon is already listening on ' + socket_path)
+    requests_socket_path = _get_requests_socket_path(socket_path)
+    for path in socket_path, requests_socket_path:
+        if os.path.exists(path):
+            os.remove(path)
+    requests_listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    requests_listener.bind(requests_socket_path)
+    requests_listener.listen(128)
+    # Requests are made in a separate process, since the threads that
+    # make them must not be running when the daemon forks
+    daemon_pid = os.getpid()
+    requests_pid = os.fork()
+    if requests_pid == 0:
+        try:
+            _serve_requests(requests_listener, daemon_pid)
+        finally:
+            os._exit(0)
+    requests_listener.close()
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    # Reaps the processes forked for each connection
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    daemon_status = {'pid': daemon_pid, 'version': dxpy.TOOLKIT_VERSION, 'connections': 0,
+                     'requests_socket_path': requests_socket_path}
+    try:
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except socket.error as e:
+                if e.errno == errno.EINTR:
+                    continue
+                raise
+            daemon_status['connections'] += 1
+            if os.fork() == 0:
+                exit_code = 1
+                try:
+                    listener.close()
+                    _handle_connection(sock, daemon_status)
+                    exit_code = 0
+                except Exception as e:
+                    print(format_exception(e), file=sys.stderr)
+                finally:
+                    os._exit(exit_code)
+            sock.close()
+    finally:
+        listener.close()
+        try:
+            os.kill(requests_pid, signal.SIGTERM)
+        except OSError:
+            pass
+        for path in socket_path, requests_socket_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def get_daemon_status(socket_path):
+    '''
+    :param socket_path: Path of the socket on which the daemon listens
+    :type socket_path: string
+    :returns: The process ID and dxpy version of the daemon and the number of connections it has accepted, or None if no daemon is listening
+    :rtype: dict
+    '''
+    try:
+        sock = _connect(socket_path)
+    except socket.error:
+        return None
+    try:
+        _send_message(sock, {'command': 'status'})
+        return _receive_message(sock)
+    except socket.error:
+        return None
+    finally:
+        sock.close()
+
+
+def start_daemon(socket_path):
+    '''
+    :param socket_path: Path of the socket on which to listen
+    :type socket_path: string
+    :raises: :exc:`~dxpy.exceptions.DXError` if a daemon is already listening on *socket_path* or the daemon fails to start
+
+    Starts a daemon in the background, and waits until it accepts
+    connections.
+    '''
+    import subprocess, time
+    if get_daemon_status(socket_path) is not None:
+        raise DXError('A dx daemon is already listening on ' + socket_path)
+    socket_dir = os.path.dirname(os.path.abspath(socket_path))
+    if not os.path.isdir(socket_dir):
+        os.makedirs(socket_dir, 0o700)
+    log_path = get_log_path(socket_path)
+    with open(os.devnull, 'r+b') as devnull, open(log_path, 'ab') as log:
+        daemon = subprocess.Popen([sys.executable, '-m', 'dxpy.scripts.dx_daemon', 'run', '--socket', socket_path],
+                                  stdin=devnull, stdout=devnull, stderr=log, close_fds=True, preexec_fn=os.setsid)
+    deadline = time.time() + DAEMON_START_TIMEOUT
+    while get_daemon_status(socket_path) is None:
+        if daemon.poll() is not None or time.time() > deadline:
+            raise DXError('The dx daemon failed to start; see ' + log_path)
+        time.sleep(0.05)
+
+
+def stop_daemon(socket_path):
+    '''
+    :param socket_path: Path of the socket on which the daemon listens
+    :type socket_path: string
+    :returns: False if no daemon was listening on *socket_path*, and True otherwise
+    :rtype: boolean
+
+    Stops the daemon, and waits until it no longer accepts connections.
+    '''
+    import time
+    try:
+        sock = _connect(socket_path)
+    except socket.error:
+        return False
+    try:
+        _send_message(sock, {'command': 'stop'})
+        _receive_message(sock)
+    finally:
+        sock.close()
+    while get_daemon_status(socket_path) is not None:
+        time.sleep(0.05)
+    return True
+
+
+def run_in_daemon():
+    '''
+    If a daemon is listening on :func:`get_socket_path()`, and dx is not
+    being run interactively, runs the command given on the command line
+    in the daemon and exits with its exit code. Otherwise (or if the
+    daemon cannot run the command), returns, and the command is to be
+    run in this process.
+    '''
+    if (_serving or INTERACTIVE_CLI or '_ARGCOMPLETE' in os.environ or
+            os.path.basename(sys.argv[0]) != 'dx'):
+        return
+    socket_path = get_socket_path()
+    if not os.path.exists(socket_path):
+        return
+    try:
+        sock = _connect(socket_path)
+    except socket.error:
+        return
+    try:
+        _send_message(sock, {'argv': sys.argv[1:],
+                             'env': dict(environ),
+                             'cwd': os.getcwd(),
+                             'session_conf_dir': dxpy.config.get_session_conf_dir(),
+                             'version': dxpy.TOOLKIT_VERSION})
+        for fd in range(3):
+            _send_fd(sock, fd)
+        reply = _receive_message(sock)
+    except Exception:
+        reply = None
+    if reply is None or 'pid' not in reply:
+        sock.close()
+        return
+
+    # The command is now running, and must not be run again here
+    def forward_signal(signum, frame):
+        try:
+            os.kill(reply['pid'], signum)
+        except OSError:
+            pass
+    for signum in signal.SIGINT, signal.SIGTERM, signal.SIGHUP:
+        signal.signal(signum, forward_signal)
+    lost_connection_message = 'Error: lost the connection to the dx daemon running the command'
+    try:
+        result = _receive_message(sock)
+    except Exception:
+        err_exit(lost_connection_message, code=1)
+    if result is None:
+        err_exit(lost_connection_message, code=1)
+    sys.exit(result['exit'])
@@ -22,25 +22,44 @@ from __future__ import (print_function, unicode_literals)
 import os
 import sys
 import collections
+import heapq
+import concurrent.futures
 import dxpy
 from ..utils.resolver import (resolve_existing_path, get_first_pos_of_char)
-from ..exceptions import err_exit
+from ..exceptions import err_exit, format_exception
 from . import try_call
 from dxpy.utils.printing import (fill)
 from dxpy.utils import pathmatch
+from ..bindings.dxfile import DEFAULT_BUFFER_SIZE, DXFILE_HTTP_THREADS
+from ..bindings.dxfile_functions import DOWNLOAD_JOURNAL_SUFFIX
 
+# With --parallel, the most bytes that a single file, and all the files
+# together, may have requested but not yet written to disk
+PARALLEL_DOWNLOAD_FILE_INFLIGHT_BYTES = DEFAULT_BUFFER_SIZE * DXFILE_HTTP_THREADS
+PARALLEL_DOWNLOAD_MAX_INFLIGHT_BYTES = 2 * PARALLEL_DOWNLOAD_FILE_INFLIGHT_BYTES
 
-def download_one_file(project, file_desc, dest_filename, args):
+
+def _should_download(file_desc, dest_filename, args):
+    resume = getattr(args, 'resume', False)
     if not args.overwrite:
-        if os.path.exists(dest_filename):
+        resumable = resume and os.path.exists(dest_filename + DOWNLOAD_JOURNAL_SUFFIX)
+        if os.path.exists(dest_filename) and not resumable:
             err_exit(fill('Error: path "' + dest_filename + '" already exists but -f/--overwrite was not set'))
 
     if file_desc['class'] != 'file':
         print("Skipping non-file data object {name} ({id})".format(**file_desc), file=sys.stderr)
-        return
+        return False
 
     if file_desc['state'] != 'closed':
         print("Skipping file {name} ({id}) because it is not closed".format(**file_desc), file=sys.stderr)
+        return False
+
+    return True
+
+
+def download_one_file(project, file_desc, dest_filename, args):
+    resume = getattr(args, 'resume', False)
+    if not _should_download(file_desc, dest_filename, args):
         return
 
     try:
@@ -49,11 +68,113 @@ def download_one_file(project, file_desc, dest_filename, args):
         show_progress = False
 
     try:
-        dxpy.download_dxfile(file_desc['id'], dest_filename, show_progress=show_progress, project=project)
+        dxpy.download_dxfile(file_desc['id'], dest_filename, show_progress=show_progress, project=project,
+                             resume=resume, describe_output=file_desc)
     except:
         err_exit()
 
 
+class _ParallelDownloader(object):
+    '''
+    Downloads files concurrently for ``dx download --parallel``.
+
+    Files are queued with :meth:`add` and downloaded by :meth:`run`,
+    smallest first, with up to *num_files* downloads in progress at a
+    time. A download is only started if the bytes it may have in flight
+    (its size, up to PARALLEL_DOWNLOAD_FILE_INFLIGHT_BYTES) fit within
+    PARALLEL_DOWNLOAD_MAX_INFLIGHT_BYTES together with those of the
+    downloads in progress. A file that cannot be downloaded does not
+    stop the others; the failures are reported once all the downloads
+    have finished.
+    '''
+    def __init__(self, num_files, args):
+        self._num_files = num_files
+        self._args = args
+        self._queue = []
+        self._total_files = 0
+        self._total_bytes = 0
+        self._downloaded_files = 0
+        self._downloaded_bytes = 0
+        self._failures = []
+
+    def add(self, project, file_desc, dest_filename, args):
+        if not _should_download(file_desc, dest_filename, args):
+            return
+        size = file_desc.get('size') or 0
+        heapq.heappush(self._queue, (size, self._total_files, project, file_desc, dest_filename))
+        self._total_files += 1
+        self._total_bytes += size
+
+    def _download(self, project, file_desc, dest_filename, max_inflight_bytes):
+        dxpy.download_dxfile(file_desc['id'], dest_filename, project=project, parallel=True,
+                             max_inflight_bytes=max_inflight_bytes, resume=getattr(self._args, 'resume', False),
+                             describe_output=file_desc)
+
+    def _print_progress(self):
+        percent = int(round(self._downloaded_bytes * 100.0 / self._total_bytes)) if self._total_bytes else 100
+        sys.stderr.write("Downloaded {files:,} of {total_files:,} files, {bytes:,} of {total_bytes:,} bytes "
+                         "({percent}%){failed}\r".format(
+                             files=self._downloaded_files, total_files=self._total_files,
+                             bytes=self._downloaded_bytes, total_bytes=self._total_bytes, percent=percent,
+                             failed=", {n} failed".format(n=len(self._failures)) if self._failures else ""))
+        sys.stderr.flush()
+
+    def run(self):
+        if self._total_files == 0:
+            return
+        show_progress = getattr(self._args, 'show_progress', False)
+        # Each download fetches its chunks through the DXFile thread
+        # pool, which must not be smaller than the number of downloads
+        dxpy.DXFile.set_http_threadpool_size(max(self._num_files, dxpy.DXFile._http_threadpool_size))
+        thread_pool = dxpy.utils.get_futures_threadpool(max_workers=self._num_files)
+        try:
+            self._download_queued(thread_pool, show_progress)
+        finally:
+            thread_pool.shutdown(wait=False)
+
+        if show_progress:
+            sys.stderr.write("\n")
+
+    def _download_queued(self, thread_pool, show_progress):
+        # Maps each download in progress to its file and its reserved bytes
+        downloads = {}
+        inflight_bytes = 0
+        if show_progress:
+            self._print_progress()
+        while self._queue or downloads:
+            while self._queue and len(downloads) < self._num_files:
+                size = self._queue[0][0]
+                reserved_bytes = max(1, min(size, PARALLEL_DOWNLOAD_FILE_INFLIGHT_BYTES))
+                if downloads and inflight_bytes + reserved_bytes > PARALLEL_DOWNLOAD_MAX_INFLIGHT_BYTES:
+                    break
+                size, _, project, file_desc, dest_filename = heapq.heappop(self._queue)
+                future = thread_pool.submit(self._download, project, file_desc, dest_filename, reserved_bytes)
+                downloads[future] = (file_desc, dest_filename, reserved_bytes)
+                inflight_bytes += reserved_bytes
+
+            done, _ = concurrent.futures.wait(list(downloads), return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                file_desc, dest_filename, reserved_bytes = downloads.pop(future)
+                inflight_bytes -= reserved_bytes
+                try:
+                    future.result()
+                    self._downloaded_files += 1
+                    self._downloaded_bytes += file_desc.get('size') or 0
+                except Exception as e:
+                    self._failures.append((file_desc, dest_filename, e))
+            if show_progress:
+                self._print_progress()
+
+    def report_failures(self):
+        if self._failures:
+            for file_desc, dest_filename, e in self._failures:
+                print(fill('Failed to download {name} ({id}) to "{dest}": {error}'.format(
+                    name=file_desc['name'], id=file_desc['id'], dest=dest_filename, error=format_exception(e).strip())),
+                    file=sys.stderr)
+            err_exit(fill('Error: {n} of {total} files could not be downloaded'.format(n=len(self._failures),
+                                                                                       total=self._total_files)))
+
+
 def _ensure_local_dir(d):
     if not os.path.isdir(d):
         if os.path.exists(d):
@@ -74,7 +195,8 @@ def _list_subfolders(project, path, cached_folder_lists, recurse=True):
         return (f for f in cached_folder_lists[project] if f.startswith(path) and '/' not in f[len(path)+1:])
 
 
-def _download_one_folder(project, folder, strip_prefix, destdir, cached_folder_lists, args):
+def _download_one_folder(project, folder, strip_prefix, destdir, cached_folder_lists, args,
+                         download_fn=download_one_file):
     assert(folder.startswith(strip_prefix))
     if not args.recursive:
         err_exit('Error: "' + folder + '" is a folder but the -r/--recursive option was not given')
@@ -87,7 +209,7 @@ def _download_one_folder(project, folder, strip_prefix, destdir, cached_folder_l
                                            recurse=True, describe=True):
         file_desc = f['describe']
         dest_filename = os.path.join(destdir, file_desc['folder'][len(strip_prefix):].lstrip('/'), file_desc['name'])
-        download_one_file(project, file_desc, dest_filename, args)
+        download_fn(project, file_desc, dest_filename, args)
 
 
 def _is_glob(path):
@@ -105,22 +227,26 @@ def _rel2abs(path, project):
     return abs_path, strip_prefix
 
 
-def _download_files(files, destdir, args, dest_filename=None):
+def _download_files(files, destdir, args, dest_filename=None, download_fn=download_one_file):
     for project in files:
         for f in files[project]:
             file_desc = f['describe']
             dest = dest_filename or os.path.join(destdir, file_desc['name'].replace('/', '%2F'))
-            download_one_file(project, file_desc, dest, args)
+            download_fn(project, file_desc, dest, args)
 
 
-def _download_folders(folders, destdir, cached_folder_lists, args):
+def _download_folders(folders, destdir, cached_folder_lists, args, download_fn=download_one_file):
     for project in folders:
         for folder, strip_prefix in folders[project]:
-            _download_one_folder(project, folder, strip_prefix, destdir, cached_folder_lists, args)
+            _download_one_folder(project, folder, strip_prefix, destdir, cached_folder_lists, args,
+                                 download_fn=download_fn)
 
 
 # Main entry point.
 def download(args):
+    if args.parallel is not None and args.parallel < 1:
+        err_exit(fill('Error: --parallel must be a positive number of files'))
+
     # Get space for caching subfolders
     cached_folder_lists = {}
 
@@ -183,5 +309,14 @@ def download(args):
     else:
         destdir, dest_filename = os.getcwd(), args.output
 
-    _download_folders(folders_to_get, destdir, cached_folder_lists, args)
-    _download_files(files_to_get, destdir, args, dest_filename=dest_filename)
+    if args.parallel is not None:
+        # Files are queued while the folders are listed, and downloaded
+        # once all of them are known
+        downloader = _ParallelDownloader(args.parallel, args)
+        _download_folders(folders_to_get, destdir, cached_folder_lists, args, download_fn=downloader.add)
+        _download_files(files_to_get, destdir, args, dest_filename=dest_filename, download_fn=downloader.add)
+        downloader.run()
+        downloader.report_failures()
+    else:
+        _download_folders(folders_to_get, destdir, cached_folder_lists, args)
+        _download_files(files_to_get, destdir, args, dest_filename=dest_filename)
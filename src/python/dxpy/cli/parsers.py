@@ -25,9 +25,6 @@ from __future__ import (print_function, unicode_literals)
 import argparse, json
 from .. import config
 from ..utils.printing import fill
-from ..utils.pretty_print import format_table
-from ..utils.resolver import split_unescaped
-from ..utils.completer import InstanceTypesCompleter
 from ..exceptions import (DXError, DXCLIError)
 
 class DXParserError(DXError):
@@ -108,6 +105,7 @@ def add_find_executions_search_gp(parser):
     find_executions_search.add_argument('--all-jobs', help=fill('Search for jobs at all depths matching the query (no tree structure shown)', width_adjustment=-24), action='store_true')
 
 def process_properties_args(args):
+    from ..utils.resolver import split_unescaped
     # Properties
     properties = None
     if args.properties is not None:
@@ -123,6 +121,7 @@ def process_properties_args(args):
     args.properties = properties
 
 def process_find_by_property_args(args):
+    from ..utils.resolver import split_unescaped
     properties = None
     if args.properties is not None:
         properties = {}
@@ -223,6 +222,8 @@ exec_input_args.add_argument('-f', '--input-json-file', dest='filename', help=fi
 
 class PrintInstanceTypeHelp(argparse.Action):
     def __call__(self, parser, namespace, values, option_string=None):
+        from ..utils.pretty_print import format_table
+        from ..utils.completer import InstanceTypesCompleter
         print("Help: Specifying instance types for " + parser.prog)
         print()
         print(fill('A single instance type can be requested to be used by all entry points by providing the instance type name.  Different instance types can also be requested for different entry points of an app or applet by providing a JSON string mapping from function names to instance types, e.g.'))
@@ -249,11 +250,17 @@ class PrintInstanceTypeHelp(argparse.Action):
                            column_names=InstanceTypesCompleter.instance_types.values()[0]._fields))
         parser.exit(0)
 
+class _InstanceTypesCompleter():
+    # Loads the completer module only once completion is requested
+    def complete(self, text, state):
+        from ..utils.completer import InstanceTypesCompleter
+        return InstanceTypesCompleter().complete(text, state)
+
 instance_type_arg = argparse.ArgumentParser(add_help=False)
 instance_type_arg.add_argument('--instance-type',
                                metavar='INSTANCE_TYPE_OR_MAPPING',
                                help=fill('Specify instance type(s) for jobs this executable will run; see --instance-type-help for more details', width_adjustment=-24),
-                               action='append').completer = InstanceTypesCompleter()
+                               action='append').completer = _InstanceTypesCompleter()
 instance_type_arg.add_argument('--instance-type-help',
                                nargs=0,
                                help=fill('Print help for specifying instance types'),
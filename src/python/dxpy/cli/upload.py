@@ -0,0 +1,221 @@
+# Copyright (C) 2014-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+'''
+This module handles parallel directory uploads (``dx upload -r --parallel``)
+for the dx command-line client.
+'''
+from __future__ import (print_function, unicode_literals)
+
+import os
+import sys
+import time
+import threading
+import dxpy
+from ..compat import queue
+from ..exceptions import err_exit, format_exception
+from dxpy.utils.printing import (fill)
+
+
+class _ParallelUploader(object):
+    '''
+    Uploads a local directory for ``dx upload -r --parallel``.
+
+    A walker thread lists the directory tree, creates the remote folders
+    (one request for each leaf folder, made concurrently, since parent
+    folders are created along with them), and then feeds the files
+    one at a time through a bounded queue to *num_workers* upload threads. The
+    main thread reports progress, prints the IDs of the new files with
+    --brief, and reports the files that could not be uploaded once all
+    the others have been.
+    '''
+    def __init__(self, num_workers, project, args):
+        self._num_workers = num_workers
+        self._project = project
+        self._args = args
+        self._files = queue.Queue(maxsize=2 * num_workers)
+        self._results = queue.Queue()
+        self._total_files = None
+        self._total_bytes = None
+        self._uploaded_files = 0
+        self._uploaded_bytes = 0
+        self._failures = []
+        self._walk_error = None
+        self._thread_pool = None
+
+    def _walk(self, local_dir, remote_folder):
+        # Returns the files to upload, as (local path, remote folder,
+        # size), and the remote folders that have no subfolders
+        files, leaf_folders = [], []
+        seen_paths = set()
+        for dirpath, dirnames, filenames in os.walk(local_dir, followlinks=True):
+            norm_path = os.path.realpath(dirpath)
+            if norm_path in seen_paths:
+                print("Skipping {f}: directory loop".format(f=dirpath), file=sys.stderr)
+                del dirnames[:]
+                continue
+            seen_paths.add(norm_path)
+            rel_path = os.path.relpath(dirpath, local_dir)
+            folder = remote_folder if rel_path == '.' else os.path.join(remote_folder, *rel_path.split(os.sep))
+            if len(dirnames) == 0:
+                leaf_folders.append(folder)
+            for filename in sorted(filenames):
+                local_path = os.path.join(dirpath, filename)
+                try:
+                    size = os.path.getsize(local_path)
+                except OSError:
+                    # Reported when the upload fails
+                    size = 0
+                files.append((local_path, folder, size))
+        return files, leaf_folders
+
+    def _create_folders(self, folders):
+        futures = [self._thread_pool.submit(dxpy.api.project_new_folder, self._project, {"folder": folder, "parents": True})
+                   for folder in folders]
+        for future in futures:
+            future.result()
+
+    def _produce(self, local_dir, remote_folder):
+        try:
+            files, leaf_folders = self._walk(local_dir, remote_folder)
+            self._create_folders(leaf_folders)
+            self._results.put(("listed", len(files), sum(size for _, _, size in files)))
+            for item in files:
+                self._files.put(item)
+        except Exception as e:
+            self._results.put(("error", e, None))
+        finally:
+            for _ in range(self._num_workers):
+                self._files.put(None)
+
+    def _upload(self):
+        args = self._args
+        while True:
+            item = self._files.get()
+            if item is None:
+                return
+            local_path, folder, size = item
+            try:
+                dxfile = dxpy.upload_local_file(filename=local_path,
+                                                name=os.path.basename(local_path),
+                                                tags=args.tags,
+                                                types=args.types,
+                                                hidden=args.hidden,
+                                                project=self._project,
+                                                properties=args.properties,
+                                                details=args.details,
+                                                folder=folder,
+                                                parents=True,
+                                                show_progress=False)
+                if args.wait:
+                    dxfile._wait_on_close()
+                self._results.put(("uploaded", dxfile.get_id(), size))
+            except Exception as e:
+                self._results.put(("failed", local_path, e))
+
+    def _print_progress(self):
+        percent = int(round(self._uploaded_bytes * 100.0 / self._total_bytes)) if self._total_bytes else 100
+        sys.stderr.write("Uploaded {files:,} of {total_files:,} files, {bytes:,} of {total_bytes:,} bytes "
+                         "({percent}%){failed}\r".format(
+                             files=self._uploaded_files, total_files=self._total_files,
+                             bytes=self._uploaded_bytes, total_bytes=self._total_bytes, percent=percent,
+                             failed=", {n} failed".format(n=len(self._failures)) if self._failures else ""))
+        sys.stderr.flush()
+
+    def _handle_result(self, kind, value, detail):
+        if kind == "listed":
+            self._total_files, self._total_bytes = value, detail
+        elif kind == "uploaded":
+            self._uploaded_files += 1
+            self._uploaded_bytes += detail
+            if self._args.brief:
+                print(value)
+        elif kind == "failed":
+            self._failures.append((value, detail))
+        else:
+            self._walk_error = value
+        if self._args.show_progress and self._total_files is not None:
+            self._print_progress()
+
+    def run(self, local_dir, remote_folder):
+        start_time = time.time()
+        show_progress = self._args.show_progress
+        # Creates the folders, and reserves room in the connection pools
+        # for the upload threads until they are done
+        self._thread_pool = dxpy.utils.get_futures_threadpool(max_workers=self._num_workers)
+        try:
+            threads = [threading.Thread(target=self._produce, args=(local_dir, remote_folder))]
+            threads.extend(threading.Thread(target=self._upload) for _ in range(self._num_workers))
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+
+            while any(thread.is_alive() for thread in threads):
+                try:
+                    # Waits with a timeout so that KeyboardInterrupt is handled
+                    self._handle_result(*self._results.get(timeout=0.5))
+                except queue.Empty:
+                    pass
+            # A thread may have posted its last result after the queue was
+            # last found to be empty
+            for thread in threads:
+                thread.join()
+        finally:
+            self._thread_pool.shutdown(wait=False)
+        while True:
+            try:
+                self._handle_result(*self._results.get_nowait())
+            except queue.Empty:
+                break
+
+        if show_progress and self._total_files is not None:
+            sys.stderr.write("\n")
+        if not self._args.brief:
+            print("Uploaded {files:,} files ({bytes:,} bytes) to {project}:{folder} in {secs:.1f}s".format(
+                files=self._uploaded_files, bytes=self._uploaded_bytes, project=self._project, folder=remote_folder,
+                secs=time.time() - start_time), file=sys.stderr)
+
+    def report_failures(self, local_dir):
+        if self._walk_error is not None:
+            err_exit(fill('Error: could not upload the directory ' + local_dir), exception=self._walk_error)
+        if self._failures:
+            for local_path, e in self._failures:
+                print(fill('Failed to upload "{path}": {error}'.format(path=local_path,
+                                                                       error=format_exception(e).strip())),
+                      file=sys.stderr)
+            err_exit(fill('Error: {n} of {total} files could not be uploaded'.format(n=len(self._failures),
+                                                                                   total=self._total_files)))
+
+
+def upload_directory(local_dir, project, folder, num_workers, args):
+    '''
+    :param local_dir: Local directory to upload
+    :type local_dir: string
+    :param project: ID of the project to upload to
+    :type project: string
+    :param folder: Folder that is to contain the contents of *local_dir*
+    :type folder: string
+    :param num_workers: Number of files to upload at a time
+    :type num_workers: int
+
+    Uploads the files in *local_dir* and its subdirectories, with the
+    metadata given in *args*, to the corresponding subfolders of
+    *folder*, then exits with an error if any of them could not be
+    uploaded.
+    '''
+    uploader = _ParallelUploader(num_workers, project, args)
+    uploader.run(local_dir, folder)
+    uploader.report_failures(local_dir)
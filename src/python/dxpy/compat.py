@@ -78,9 +78,11 @@ if USING_PYTHON2:
         from .packages import shlex
     else:
         import shlex
+    import Queue as queue
 else:
     from io import StringIO, BytesIO
     import shlex
+    import queue
     builtin_str = str
     str = str
     bytes = bytes
@@ -46,6 +46,14 @@ class DXAPIError(DXError):
             self.details = None
         self.code = code
 
+    def __reduce__(self):
+        # Allows errors raised in worker processes (e.g. by
+        # DXGTableParallelWriter) to be passed back to the parent
+        error = {"type": self.name, "message": self.msg}
+        if self.details is not None:
+            error["details"] = self.details
+        return (self.__class__, ({"error": error}, self.code))
+
     def error_message(self):
         "Returns a one-line description of the error."
         output = self.msg + ", code " + str(self.code)
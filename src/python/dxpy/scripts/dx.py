@@ -20,6 +20,7 @@
 from __future__ import print_function, unicode_literals
 
 import os, sys, datetime, getpass, collections, re, json, argparse, copy, hashlib, io, time, subprocess, glob, logging
+import importlib
 import shlex # respects quoted substrings when splitting
 
 import requests
@@ -33,19 +34,21 @@ wrap_stdio_in_codecs()
 decode_command_line_args()
 
 import dxpy
-from ..cli import try_call, prompt_for_yn, INTERACTIVE_CLI
-from ..cli import workflow as workflow_cli
-from ..cli.cp import cp
-from ..cli.download import (download_one_file, download)
+from ..cli import try_call, prompt_for_yn, INTERACTIVE_CLI, get_daemon_socket_path
+
+# Hands the command over to the dx daemon, if one is running, before any
+# time is spent on loading the rest of the client and building the
+# parser. The daemon client itself is only loaded if its socket exists.
+if not INTERACTIVE_CLI and os.path.exists(get_daemon_socket_path()):
+    from ..cli.daemon import run_in_daemon
+    run_in_daemon()
+
 from ..cli.parsers import (no_color_arg, delim_arg, env_args, stdout_args, all_arg, json_arg, parser_dataobject_args,
                            parser_single_dataobject_output_args, process_properties_args,
                            find_by_properties_and_tags_args, process_find_by_property_args, process_dataobject_args,
                            process_single_dataobject_output_args, find_executions_args, add_find_executions_search_gp,
                            set_env_from_args, extra_args, process_extra_args, DXParserError, exec_input_args,
                            instance_type_arg, process_instance_type_arg)
-from ..cli.exec_io import (ExecutableInputs, format_choices_or_suggestions)
-from ..cli.org import (get_org_invite_args, add_membership, remove_membership,
-                       update_membership)
 from ..exceptions import (err_exit, DXError, DXCLIError, DXAPIError, network_exceptions, default_expected_exceptions,
                           format_exception)
 from ..utils import warn, group_array_by_field, normalize_timedelta, normalize_time_input
@@ -54,16 +57,36 @@ from ..app_categories import APP_CATEGORIES
 from ..utils.printing import (CYAN, BLUE, YELLOW, GREEN, RED, WHITE, UNDERLINE, BOLD, ENDC, DNANEXUS_LOGO,
                               DNANEXUS_X, set_colors, set_delimiter, get_delimiter, DELIMITER, fill,
                               tty_rows, tty_cols, pager)
-from ..utils.pretty_print import format_tree, format_table
-from ..utils.resolver import (pick, paginate_and_pick, is_hashid, is_data_obj_id, is_container_id, is_job_id,
-                              is_analysis_id, get_last_pos_of_char, resolve_container_id_or_name, resolve_path,
-                              resolve_existing_path, get_app_from_path, resolve_app, get_exec_handler,
-                              split_unescaped, ResolutionError, get_first_pos_of_char,
-                              resolve_to_objects_or_project)
-from ..utils.completer import (path_completer, DXPathCompleter, DXAppCompleter, LocalCompleter,
-                               ListCompleter, MultiCompleter)
-from ..utils.describe import (print_data_obj_desc, print_desc, print_ls_desc, get_ls_l_desc, print_ls_l_desc,
-                              get_io_desc, get_find_executions_string)
+
+# Commands whose implementation parses the arguments of another command
+_COMMAND_DEPENDENCIES = {'download': ['cat'], 'run': ['watch', 'ssh']}
+
+def _get_commands_to_build(argv):
+    """
+    :param argv: Command-line arguments, without the program name
+    :type argv: list
+    :returns: Names of the commands whose parsers need to be built, or None if the whole command tree is needed
+    :rtype: set or None
+
+    Help, the interactive shell and shell completion all need every
+    command; otherwise only the command being run is built.
+    """
+    if '_ARGCOMPLETE' in os.environ or len(argv) == 0 or argv[0].startswith('-') or argv[0] in ('help', 'sh'):
+        return None
+    return set([argv[0]] + _COMMAND_DEPENDENCIES.get(argv[0], []))
+
+_commands_to_build = _get_commands_to_build(sys.argv[1:])
+
+if _commands_to_build is None:
+    from ..utils.completer import (path_completer, DXPathCompleter, DXAppCompleter, LocalCompleter,
+                                   ListCompleter, MultiCompleter)
+else:
+    # Completers are only consulted by argcomplete and the interactive
+    # shell, neither of which is in use here.
+    def _unused_completer(*args, **kwargs):
+        return None
+    path_completer = DXPathCompleter = DXAppCompleter = LocalCompleter = ListCompleter = MultiCompleter = \
+        _unused_completer
 
 try:
     import colorama
@@ -136,6 +159,16 @@ def get_json_from_stdin():
         return None
     return user_json
 
+def _lazy_command(module_name, function_name):
+    '''
+    Returns a subcommand function that imports *module_name* only when
+    the subcommand is run, so that the modules implementing subcommands
+    are not all loaded every time dx starts.
+    '''
+    def run_command(args):
+        return getattr(importlib.import_module(module_name), function_name)(args)
+    return run_command
+
 def set_cli_colors(args=argparse.Namespace()):
     if 'color' in args:
         state['colors'] = args.color
@@ -186,6 +219,7 @@ class DXCLICompleter():
             self.matches = [command + ' ' + sub for sub in self.subcommands[command] if sub.startswith(prefix)]
 
     def get_matches(self, text, want_prefix=False):
+        from ..utils.resolver import get_last_pos_of_char, split_unescaped
         self.text = text
         space_pos = get_last_pos_of_char(' ', text)
         words = split_unescaped(' ', text)
@@ -462,6 +496,7 @@ def prompt_for_env_var(prompt_str, env_var_str):
 
 
 def pick_and_set_project(args):
+    from ..utils.resolver import pick
     try:
         result_generator = dxpy.find_projects(describe=True,
                                               name=args.name, name_mode='glob',
@@ -640,6 +675,7 @@ def api(args):
         parser.exit(1, 'Error: server response could not be parsed as JSON\n')
 
 def invite(args):
+    from ..utils.resolver import resolve_existing_path
     # If --project is a valid project (ID or name), then appending ":"
     # should not hurt the path resolution.
     if ':' not in args.project:
@@ -655,6 +691,7 @@ def invite(args):
     print('Invited ' + args.invitee + ' to ' + project + ' (' + resp['state'] + ')')
 
 def uninvite(args):
+    from ..utils.resolver import resolve_existing_path
     # If --project is a valid project (ID or name), then appending ":"
     # should not hurt the path resolution.
     if ':' not in args.project:
@@ -670,6 +707,7 @@ def uninvite(args):
     print('Uninvited ' + args.entity + ' from ' + project)
 
 def select(args):
+    from ..utils.resolver import get_last_pos_of_char, split_unescaped
     if args.project is not None:
         if get_last_pos_of_char(':', args.project) != -1:
             args.path = args.project
@@ -681,6 +719,7 @@ def select(args):
         pick_and_set_project(args)
 
 def cd(args):
+    from ..utils.resolver import resolve_existing_path
     # entity_result should be None because expected='folder'
     project, folderpath = try_call(resolve_existing_path, args.path, 'folder')[:2]
 
@@ -712,6 +751,8 @@ def cmp_names(x):
     return x['describe']['name'].lower()
 
 def ls(args):
+    from ..utils.resolver import resolve_existing_path
+    from ..utils.describe import print_ls_desc, print_ls_l_desc
     project, folderpath, entity_results = try_call(resolve_existing_path, # TODO: this needs to honor "ls -a" (all) (args.obj/args.folders/args.full)
                                                    args.path,
                                                    ask_to_resolve=False)
@@ -790,6 +831,7 @@ def ls(args):
                     print_ls_desc(result['describe'], print_id=True if name_counts[result['describe']['name']] > 1 else False)
 
 def mkdir(args):
+    from ..utils.resolver import resolve_path, ResolutionError
     had_error = False
     for path in args.paths:
         # Resolve the path and add it to the list
@@ -811,6 +853,7 @@ def mkdir(args):
         parser.exit(1)
 
 def rmdir(args):
+    from ..utils.resolver import resolve_path, ResolutionError
     had_error = False
     for path in args.paths:
         try:
@@ -831,6 +874,7 @@ def rmdir(args):
         parser.exit(1)
 
 def rm(args):
+    from ..utils.resolver import resolve_existing_path
     had_error = False
     projects = {}
     for path in args.paths:
@@ -887,6 +931,7 @@ def rm(args):
         parser.exit(1)
 
 def rmproject(args):
+    from ..utils.resolver import resolve_container_id_or_name, split_unescaped
     had_error = False
     for project in args.projects:
         # Be forgiving if they offer an extraneous colon
@@ -941,6 +986,7 @@ def rmproject(args):
 
 # ONLY for within the SAME project.  Will exit fatally otherwise.
 def mv(args):
+    from ..utils.resolver import get_last_pos_of_char, resolve_path, resolve_existing_path
     dest_proj, dest_path, _none = try_call(resolve_path, args.destination, expected='folder')
     try:
         if dest_path is None:
@@ -1020,6 +1066,9 @@ def mv(args):
 
 
 def tree(args):
+    from ..utils.resolver import resolve_existing_path
+    from ..utils.describe import get_ls_l_desc
+    from ..utils.pretty_print import format_tree
     project, folderpath, _none = try_call(resolve_existing_path, args.path,
                                           expected='folder')
 
@@ -1063,6 +1112,8 @@ def tree(args):
         err_exit()
 
 def describe(args):
+    from ..utils.resolver import is_hashid, is_data_obj_id, is_container_id, resolve_existing_path, ResolutionError
+    from ..utils.describe import print_desc
     try:
         if len(args.path) == 0:
             raise DXCLIError('Must provide a nonempty string to be described')
@@ -1284,6 +1335,7 @@ def new_user(args):
 
     if args.org is not None:
         # Invite new user to org.
+        from ..cli.org import get_org_invite_args
         dxpy.api.org_invite(args.org, get_org_invite_args(args))
 
     if args.brief:
@@ -1314,6 +1366,8 @@ def new_project(args):
         err_exit()
 
 def new_record(args):
+    from ..utils.resolver import resolve_path, resolve_existing_path
+    from ..utils.describe import print_desc
     try_call(process_dataobject_args, args)
     try_call(process_single_dataobject_output_args, args)
     init_from = None
@@ -1348,6 +1402,8 @@ def new_record(args):
         err_exit()
 
 def new_gtable(args):
+    from ..utils.resolver import resolve_path, split_unescaped
+    from ..utils.describe import print_desc
     try_call(process_dataobject_args, args)
     try_call(process_single_dataobject_output_args, args)
 
@@ -1393,6 +1449,7 @@ def new_gtable(args):
         err_exit()
 
 def set_visibility(args):
+    from ..utils.resolver import resolve_existing_path
     had_error = False
     # Attempt to resolve name
     _project, _folderpath, entity_results = try_call(resolve_existing_path,
@@ -1415,6 +1472,7 @@ def set_visibility(args):
         parser.exit(1)
 
 def get_details(args):
+    from ..utils.resolver import resolve_existing_path
     # Attempt to resolve name
     _project, _folderpath, entity_result = try_call(resolve_existing_path,
                                                     args.path, expected='entity')
@@ -1428,6 +1486,7 @@ def get_details(args):
         err_exit()
 
 def set_details(args):
+    from ..utils.resolver import resolve_existing_path, ResolutionError
     had_error = False
     # Attempt to resolve name
     _project, _folderpath, entity_results = try_call(resolve_existing_path,
@@ -1474,6 +1533,7 @@ def set_details(args):
         parser.exit(1)
 
 def add_types(args):
+    from ..utils.resolver import resolve_existing_path
     had_error = False
     # Attempt to resolve name
     _project, _folderpath, entity_results = try_call(resolve_existing_path,
@@ -1495,6 +1555,7 @@ def add_types(args):
         parser.exit(1)
 
 def remove_types(args):
+    from ..utils.resolver import resolve_existing_path
     had_error = False
     # Attempt to resolve name
     _project, _folderpath, entity_results = try_call(resolve_existing_path,
@@ -1516,6 +1577,7 @@ def remove_types(args):
         parser.exit(1)
 
 def add_tags(args):
+    from ..utils.resolver import resolve_to_objects_or_project
     had_error = False
     # Attempt to resolve name
     project, _folderpath, entity_results = try_call(resolve_to_objects_or_project,
@@ -1543,6 +1605,7 @@ def add_tags(args):
             err_exit()
 
 def remove_tags(args):
+    from ..utils.resolver import resolve_to_objects_or_project
     had_error = False
     # Attempt to resolve name
     project, _folderpath, entity_results = try_call(resolve_to_objects_or_project,
@@ -1570,6 +1633,7 @@ def remove_tags(args):
             err_exit()
 
 def rename(args):
+    from ..utils.resolver import resolve_to_objects_or_project
     had_error = False
     # Attempt to resolve name
     project, _folderpath, entity_results = try_call(resolve_to_objects_or_project,
@@ -1596,6 +1660,7 @@ def rename(args):
             err_exit()
 
 def set_properties(args):
+    from ..utils.resolver import resolve_to_objects_or_project
     had_error = False
     # Attempt to resolve name
     project, _folderpath, entity_results = try_call(resolve_to_objects_or_project,
@@ -1623,6 +1688,7 @@ def set_properties(args):
             err_exit()
 
 def unset_properties(args):
+    from ..utils.resolver import resolve_to_objects_or_project
     had_error = False
     # Attempt to resolve name
     project, _folderpath, entity_results = try_call(resolve_to_objects_or_project,
@@ -1651,6 +1717,7 @@ def unset_properties(args):
             err_exit()
 
 def make_download_url(args):
+    from ..utils.resolver import resolve_existing_path
     project, _folderpath, entity_result = try_call(resolve_existing_path, args.path, expected='entity')
     if entity_result is None:
         parser.exit(1, fill('Could not resolve ' + args.path + ' to a data object') + '\n')
@@ -1673,6 +1740,7 @@ def make_download_url(args):
 
 
 def get(args):
+    from ..utils.resolver import resolve_existing_path
     # Attempt to resolve name
     project, _folderpath, entity_result = try_call(resolve_existing_path,
                                                    args.path, expected='entity')
@@ -1681,6 +1749,7 @@ def get(args):
         parser.exit(3, fill('Could not resolve ' + args.path + ' to a data object') + '\n')
 
     if entity_result['describe']['class'] == 'file':
+        from ..cli.download import download_one_file
         download_one_file(project, entity_result['describe'], entity_result['describe']['name'], args)
         return
 
@@ -1742,6 +1811,7 @@ def get(args):
         fd.close()
 
 def cat(args):
+    from ..utils.resolver import resolve_existing_path
     for path in args.path:
         project, _folderpath, entity_result = try_call(resolve_existing_path, path)
 
@@ -1766,10 +1836,13 @@ def download_or_cat(args):
     if args.output == '-':
         cat(parser.parse_args(['cat'] + args.paths))
         return
+    from ..cli.download import download
     download(args)
 
 
 def head(args):
+    from ..utils.resolver import resolve_existing_path
+    from ..utils.pretty_print import format_table
     # Attempt to resolve name
     project, _folderpath, entity_result = try_call(resolve_existing_path,
                                                    args.path, expected='entity')
@@ -1802,7 +1875,8 @@ def head(args):
                                                                   hi,
                                                                   args.gri_mode,
                                                                   args.gri_name)
-                    table_text, table_rows, table_cols = format_table(list(handler.iterate_query_rows(query=gri_query, limit=args.lines)),
+                    table_text, table_rows, table_cols = format_table(list(handler.iterate_query_rows(query=gri_query, limit=args.lines,
+                                                                                                       num_windows=dxpy.DXGTABLE_HTTP_THREADS)),
                                                                   column_specs = entity_result['describe']['columns'],
                                                                   report_dimensions=True,
                                                                   max_col_width=args.max_col_width)
@@ -1833,6 +1907,8 @@ def head(args):
 def upload(args, **kwargs):
     if args.output is not None and args.path is not None:
         raise DXParserError('Error: Cannot provide both the -o/--output and --path/--destination arguments')
+    elif args.parallel is not None and args.parallel < 1:
+        raise DXParserError('Error: --parallel must be a positive number of files')
     elif args.path is None:
         args.path = args.output
 
@@ -1849,6 +1925,8 @@ def upload(args, **kwargs):
 
 upload_seen_paths = set()
 def upload_one(args):
+    from ..utils.resolver import resolve_path
+    from ..utils.describe import print_desc
     try_call(process_dataobject_args, args)
 
     args.show_progress = args.show_progress and not args.brief
@@ -1872,6 +1950,12 @@ def upload_one(args):
         else:
             upload_seen_paths.add(norm_path)
 
+        if args.parallel is not None:
+            from ..cli.upload import upload_directory
+            upload_directory(args.filename, project, os.path.join(folder, os.path.basename(args.filename)),
+                             args.parallel, args)
+            return
+
         dir_listing = os.listdir(args.filename)
         if len(dir_listing) == 0: # Create empty folder
             dxpy.api.project_new_folder(project, {"folder": os.path.join(folder, os.path.basename(args.filename)),
@@ -1966,6 +2050,9 @@ def export(args):
     exporters[args.format.lower()](args)
 
 def find_executions(args):
+    from ..utils.resolver import get_last_pos_of_char, resolve_existing_path
+    from ..utils.describe import get_find_executions_string
+    from ..utils.pretty_print import format_tree
     try_call(process_find_by_property_args, args)
     if not (args.origin_jobs or args.all_jobs):
         args.trees = True
@@ -2138,6 +2225,8 @@ def find_executions(args):
         err_exit()
 
 def find_data(args):
+    from ..utils.resolver import get_last_pos_of_char, resolve_path, resolve_existing_path
+    from ..utils.describe import print_data_obj_desc, print_ls_l_desc
     # --folder deprecated to --path.
     if args.folder is None and args.path is not None:
         args.folder = args.path
@@ -2273,6 +2362,7 @@ def find_apps(args):
         err_exit()
 
 def close(args):
+    from ..utils.resolver import resolve_existing_path
     if '_DX_FUSE' in os.environ:
         from xattr import xattr
 
@@ -2312,6 +2402,7 @@ def close(args):
         parser.exit(1)
 
 def wait(args):
+    from ..utils.resolver import is_job_id, is_analysis_id, resolve_existing_path
     had_error = False
     for path in args.path:
         if is_job_id(path) or is_analysis_id(path):
@@ -2351,6 +2442,7 @@ def process_list_of_usernames(thing):
             for name in thing]
 
 def add_users(args):
+    from ..utils.resolver import resolve_app
     app_desc = try_call(resolve_app, args.app)
     args.users = process_list_of_usernames(args.users)
     try:
@@ -2359,6 +2451,7 @@ def add_users(args):
         err_exit()
 
 def remove_users(args):
+    from ..utils.resolver import resolve_app
     app_desc = try_call(resolve_app, args.app)
     args.users = process_list_of_usernames(args.users)
 
@@ -2368,12 +2461,14 @@ def remove_users(args):
         err_exit()
 
 def list_users(args):
+    from ..utils.resolver import resolve_app
     app_desc = try_call(resolve_app, args.app)
 
     for user in app_desc['authorizedUsers']:
         print(user)
 
 def add_developers(args):
+    from ..utils.resolver import resolve_app
     app_desc = try_call(resolve_app, args.app)
     args.developers = process_list_of_usernames(args.developers)
     if any(entity.startswith('org-') for entity in args.developers):
@@ -2384,6 +2479,7 @@ def add_developers(args):
         err_exit()
 
 def list_developers(args):
+    from ..utils.resolver import resolve_app
     app_desc = try_call(resolve_app, args.app)
 
     try:
@@ -2393,6 +2489,7 @@ def list_developers(args):
         err_exit()
 
 def remove_developers(args):
+    from ..utils.resolver import resolve_app
     app_desc = try_call(resolve_app, args.app)
     args.developers = process_list_of_usernames(args.developers)
 
@@ -2403,6 +2500,7 @@ def remove_developers(args):
 
 
 def install(args):
+    from ..utils.resolver import resolve_app
     app_desc = try_call(resolve_app, args.app)
 
     try:
@@ -2412,6 +2510,7 @@ def install(args):
         err_exit()
 
 def uninstall(args):
+    from ..utils.resolver import get_app_from_path
     app_desc = get_app_from_path(args.app)
     if app_desc is None:
         parser.exit(1, 'Could not find the app\n')
@@ -2426,6 +2525,7 @@ def run_one(args, executable, dest_proj, dest_path, preset_inputs=None, input_na
             is_the_only_job=True):
     # following may throw if the executable is a workflow with no
     # input spec available (because a stage is inaccessible)
+    from ..cli.exec_io import ExecutableInputs
     exec_inputs = try_call(ExecutableInputs, executable, input_name_prefix=input_name_prefix)
 
     if args.input_json is None and args.filename is None:
@@ -2565,9 +2665,12 @@ def run_one(args, executable, dest_proj, dest_path, preset_inputs=None, input_na
     return dxexecution
 
 def print_run_help(executable="", alias=None):
+    from ..utils.resolver import get_exec_handler
+    from ..utils.describe import get_io_desc
     if executable == "":
         parser_map['run'].print_help()
     else:
+        from ..cli.exec_io import format_choices_or_suggestions
         exec_help = 'usage: dx run ' + executable + ('' if alias is None else ' --alias ' + alias)
         handler = try_call(get_exec_handler, executable, alias)
         try:
@@ -2697,6 +2800,9 @@ SPECIFYING JSON INPUT
     parser.exit(0)
 
 def run(args):
+    from ..utils.resolver import (paginate_and_pick, is_job_id, is_analysis_id, resolve_container_id_or_name,
+                                  resolve_existing_path, get_exec_handler)
+    from ..utils.describe import get_find_executions_string
     if args.help:
         print_run_help(args.executable, args.alias)
 
@@ -3001,6 +3107,7 @@ def watch(args):
         parser.exit(3, fill(str(details)) + '\n')
 
 def ssh_config(args):
+    from ..utils.resolver import pick
     user_id = try_call(dxpy.whoami)
 
     if args.revoke:
@@ -3335,7 +3442,32 @@ class DXArgumentParser(argparse.ArgumentParser):
                                                              prog=self.prog,
                                                              msg=message))
 
+class _UnbuiltParser(object):
+    """
+    Stands in for the parser of a command that is not going to be run.
+    Every method call on it (add_argument, set_defaults, add_subparsers,
+    ...) is a no-op that returns the stand-in itself.
+    """
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+
+
+class _LazySubParsersAction(argparse._SubParsersAction):
+    """
+    Builds the parsers of the commands in _commands_to_build only.  The
+    other commands are still listed as choices, so that mistyped commands
+    are reported the same way, but get an _UnbuiltParser.
+    """
+    def add_parser(self, name, **kwargs):
+        if name in _commands_to_build:
+            return super(_LazySubParsersAction, self).add_parser(name, **kwargs)
+        self.choices[name] = None
+        return _UnbuiltParser()
+
+
 def register_subparser(subparser, subparsers_action=None, categories=('other', )):
+    if isinstance(subparser, _UnbuiltParser):
+        return
     name = re.sub('^dx ', '', subparser.prog)
     if subparsers_action is None:
         subparsers_action = subparsers
@@ -3365,7 +3497,10 @@ parser = DXArgumentParser(description=DNANEXUS_LOGO() + ' Command-Line Client, A
                           usage='%(prog)s [-h] [--version] command ...')
 parser.add_argument('--version', action=PrintDXVersion, nargs=0, help="show program's version number and exit")
 
-subparsers = parser.add_subparsers(help=argparse.SUPPRESS, dest='command')
+# argcomplete only descends into subparsers whose action is exactly
+# argparse._SubParsersAction, so the stock action is kept for the full tree
+subparsers = parser.add_subparsers(help=argparse.SUPPRESS, dest='command',
+                                   action='parsers' if _commands_to_build is None else _LazySubParsersAction)
 subparsers.metavar = 'command'
 
 parser_login = subparsers.add_parser('login', help='Log in (interactively or with an existing API token)',
@@ -3546,7 +3681,7 @@ cp_sources_action = parser_cp.add_argument('sources', help='Objects and/or folde
                                            nargs='+')
 cp_sources_action.completer = DXPathCompleter()
 parser_cp.add_argument('destination', help=fill('Folder into which to copy the sources or new pathname (if only one source is provided).  Must be in a different project/container than all source paths.', width_adjustment=-15))
-parser_cp.set_defaults(func=cp)
+parser_cp.set_defaults(func=_lazy_command('dxpy.cli.cp', 'cp'))
 register_subparser(parser_cp, categories='fs')
 
 parser_mv = subparsers.add_parser('mv', help='Move or rename objects and/or folders inside a project',
@@ -3618,6 +3753,8 @@ parser_upload.add_argument('--path', '--destination',
                            nargs='?')
 parser_upload.add_argument('-r', '--recursive', help='Upload directories recursively', action='store_true')
 parser_upload.add_argument('--wait', help='Wait until the file has finished closing', action='store_true')
+parser_upload.add_argument('--parallel', help=fill('With -r, upload up to N files at a time, continue past files that fail to upload, and print a summary at the end', width_adjustment=-24),
+                            type=int, metavar='N')
 parser_upload.add_argument('--no-progress', help='Do not show a progress bar', dest='show_progress',
                            action='store_false', default=sys.stderr.isatty())
 parser_upload.set_defaults(func=upload, mute=False)
@@ -3637,6 +3774,10 @@ parser_download.add_argument('-a', '--all', help='If multiple objects match the
                              action='store_true')
 parser_download.add_argument('--no-progress', help='Do not show a progress bar', dest='show_progress',
                              action='store_false', default=sys.stderr.isatty())
+parser_download.add_argument('--resume', help=fill('Keep a journal of completed byte ranges next to each local file; if a previous download of the same file was interrupted, only fetch the missing ranges', width_adjustment=-24),
+                             action='store_true')
+parser_download.add_argument('--parallel', help=fill('Download up to N files at a time, smallest first, and continue past files that fail to download (they are listed at the end)', width_adjustment=-24),
+                             type=int, metavar='N')
 parser_download.set_defaults(func=download_or_cat)
 register_subparser(parser_download, categories='data')
 
@@ -3705,9 +3846,11 @@ parser_export.add_argument('exporter_args', help=fill('Arguments passed to the e
 parser_export.set_defaults(func=export)
 register_subparser(parser_export, categories='data')
 
-from dxpy.scripts.dx_build_app import parser as build_parser
-build_parser.prog = 'dx build'
-build_parser.set_defaults(mode="applet")
+build_parser = None
+if _commands_to_build is None or 'build' in _commands_to_build:
+    from dxpy.scripts.dx_build_app import parser as build_parser
+    build_parser.prog = 'dx build'
+    build_parser.set_defaults(mode="applet")
 
 parser_build = subparsers.add_parser('build', help='Upload and build a new applet/app',
                                      description='Build an applet or app object from a local source directory.  You can use ' + BOLD("dx-app-wizard") + ' to generate a skeleton directory with the necessary files.',
@@ -3758,7 +3901,7 @@ parser_add_stage.add_argument('--name', help='Stage name')
 add_stage_folder_args = parser_add_stage.add_mutually_exclusive_group()
 add_stage_folder_args.add_argument('--output-folder', help='Path to the output folder for the stage (interpreted as an absolute path)')
 add_stage_folder_args.add_argument('--relative-output-folder', help='A relative folder path for the stage (interpreted as relative to the workflow\'s output folder)')
-parser_add_stage.set_defaults(func=workflow_cli.add_stage)
+parser_add_stage.set_defaults(func=_lazy_command('dxpy.cli.workflow', 'add_stage'))
 register_subparser(parser_add_stage, subparsers_action=subparsers_add, categories='workflow')
 
 parser_add_member = subparsers_add.add_parser("member", help="Grant a user membership to an org", description="Grant a user membership to an org", prog="dx add member", parents=[stdout_args, env_args])
@@ -3769,7 +3912,7 @@ parser_add_member.add_argument("--allow-billable-activities", default=False, act
 parser_add_member.add_argument("--no-app-access", default=True, action="store_false", dest="app_access", help='Disable "appAccess" for the specified user in the org')
 parser_add_member.add_argument("--project-access", choices=["ADMINISTER", "CONTRIBUTE", "UPLOAD", "VIEW", "NONE"], default="CONTRIBUTE", help='The default implicit maximum permission the specified user will receive to projects explicitly shared with the org; default CONTRIBUTE')
 parser_add_member.add_argument("--no-email", default=False, action="store_true", help="Disable org invitation email notification to the specified user")
-parser_add_member.set_defaults(func=add_membership)
+parser_add_member.set_defaults(func=_lazy_command('dxpy.cli.org', 'add_membership'))
 register_subparser(parser_add_member, subparsers_action=subparsers_add, categories="other")
 
 parser_list = subparsers.add_parser('list', help='Print the members of a list',
@@ -3798,7 +3941,7 @@ parser_list_stages = subparsers_list.add_parser('stages', help='List the stages
                                                 parents=[env_args],
                                                 prog='dx list stages')
 parser_list_stages.add_argument('workflow', help='Name or ID of a workflow').completer = DXPathCompleter(classes=['workflow'])
-parser_list_stages.set_defaults(func=workflow_cli.list_stages)
+parser_list_stages.set_defaults(func=_lazy_command('dxpy.cli.workflow', 'list_stages'))
 register_subparser(parser_list_stages, subparsers_action=subparsers_list, categories='workflow')
 
 parser_remove = subparsers.add_parser('remove', help='Remove one or more items to a list',
@@ -3833,7 +3976,7 @@ parser_remove_stage = subparsers_remove.add_parser('stage', help='Remove a stage
                                                    prog='dx remove stage')
 parser_remove_stage.add_argument('workflow', help='Name or ID of a workflow').completer = DXPathCompleter(classes=['workflow'])
 parser_remove_stage.add_argument('stage', help='Stage (index or ID) of the workflow to remove')
-parser_remove_stage.set_defaults(func=workflow_cli.remove_stage)
+parser_remove_stage.set_defaults(func=_lazy_command('dxpy.cli.workflow', 'remove_stage'))
 register_subparser(parser_remove_stage, subparsers_action=subparsers_remove, categories='workflow')
 
 parser_remove_member = subparsers_remove.add_parser("member", help="Revoke the org membership of a user", description="Revoke the org membership of a user", prog="dx remove member", parents=[stdout_args, env_args])
@@ -3841,7 +3984,7 @@ parser_remove_member.add_argument("org_id", help="ID of the org")
 parser_remove_member.add_argument("username", help="Username")
 parser_remove_member.add_argument("--keep-explicit-project-permissions", default=True, action="store_false", dest="revoke_project_permissions", help="Disable revocation of explicit project permissions of the specified user to projects billed to the org; implicit project permissions (i.e. those granted to the specified user via his membership in this org) will always be revoked")
 parser_remove_member.add_argument("--keep-explicit-app-permissions", default=True, action="store_false", dest="revoke_app_permissions", help="Disable revocation of explicit app developer and user permissions of the specified user to apps billed to the org; implicit app permissions (i.e. those granted to the specified user via his membership in this org) will always be revoked")
-parser_remove_member.set_defaults(func=remove_membership)
+parser_remove_member.set_defaults(func=_lazy_command('dxpy.cli.org', 'remove_membership'))
 register_subparser(parser_remove_member, subparsers_action=subparsers_remove, categories="other")
 
 parser_update = subparsers.add_parser('update', help='Update certain types of metadata',
@@ -3867,7 +4010,7 @@ parser_update_workflow.add_argument('--description', help='Workflow description'
 update_workflow_output_folder_args = parser_update_workflow.add_mutually_exclusive_group()
 update_workflow_output_folder_args.add_argument('--output-folder', help='Default output folder for the workflow')
 update_workflow_output_folder_args.add_argument('--no-output-folder', help='Unset the default output folder for the workflow', action='store_true')
-parser_update_workflow.set_defaults(func=workflow_cli.update_workflow)
+parser_update_workflow.set_defaults(func=_lazy_command('dxpy.cli.workflow', 'update_workflow'))
 register_subparser(parser_update_workflow, subparsers_action=subparsers_update, categories='workflow')
 
 parser_update_stage = subparsers_update.add_parser('stage', help='Update the metadata for a stage in a workflow',
@@ -3890,7 +4033,7 @@ update_stage_name_args.add_argument('--no-name', help='Unset the stage name', ac
 update_stage_folder_args = parser_update_stage.add_mutually_exclusive_group()
 update_stage_folder_args.add_argument('--output-folder', help='Path to the output folder for the stage (interpreted as an absolute path)')
 update_stage_folder_args.add_argument('--relative-output-folder', help='A relative folder path for the stage (interpreted as relative to the workflow\'s output folder)')
-parser_update_stage.set_defaults(func=workflow_cli.update_stage)
+parser_update_stage.set_defaults(func=_lazy_command('dxpy.cli.workflow', 'update_stage'))
 register_subparser(parser_update_stage, subparsers_action=subparsers_update, categories='workflow')
 
 parser_update_member = subparsers_update.add_parser("member", help="Update the membership of a user in an org", description="Update the membership of a user in an org", prog="dx update member", parents=[stdout_args, env_args])
@@ -3900,7 +4043,7 @@ parser_update_member.add_argument("--level", required=True, choices=["ADMIN", "M
 parser_update_member.add_argument("--allow-billable-activities", choices=["true", "false"], help='The new "createProjectsAndApps" membership permission of the specified user in the org')
 parser_update_member.add_argument("--app-access", choices=["true", "false"], help='The new "appAccess" membership permission of the specified user in the org')
 parser_update_member.add_argument("--project-access", choices=["ADMINISTER", "CONTRIBUTE", "UPLOAD", "VIEW", "NONE"], help='The new default implicit maximum permission the specified user will receive to projects explicitly shared with the org')
-parser_update_member.set_defaults(func=update_membership)
+parser_update_member.set_defaults(func=_lazy_command('dxpy.cli.org', 'update_membership'))
 register_subparser(parser_update_member, subparsers_action=subparsers_update, categories="other")
 
 parser_install = subparsers.add_parser('install', help='Install an app',
@@ -4059,9 +4202,7 @@ parser_terminate = subparsers.add_parser('terminate', help='Terminate job(s)',
                                          parents=[env_args])
 parser_terminate.add_argument('jobid', help='ID of the job to terminate', nargs='+')
 parser_terminate.set_defaults(func=terminate)
-parser_map['terminate'] = parser_terminate
-parser_categories['all']['cmds'].append((subparsers._choices_actions[-1].dest, subparsers._choices_actions[-1].help))
-parser_categories['exec']['cmds'].append((subparsers._choices_actions[-1].dest, subparsers._choices_actions[-1].help))
+register_subparser(parser_terminate, categories='exec')
 
 parser_rmproject = subparsers.add_parser('rmproject', help='Delete a project',
                                          description='Delete projects and all their associated data',
@@ -4136,7 +4277,7 @@ parser_new_workflow.add_argument('--description', help='Workflow description')
 parser_new_workflow.add_argument('--output-folder', help='Default output folder for the workflow')
 init_action = parser_new_workflow.add_argument('--init', help=fill('Path to workflow or an analysis ID from which to initialize all metadata', width_adjustment=-24))
 init_action.completer = DXPathCompleter(classes=['workflow'])
-parser_new_workflow.set_defaults(func=workflow_cli.new_workflow)
+parser_new_workflow.set_defaults(func=_lazy_command('dxpy.cli.workflow', 'new_workflow'))
 register_subparser(parser_new_workflow, subparsers_action=subparsers_new, categories='workflow')
 
 parser_new_gtable = subparsers_new.add_parser('gtable', add_help=False, #help='Create a new gtable',
@@ -4449,10 +4590,9 @@ parser_help.set_defaults(func=print_help)
 # TODO: make this completer conditional on whether "help run" is in args
 # parser_help.completer = MultiCompleter([DXAppCompleter(),
 #                                         DXPathCompleter(classes=['applet'])])
-parser_map['help'] = parser_help # TODO: a special help completer
+# TODO: a special help completer
+register_subparser(parser_help, categories=[category for category in parser_categories if category != 'all'])
 parser_map['help run'] = parser_help
-for category in parser_categories:
-    parser_categories[category]['cmds'].append(('help', subparsers._choices_actions[-1].help))
 parser_categories['all']['cmds'].sort()
 
 def main():
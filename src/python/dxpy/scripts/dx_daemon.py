@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2014-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+from __future__ import print_function, unicode_literals
+
+import sys, argparse
+
+from dxpy.cli import daemon
+from dxpy.exceptions import err_exit
+from dxpy.utils.printing import fill
+
+parser = argparse.ArgumentParser(description=fill('Starts, stops, or reports on the dx daemon, which runs dx commands '
+                                                  'without reloading dxpy for each of them, and keeps their '
+                                                  'connections to the platform open from one command to the next. '
+                                                  'While the daemon is running, dx runs each command that is not run '
+                                                  'interactively (with both its standard input and output attached '
+                                                  'to a terminal) in a process forked from the daemon.'),
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument('action', choices=['start', 'stop', 'status', 'run'],
+                    help='"start" starts the daemon in the background, "stop" stops it, "status" reports whether it '
+                         'is running, and "run" runs it in the foreground')
+parser.add_argument('--socket', help='Path of the Unix socket on which the daemon listens (default: '
+                                     '$DX_DAEMON_SOCKET, or ~/.dnanexus_config/daemon/dx.sock)')
+
+def main():
+    args = parser.parse_args()
+    socket_path = args.socket or daemon.get_socket_path()
+    try:
+        if args.action == 'start':
+            daemon.start_daemon(socket_path)
+            print('Started the dx daemon on ' + socket_path)
+        elif args.action == 'stop':
+            if not daemon.stop_daemon(socket_path):
+                err_exit('No dx daemon is listening on ' + socket_path, code=3)
+            print('Stopped the dx daemon on ' + socket_path)
+        elif args.action == 'status':
+            status = daemon.get_daemon_status(socket_path)
+            if status is None:
+                err_exit('No dx daemon is listening on ' + socket_path, code=3)
+            print('The dx daemon (pid {pid}, dxpy {version}) is listening on {path}, and has accepted {n} '
+                  'connections'.format(pid=status['pid'], version=status['version'], path=socket_path,
+                                       n=status['connections']))
+        else:
+            daemon.serve(socket_path)
+    except SystemExit:
+        raise
+    except Exception:
+        err_exit()
+
+if __name__ == '__main__':
+    main()
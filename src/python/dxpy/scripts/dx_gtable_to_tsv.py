@@ -82,7 +82,7 @@ def main(**kwargs):
                                                       hi,
                                                       args.gri_mode,
                                                       args.gri_name)
-        iterator = dxtable.iterate_query_rows(query=gri_query, limit=args.limit)
+        iterator = dxtable.iterate_query_rows(query=gri_query, limit=args.limit, num_windows=dxpy.DXGTABLE_HTTP_THREADS)
     else:
         iterator = dxtable.iterate_rows(start=args.starting, end=(None if args.limit is None else args.starting + args.limit))
     for row in iterator:
@@ -128,22 +128,23 @@ def main(**kwargs):
                 intersection.append(x)
         chromosomeList = intersection[:]
  
-    for chromosome in chromosomeList:
-        buff = []
-        lastPosition = -1
-        query = variantsTable.genomic_range_query(chr=chromosome, lo=0, hi=sys.maxint)
-        for row in variantsTable.get_rows(query=query, limit=1)['data']:
-            startRow =  row[0]
-            for row in variantsTable.iterate_rows(start=startRow):
-                if row[1] != chromosome:
-                    break
-                if lastPosition < row[col["lo"]]:
-                    writeBuffer(buff, col, outputFile, contigSequence, chromosomeOffsets, exportRef, exportNoCall)
-                    buff = []
-                buff.append(row)
-                lastPosition = row[col["lo"]]
-        writeBuffer(buff, col, outputFile, contigSequence, chromosomeOffsets, exportRef, exportNoCall)
-        buff = []
+    chromosomeSizes = dict(zip(contigDetails['contigs']['names'], contigDetails['contigs']['sizes']))
+
+    # The chromosomes, split into windows, are fetched concurrently and
+    # returned in order
+    queries = [variantsTable.genomic_range_query(chr=chromosome, lo=0, hi=chromosomeSizes[chromosome])
+               for chromosome in chromosomeList]
+    buff = []
+    lastChromosome = None
+    lastPosition = -1
+    for row in variantsTable.iterate_query_rows(query=queries, num_windows=16):
+        if row[1] != lastChromosome or lastPosition < row[col["lo"]]:
+            writeBuffer(buff, col, outputFile, contigSequence, chromosomeOffsets, exportRef, exportNoCall)
+            buff = []
+        buff.append(row)
+        lastChromosome = row[1]
+        lastPosition = row[col["lo"]]
+    writeBuffer(buff, col, outputFile, contigSequence, chromosomeOffsets, exportRef, exportNoCall)
 
 def writeBuffer(buff, col, outputFile, contigSequence, chromosomeOffsets, exportRef, exportNoCall):
     for x in buff:
@@ -20,8 +20,9 @@ Utilities shared by dxpy modules.
 
 from __future__ import (print_function, unicode_literals)
 
-import os, json, collections, concurrent.futures, traceback, sys, time, gc
+import os, json, collections, concurrent.futures, traceback, sys, time, gc, threading
 import dateutil.parser
+import dxpy
 from .thread_pool import PrioritizingThreadPool
 from .. import logger
 from ..compat import basestring
@@ -32,11 +33,35 @@ def _force_quit(signum, frame):
     os._exit(os.EX_IOERR)
     # os.abort()
 
-def get_futures_threadpool(max_workers):
+class _ConnectionReservingThreadPool(PrioritizingThreadPool):
+    # Reserves connection pool capacity for its workers (see
+    # dxpy.reserve_connection_pool_capacity) until it is shut down
+    def __init__(self, max_workers):
+        PrioritizingThreadPool.__init__(self, max_workers=max_workers)
+        self._reservation_lock = threading.Lock()
+        self._reserved_connections = max_workers
+        dxpy.reserve_connection_pool_capacity(max_workers)
+
+    def shutdown(self, wait=True):
+        PrioritizingThreadPool.shutdown(self, wait=wait)
+        with self._reservation_lock:
+            reserved_connections, self._reserved_connections = self._reserved_connections, 0
+        dxpy.release_connection_pool_capacity(reserved_connections)
+
+def get_futures_threadpool(max_workers, reserve_connections=True):
+    """
+    :param max_workers: Number of worker threads
+    :type max_workers: int
+    :param reserve_connections: Whether the workers make HTTP requests, and so need room in the connection pools
+    :type reserve_connections: boolean
+    :rtype: PrioritizingThreadPool
+    """
     #import signal
     #if force_quit_on_sigint:
     #    signal.signal(signal.SIGINT, _force_quit)
     #return concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    if reserve_connections:
+        return _ConnectionReservingThreadPool(max_workers=max_workers)
     return PrioritizingThreadPool(max_workers=max_workers)
 
 def wait_for_a_future(futures, print_traceback=False):
@@ -94,8 +119,8 @@ def response_iterator(request_iterator, thread_pool, max_active_tasks=4, num_ret
     :type request_iterator: iterator of callable_, args, kwargs
     :param thread_pool: thread pool to submit the requests to
     :type thread_pool: PrioritizingThreadPool
-    :param max_active_tasks: The maximum number of tasks that may be either running or waiting for consumption of their result.
-    :type max_active_tasks: int
+    :param max_active_tasks: The maximum number of tasks that may be either running or waiting for consumption of their result. If a callable is given, it is called each time a result is consumed to obtain the current limit.
+    :type max_active_tasks: int or callable
     :param num_retries: The number of times to retry the request.
     :type num_retries: int
     :param retry_after: The number of seconds to wait before retrying the request.
@@ -155,7 +180,9 @@ def response_iterator(request_iterator, thread_pool, max_active_tasks=4, num_ret
     # retries: number of additional times they request may be retried
     tasks_in_progress = collections.deque()
 
-    for _i in range(max_active_tasks):
+    get_max_active_tasks = max_active_tasks if callable(max_active_tasks) else lambda: max_active_tasks
+
+    for _i in range(get_max_active_tasks()):
         try:
             callable_, args, kwargs = next(request_iterator)
             # print "Submitting (initial batch):", callable_, args, kwargs
@@ -187,13 +214,16 @@ def response_iterator(request_iterator, thread_pool, max_active_tasks=4, num_ret
                    # time around the loop
         gc.collect()
 
-        try:
-            callable_, args, kwargs = next(request_iterator)
-        except StopIteration:
-            pass
-        else:
-            tasks_in_progress.append(submit(callable_, args, kwargs))
-            next_request_index += 1
+        # Top up to the current limit (which may have changed since the
+        # last result was consumed).
+        while len(tasks_in_progress) < max(1, get_max_active_tasks()):
+            try:
+                callable_, args, kwargs = next(request_iterator)
+            except StopIteration:
+                break
+            else:
+                tasks_in_progress.append(submit(callable_, args, kwargs))
+                next_request_index += 1
         yield result
         del result
         num_results_yielded += 1
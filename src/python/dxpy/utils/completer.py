@@ -21,7 +21,7 @@ dx for tab-completion, resolving naming conflicts, etc.
 
 from __future__ import (print_function, unicode_literals)
 
-import sys
+import sys, fnmatch
 
 from argcomplete import warn
 from collections import namedtuple, OrderedDict
@@ -29,6 +29,10 @@ import dxpy
 from dxpy.utils.resolver import (get_first_pos_of_char, get_last_pos_of_char, clean_folder_path, resolve_path,
                                  split_unescaped, ResolutionError)
 from dxpy.utils.printing import fill
+from dxpy.compat import basestring
+
+# Folders with more data objects than this are not cached for completion
+MAX_CACHED_FOLDER_OBJECTS = 1000
 
 def startswith(text):
     return (lambda string: string.startswith(text))
@@ -84,6 +88,51 @@ def split_path(path):
 # def unescape_completion_name_str(string):
 #     return string.replace('\\)', ')').replace('\\(', '(').replace('\\\\\\\\?', '?').replace('\\\\\\\\*', '*').replace('\\\\/', '/').replace('\\\\:', ':').replace('\ ', ' ').replace('\\\\\\\\', '\\')
 
+def _list_subfolders(dxproj, folderpath):
+    '''
+    :returns: Names of the subfolders of *folderpath*
+    :rtype: list of strings
+
+    The listing is served from the completion cache if it is enabled.
+    '''
+    from dxpy.utils.completion_cache import get_completion_cache
+
+    def fetch():
+        return dxproj.list_folder(folder=folderpath, only='folders')['folders']
+    cache = get_completion_cache()
+    if cache is None:
+        return fetch()
+    return cache.get("folders", [dxproj.get_id(), folderpath], fetch)
+
+def _list_folder_objects(dxproj, folderpath):
+    '''
+    :returns: Descriptions of the data objects in *folderpath*, or None if the completion cache is disabled or there are too many objects to cache
+    :rtype: list of dicts
+
+    The listing is served from the completion cache.
+    '''
+    from dxpy.utils.completion_cache import get_completion_cache
+    cache = get_completion_cache()
+    if cache is None:
+        return None
+    params = [dxproj.get_id(), folderpath]
+
+    def fetch():
+        previous = cache.peek("objects", params)
+        if previous is not None and previous["descriptions"] is None:
+            # Known to have too many objects; they are not listed again
+            # while the listing stays in the cache
+            return previous
+        objects = [result['describe'] for result in
+                   dxpy.find_data_objects(project=dxproj.get_id(), folder=folderpath, recurse=False,
+                                          visibility="either", limit=MAX_CACHED_FOLDER_OBJECTS + 1,
+                                          describe={"fields": {"name": True, "class": True,
+                                                               "types": True, "hidden": True}})]
+        if len(objects) > MAX_CACHED_FOLDER_OBJECTS:
+            objects = None
+        return {"descriptions": objects}
+    return cache.get("objects", params, fetch)["descriptions"]
+
 def get_folder_matches(text, delim_pos, dxproj, folderpath):
     '''
     :param text: String to be tab-completed; still in escaped form
@@ -101,10 +150,8 @@ def get_folder_matches(text, delim_pos, dxproj, folderpath):
     and be in escaped form for consumption by the command-line.
     '''
     try:
-        folder_names = map(lambda folder_name:
-                               folder_name[folder_name.rfind('/') + 1:],
-                           dxproj.list_folder(folder=folderpath,
-                                              only='folders')['folders'])
+        folders = _list_subfolders(dxproj, folderpath)
+        folder_names = [folder_name[folder_name.rfind('/') + 1:] for folder_name in folders]
         if text != '' and delim_pos != len(text) - 1:
             folder_names += ['.', '..']
         prefix = text[:delim_pos + 1]
@@ -144,6 +191,16 @@ def get_data_matches(text, delim_pos, dxproj, folderpath, classname=None,
             visibility = "visible"
 
     try:
+        descs = _list_folder_objects(dxproj, folderpath)
+        if descs is not None and (typespec is None or isinstance(typespec, basestring)):
+            names = [desc['name'] for desc in descs
+                     if fnmatch.fnmatchcase(desc['name'], unescaped_text + "*") and
+                     (classname is None or desc['class'] == classname) and
+                     (typespec is None or typespec in desc.get('types', [])) and
+                     (visibility == "either" or desc.get('hidden', False) == (visibility == "hidden"))]
+            prefix = '' if text == '' else text[:delim_pos + 1]
+            return [prefix + escape_name(name) for name in names[:100]]
+
         results = list(dxpy.find_data_objects(project=dxproj.get_id(),
                                               folder=folderpath,
                                               name=unescaped_text + "*",
@@ -292,14 +349,22 @@ class DXAppCompleter():
         self.installed = installed
 
     def _populate_matches(self, prefix):
+        from dxpy.utils.completion_cache import get_completion_cache
+        cache = get_completion_cache()
         try:
-            name_query = None
-            if len(prefix) > 0:
-                if prefix.startswith("app-") and len(prefix) > 4:
-                    name_query = prefix[4:] + "*"
-                elif len(prefix) > 4 or not "app-".startswith(prefix):
-                    name_query = prefix + "*"
-            appnames = [result['describe']['name'] for result in dxpy.find_apps(name=name_query, name_mode="glob", describe={"fields": {"name": True, "installed": (self.installed is not None)}}) if self.installed is None or (self.installed == result['describe']['installed'])]
+            if cache is not None:
+                # The complete list is filtered by prefix below, so the
+                # same cached list serves every prefix
+                apps = cache.get("apps", [], lambda: [result['describe'] for result in dxpy.find_apps(describe={"fields": {"name": True, "installed": True}})])
+                appnames = [desc['name'] for desc in apps if self.installed is None or (self.installed == desc['installed'])]
+            else:
+                name_query = None
+                if len(prefix) > 0:
+                    if prefix.startswith("app-") and len(prefix) > 4:
+                        name_query = prefix[4:] + "*"
+                    elif len(prefix) > 4 or not "app-".startswith(prefix):
+                        name_query = prefix + "*"
+                appnames = [result['describe']['name'] for result in dxpy.find_apps(name=name_query, name_mode="glob", describe={"fields": {"name": True, "installed": (self.installed is not None)}}) if self.installed is None or (self.installed == result['describe']['installed'])]
         except:
             # This is for (temporary) backwards-compatibility
             appnames = [result['describe']['name'] for result in dxpy.find_apps(describe=True) if self.installed is None or (self.installed == result['describe']['installed'])]
@@ -0,0 +1,232 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+"""
+On-disk cache of the folder listings and app lists used for tab
+completion, so that pressing Tab repeatedly does not wait for the API
+server each time.
+
+An entry is fresh for a short time after it is fetched. After that, it
+is still returned immediately for a while, but a detached background
+process fetches a new copy for the next completion
+(stale-while-revalidate). Entries older than that are fetched again
+before returning. The cache is kept in ``completion_cache`` in the user
+configuration directory and is configured by:
+
+.. envvar:: DX_COMPLETION_CACHE_TTL
+
+   Number of seconds for which an entry is fresh (default: 30). Setting
+   this to 0 disables the cache.
+
+Entries are keyed by the API server and security context as well as the
+listing itself, so that logging in as another user does not reuse
+listings fetched for the previous one.
+"""
+
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+import os, json, time, signal, hashlib, tempfile
+
+import dxpy
+from .. import logger
+from ..compat import environ
+
+DEFAULT_COMPLETION_CACHE_TTL = 30
+DEFAULT_COMPLETION_CACHE_MAX_STALENESS = 60 * 60
+
+# Upper bound on the run time of a background refresh
+REFRESH_TIMEOUT = 60
+
+_TEMP_PREFIX = ".tmp-"
+_REFRESH_SUFFIX = ".refreshing"
+
+
+class DXCompletionCache(object):
+    '''
+    :param cache_dir: Directory holding the cached listings (created if necessary)
+    :type cache_dir: string
+    :param ttl: Number of seconds for which an entry is returned without being refreshed
+    :type ttl: int
+    :param max_staleness: Number of seconds after which an entry is no longer returned at all
+    :type max_staleness: int
+
+    Cache of JSON-serializable listings, keyed by the kind of listing
+    and the parameters identifying it (e.g. the project and folder).
+    '''
+
+    def __init__(self, cache_dir, ttl=DEFAULT_COMPLETION_CACHE_TTL,
+                 max_staleness=DEFAULT_COMPLETION_CACHE_MAX_STALENESS):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_staleness = max(ttl, max_staleness)
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir, 0o700)
+            except OSError:
+                # Possibly created concurrently by another process
+                if not os.path.isdir(cache_dir):
+                    raise
+
+    def _path_for(self, kind, params):
+        key = json.dumps([dxpy.APISERVER, dxpy.SECURITY_CONTEXT, kind, params], sort_keys=True)
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def _load(self, path):
+        try:
+            with open(path) as fh:
+                entry = json.load(fh)
+            return entry['time'], entry['value']
+        except (IOError, OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _store(self, path, value):
+        fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                json.dump({'time': time.time(), 'value': value}, fh)
+            os.rename(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self._remove_expired()
+
+    def _remove_expired(self):
+        # Keeps the cache small by dropping entries (and leftovers of
+        # interrupted writes and refreshes) that would not be used anyway
+        cutoff = time.time() - self.max_staleness
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def _refresh_in_background(self, path, fetch):
+        '''
+        :returns: False if background processes are not supported, True otherwise
+        :rtype: boolean
+
+        Starts a detached process that fetches and stores a new copy of
+        the entry at *path*, unless one is already running.
+        '''
+        if not hasattr(os, 'fork'):
+            return False
+        marker = path + _REFRESH_SUFFIX
+        try:
+            if time.time() - os.path.getmtime(marker) < REFRESH_TIMEOUT:
+                return True
+        except OSError:
+            pass
+        try:
+            os.close(os.open(marker, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600))
+        except OSError:
+            return False
+
+        pid = os.fork()
+        if pid != 0:
+            # The intermediate child exits right away, so the refresh
+            # is reparented to init and never becomes our zombie
+            os.waitpid(pid, 0)
+            return True
+        try:
+            os.setsid()
+            if os.fork() != 0:
+                os._exit(0)
+            # Release the terminal and any pipes the shell is reading
+            # completions from, so that completion returns immediately
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in range(3):
+                os.dup2(devnull, fd)
+            try:
+                max_fd = os.sysconf(str('SC_OPEN_MAX'))
+            except (AttributeError, ValueError, OSError):
+                max_fd = 256
+            os.closerange(3, max_fd)
+            signal.alarm(REFRESH_TIMEOUT)
+            self._store(path, fetch())
+        except BaseException:
+            pass
+        finally:
+            try:
+                os.remove(marker)
+            except OSError:
+                pass
+            os._exit(0)
+
+    def peek(self, kind, params):
+        '''
+        :returns: The cached value, however stale, or None if there is no entry that may still be returned
+
+        Does not fetch or refresh the entry.
+        '''
+        entry = self._load(self._path_for(kind, params))
+        if entry is None or not 0 <= time.time() - entry[0] < self.max_staleness:
+            return None
+        return entry[1]
+
+    def get(self, kind, params, fetch):
+        '''
+        :param kind: Kind of listing, e.g. "folder" or "apps"
+        :type kind: string
+        :param params: JSON-serializable parameters identifying the listing
+        :param fetch: Function of no arguments that fetches the listing from the API server
+        :type fetch: function
+        :returns: The JSON-serializable value returned by *fetch*, possibly from the cache
+
+        Returns fresh entries from the cache. Stale entries are also
+        returned from the cache while a new copy is fetched in the
+        background; missing and expired entries are fetched first.
+        '''
+        path = self._path_for(kind, params)
+        entry = self._load(path)
+        if entry is not None:
+            fetched_at, value = entry
+            age = time.time() - fetched_at
+            if 0 <= age < self.ttl:
+                return value
+            if 0 <= age < self.max_staleness and self._refresh_in_background(path, fetch):
+                return value
+        value = fetch()
+        try:
+            self._store(path, value)
+        except (IOError, OSError) as e:
+            logger.warn("Could not store completion cache entry in %s: %s", self.cache_dir, e)
+        return value
+
+
+def get_completion_cache():
+    '''
+    :returns: The cache configured by :envvar:`DX_COMPLETION_CACHE_TTL`, or None if it is disabled
+    :rtype: :class:`DXCompletionCache` or None
+    '''
+    try:
+        ttl = int(environ.get('DX_COMPLETION_CACHE_TTL', DEFAULT_COMPLETION_CACHE_TTL))
+    except ValueError:
+        logger.warn("Expected DX_COMPLETION_CACHE_TTL to be an integer number of seconds; using the default")
+        ttl = DEFAULT_COMPLETION_CACHE_TTL
+    if ttl <= 0:
+        return None
+    cache_dir = os.path.join(dxpy.config.get_user_conf_dir(), 'completion_cache')
+    try:
+        return DXCompletionCache(cache_dir, ttl)
+    except (IOError, OSError) as e:
+        logger.warn("Could not use completion cache directory %s: %s", cache_dir, e)
+        return None
+
@@ -84,6 +84,9 @@ class DXConfig(MutableMapping):
         "DX_CLI_WD": "/"
     }
     _global_conf_dir = "/etc/dnanexus"
+    # If set, used instead of looking up the session configuration
+    # directory (by the dx daemon, for the session of its client)
+    _session_conf_dir = None
 
     def __init__(self, suppress_warning=False):
         """
@@ -162,7 +165,13 @@ class DXConfig(MutableMapping):
         If *cleanup* is True, looks up and deletes all session configuration directories that belong to nonexistent
         processes.
         """
+        if self._session_conf_dir is not None:
+            return self._session_conf_dir
         sessions_dir = os.path.join(self._user_conf_dir, "sessions")
+        if not os.path.isdir(sessions_dir):
+            # There is nothing to clean up, and the result is the path for the
+            # immediate parent; avoids loading psutil, which slows down startup
+            return self._get_ppid_session_conf_dir(sessions_dir)
         try:
             from psutil import Process, pid_exists
 
@@ -0,0 +1,123 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+"""This module contains DescribeCache, the process-wide cache of data
+object descriptions enabled with
+:meth:`dxpy.bindings.DXDataObject.set_describe_cache_size`.
+
+"""
+
+from __future__ import (print_function, unicode_literals)
+
+import collections
+import copy
+import json
+import threading
+import time
+
+DEFAULT_DESCRIBE_CACHE_TTL = 60
+
+# Fields that can no longer change once an object is closed
+IMMUTABLE_FIELDS_OF_CLOSED_OBJECTS = frozenset([
+    "id", "class", "project", "state", "hidden", "types", "details", "links", "created", "createdBy", "media",
+    "size", "columns", "indices", "length", "runSpec", "inputSpec", "outputSpec", "dxapi", "access"
+])
+
+
+class DescribeCache(object):
+    """Least recently used cache of descriptions keyed by object ID
+    and describe input (which includes the project and the fields
+    requested).
+
+    * Descriptions of objects that are not closed are not cached, since
+      they may be changing, and neither are descriptions without the
+      "state" field.
+    * Descriptions of closed objects that contain only fields listed in
+      :data:`IMMUTABLE_FIELDS_OF_CLOSED_OBJECTS` never expire.
+    * Other descriptions expire *ttl* seconds after they were stored.
+
+    Descriptions are copied on the way in and out, so callers may
+    modify them freely. All methods are thread safe.
+
+    """
+
+    def __init__(self, max_entries, ttl=DEFAULT_DESCRIBE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits, self.misses = 0, 0
+        self._entries = collections.OrderedDict()
+        self._keys_by_id = collections.defaultdict(set)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(dxid, describe_input):
+        return dxid, json.dumps(describe_input, sort_keys=True)
+
+    def get(self, dxid, describe_input):
+        """
+        :returns: A copy of the cached description, or None if there is no unexpired entry
+        """
+        key = self._key(dxid, describe_input)
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or (entry[1] is not None and entry[1] < time.time()):
+                if entry is not None:
+                    self._keys_by_id[dxid].discard(key)
+                self.misses += 1
+                return None
+            # Reinsert to mark as most recently used
+            self._entries[key] = entry
+            self.hits += 1
+            desc = entry[0]
+        return copy.deepcopy(desc)
+
+    def put(self, dxid, describe_input, desc):
+        """
+        Stores *desc* if it is the description of a closed object (that
+        is, if its "state" field is "closed"); other descriptions are
+        ignored.
+        """
+        state = desc.get("state")
+        if state != "closed":
+            return
+        if state == "closed" and IMMUTABLE_FIELDS_OF_CLOSED_OBJECTS.issuperset(desc):
+            expires = None
+        else:
+            expires = time.time() + self.ttl
+        key = self._key(dxid, describe_input)
+        desc = copy.deepcopy(desc)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (desc, expires)
+            self._keys_by_id[dxid].add(key)
+            while len(self._entries) > self.max_entries:
+                evicted_key, _entry = self._entries.popitem(last=False)
+                self._keys_by_id[evicted_key[0]].discard(evicted_key)
+                if not self._keys_by_id[evicted_key[0]]:
+                    del self._keys_by_id[evicted_key[0]]
+
+    def invalidate(self, dxid):
+        """
+        Removes all cached descriptions of the object *dxid*.
+        """
+        with self._lock:
+            for key in self._keys_by_id.pop(dxid, ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_id.clear()
@@ -25,6 +25,7 @@ from functools import wraps
 from collections import namedtuple
 
 import dxpy
+from . import json_codec
 from ..compat import USING_PYTHON2, open
 from ..exceptions import AppInternalError
 
@@ -158,7 +159,7 @@ def run(function_name=None, function_input=None):
         # TODO: protect against client removing its original working directory
         os.chdir(dx_working_dir)
         with open("job_output.json", "wb") as fh:
-            json.dump(result, fh, indent=2, cls=DXJSONEncoder)
+            fh.write(json_codec.dumps_bytes(result, default=DXJSONEncoder().default, indent=2))
             fh.write(b"\n")
 
     return result
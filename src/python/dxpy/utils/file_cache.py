@@ -0,0 +1,200 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+"""
+Opt-in on-disk cache of the contents of closed files.
+
+Closed files are immutable, so their contents can be cached under their
+file ID and shared by every process that uses the same cache directory.
+The cache is enabled by setting the following environment variables:
+
+.. envvar:: DX_FILE_CACHE_DIR
+
+   Directory in which to keep cached file contents. The cache is
+   disabled if this is not set.
+
+.. envvar:: DX_FILE_CACHE_SIZE
+
+   Maximum total size of the cached files, in bytes (default: 10 GB).
+   Least recently used files are evicted once this is exceeded.
+
+Entries are written to a temporary file in the cache directory and
+atomically renamed into place, so readers never see a partial entry.
+Eviction is serialized across processes with a lock file.
+"""
+
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+import os, shutil, tempfile, contextlib
+
+try:
+    import fcntl
+except ImportError:
+    # Not available on Windows; eviction is then not serialized across
+    # processes, which can only cause redundant (not incorrect) deletes.
+    fcntl = None
+
+from .. import logger
+from ..compat import environ
+
+DEFAULT_FILE_CACHE_SIZE = 1024*1024*1024*10
+
+_LOCK_FILENAME = ".lock"
+_TEMP_PREFIX = ".tmp-"
+
+
+class DXFileCache(object):
+    '''
+    :param cache_dir: Directory holding the cached files (created if necessary)
+    :type cache_dir: string
+    :param max_bytes: Maximum total size of the cached files
+    :type max_bytes: int
+
+    Size-bounded cache of the contents of closed files, keyed by file ID.
+    '''
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_FILE_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError:
+                # Possibly created concurrently by another process
+                if not os.path.isdir(cache_dir):
+                    raise
+
+    def _path_for(self, dxid):
+        return os.path.join(self.cache_dir, dxid)
+
+    @contextlib.contextmanager
+    def _exclusive_lock(self):
+        with open(os.path.join(self.cache_dir, _LOCK_FILENAME), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def open(self, dxid, size):
+        '''
+        :param dxid: ID of a closed file
+        :type dxid: string
+        :param size: Expected size of the file
+        :type size: int
+        :returns: A binary file object for the cached contents, or None if the file is not cached
+
+        Marks the entry as recently used.
+        '''
+        path = self._path_for(dxid)
+        try:
+            fh = open(path, 'rb')
+        except (IOError, OSError):
+            return None
+        if os.fstat(fh.fileno()).st_size != size:
+            fh.close()
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            # Evicted since we opened it; our handle is still good
+            pass
+        return fh
+
+    def copy_to(self, dxid, size, filename):
+        '''
+        :returns: True if the file was cached and its contents have been copied to *filename*, False otherwise
+        :rtype: boolean
+        '''
+        src = self.open(dxid, size)
+        if src is None:
+            return False
+        with src, open(filename, 'wb') as dest:
+            shutil.copyfileobj(src, dest, 1024*1024*16)
+        return True
+
+    def store(self, dxid, size, filename):
+        '''
+        :param filename: Local file holding the complete contents of the closed file *dxid*
+        :type filename: string
+
+        Adds a copy of *filename* to the cache under *dxid* and evicts
+        least recently used entries if the cache is now over its size
+        limit. Files larger than the whole cache are not stored.
+        '''
+        if size > self.max_bytes or os.path.getsize(filename) != size:
+            return
+        fd, temp_path = tempfile.mkstemp(prefix=_TEMP_PREFIX, dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as dest, open(filename, 'rb') as src:
+                shutil.copyfileobj(src, dest, 1024*1024*16)
+            os.rename(temp_path, self._path_for(dxid))
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        self.evict()
+
+    def evict(self):
+        '''
+        Removes least recently used entries until the total size of the
+        cache is within its limit.
+        '''
+        with self._exclusive_lock():
+            entries = []
+            total_size = 0
+            for name in os.listdir(self.cache_dir):
+                if name == _LOCK_FILENAME or name.startswith(_TEMP_PREFIX):
+                    continue
+                try:
+                    st = os.stat(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name, st.st_size))
+                total_size += st.st_size
+            entries.sort()
+            for _mtime, name, entry_size in entries:
+                if total_size <= self.max_bytes:
+                    break
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                total_size -= entry_size
+
+
+def get_file_cache():
+    '''
+    :returns: The cache configured by :envvar:`DX_FILE_CACHE_DIR` and :envvar:`DX_FILE_CACHE_SIZE`, or None if it is not enabled
+    :rtype: :class:`DXFileCache` or None
+    '''
+    cache_dir = environ.get('DX_FILE_CACHE_DIR')
+    if not cache_dir:
+        return None
+    try:
+        max_bytes = int(environ.get('DX_FILE_CACHE_SIZE', DEFAULT_FILE_CACHE_SIZE))
+    except ValueError:
+        logger.warn("Expected DX_FILE_CACHE_SIZE to be an integer number of bytes; using the default")
+        max_bytes = DEFAULT_FILE_CACHE_SIZE
+    try:
+        return DXFileCache(cache_dir, max_bytes)
+    except (IOError, OSError) as e:
+        logger.warn("Could not use file cache directory %s: %s", cache_dir, e)
+        return None
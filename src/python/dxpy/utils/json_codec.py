@@ -0,0 +1,217 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+"""
+JSON encoding and decoding for the busiest code paths of dxpy (API
+requests and responses, GTable rows, and job outputs).
+
+When this module is imported, it selects the fastest of the following
+backends that is installed and passes a round-trip self-test: `orjson
+<https://pypi.python.org/pypi/orjson>`_, `ujson
+<https://pypi.python.org/pypi/ujson>`_, or the standard library's
+:mod:`json`. The following environment variable overrides the choice:
+
+.. envvar:: DX_JSON_BACKEND
+
+   Name of the backend to use ("orjson", "ujson", or "json")
+
+Whatever the backend, values it cannot handle (such as integers that do
+not fit in 64 bits, or objects that must be converted by a *default*
+function the backend does not support) are encoded with :mod:`json`,
+and input that it rejects is decoded with :mod:`json`, so the results
+only differ from those of :mod:`json` in insignificant whitespace and
+escaping. (The exception is NaN and infinite floats, which are not
+valid JSON and which orjson encodes as null.)
+"""
+
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+import json
+
+from .. import logger
+from ..compat import environ, bytes
+
+BACKENDS = ("orjson", "ujson", "json")
+
+_FALLBACK_ERRORS = (TypeError, ValueError, OverflowError)
+
+# Values that every backend must round-trip exactly to be selected
+# (older releases of ujson, for example, round floats to 9 digits)
+_SELF_TEST_VALUE = {"data": [[0, "chr1", 1234567, 0.1 + 0.2, 1e-7, -2.5e300, 2**53 + 1, None, True, False,
+                              "\u00e9\u2028 \"\\/\n", [], {}]],
+                    "next": None}
+
+
+def _text(s):
+    return s.decode('utf-8') if isinstance(s, bytes) else s
+
+
+def _stdlib_dumps(obj, default=None, indent=None):
+    # json.dumps escapes all non-ASCII characters, so its output can be
+    # sent as is in a request body
+    return json.dumps(obj, default=default, indent=indent)
+
+
+def _stdlib_dumps_bytes(obj, default=None, indent=None):
+    return _stdlib_dumps(obj, default=default, indent=indent).encode('utf-8')
+
+
+def _stdlib_loads(s):
+    return json.loads(_text(s))
+
+
+def _get_orjson_backend():
+    import orjson
+
+    def dumps_bytes(obj, default=None, indent=None):
+        if indent is None:
+            return orjson.dumps(obj, default=default)
+        if indent == 2:
+            return orjson.dumps(obj, default=default, option=orjson.OPT_INDENT_2)
+        return _stdlib_dumps_bytes(obj, default=default, indent=indent)
+
+    def dumps(obj, default=None, indent=None):
+        data = dumps_bytes(obj, default=default, indent=indent)
+        # orjson does not escape non-ASCII characters
+        if not data.isascii():
+            return _stdlib_dumps(obj, default=default, indent=indent)
+        return data.decode('ascii')
+
+    return dumps, dumps_bytes, orjson.loads
+
+
+def _get_ujson_backend():
+    import ujson
+
+    def dumps(obj, default=None, indent=None):
+        if default is not None:
+            # Only supported by recent versions of ujson
+            return _stdlib_dumps(obj, default=default, indent=indent)
+        return ujson.dumps(obj, ensure_ascii=True, indent=indent or 0)
+
+    def dumps_bytes(obj, default=None, indent=None):
+        return dumps(obj, default=default, indent=indent).encode('utf-8')
+
+    def loads(s):
+        return ujson.loads(_text(s))
+
+    return dumps, dumps_bytes, loads
+
+
+def _get_backend(name):
+    if name == "orjson":
+        return _get_orjson_backend()
+    elif name == "ujson":
+        return _get_ujson_backend()
+    elif name == "json":
+        return _stdlib_dumps, _stdlib_dumps_bytes, _stdlib_loads
+    raise ValueError("Unknown JSON backend {name!r}; expected one of {backends}".format(
+        name=name, backends=", ".join(BACKENDS)))
+
+
+def _passes_self_test(backend):
+    dumps, dumps_bytes, loads = backend
+    try:
+        return (json.loads(dumps(_SELF_TEST_VALUE)) == _SELF_TEST_VALUE and
+                json.loads(dumps_bytes(_SELF_TEST_VALUE).decode('utf-8')) == _SELF_TEST_VALUE and
+                loads(json.dumps(_SELF_TEST_VALUE)) == _SELF_TEST_VALUE and
+                loads(json.dumps(_SELF_TEST_VALUE).encode('utf-8')) == _SELF_TEST_VALUE)
+    except Exception:
+        return False
+
+
+def use_backend(name):
+    '''
+    :param name: Name of the backend, one of :data:`BACKENDS`
+    :type name: string
+    :raises: :exc:`ImportError` if the backend is not installed, or :exc:`ValueError` if it is unknown or fails the self-test
+
+    Selects the backend used by the functions of this module.
+    '''
+    global BACKEND, _dumps, _dumps_bytes, _loads
+    backend = _get_backend(name)
+    if not _passes_self_test(backend):
+        raise ValueError("The installed version of {name} does not encode and decode JSON correctly".format(name=name))
+    BACKEND = name
+    _dumps, _dumps_bytes, _loads = backend
+
+
+def _select_backend():
+    requested = environ.get('DX_JSON_BACKEND')
+    if requested:
+        try:
+            use_backend(requested)
+            return
+        except (ImportError, ValueError) as e:
+            logger.warn("Could not use the JSON backend requested by DX_JSON_BACKEND: %s", e)
+    for name in BACKENDS:
+        try:
+            use_backend(name)
+            return
+        except (ImportError, ValueError):
+            pass
+
+
+def dumps(obj, default=None, indent=None):
+    '''
+    :param obj: Value to encode
+    :param default: Function called with each object that cannot otherwise be encoded, which should return an encodable value or raise :exc:`TypeError` (e.g. ``DXJSONEncoder().default``)
+    :type default: function
+    :param indent: Number of spaces by which to indent nested values (by default, the output is on a single line)
+    :type indent: int
+    :returns: JSON text, in which all non-ASCII characters are escaped
+    :rtype: string
+    '''
+    try:
+        return _dumps(obj, default=default, indent=indent)
+    except _FALLBACK_ERRORS:
+        return _stdlib_dumps(obj, default=default, indent=indent)
+
+
+def dumps_bytes(obj, default=None, indent=None):
+    '''
+    Like :func:`dumps`, but returns UTF-8 encoded JSON (in which
+    non-ASCII characters may not be escaped), ready to be sent in a
+    request body or written to a binary file.
+
+    :rtype: bytes
+    '''
+    try:
+        return _dumps_bytes(obj, default=default, indent=indent)
+    except _FALLBACK_ERRORS:
+        return _stdlib_dumps_bytes(obj, default=default, indent=indent)
+
+
+def loads(s, object_pairs_hook=None):
+    '''
+    :param s: JSON text
+    :type s: string, or UTF-8 encoded bytes
+    :param object_pairs_hook: If given, passed to :func:`json.loads` (for example, :class:`collections.OrderedDict` to preserve the order of keys); the standard library is then always used
+    :type object_pairs_hook: function
+    :raises: :exc:`ValueError` if *s* is not valid JSON
+    '''
+    if object_pairs_hook is not None:
+        return json.loads(_text(s), object_pairs_hook=object_pairs_hook)
+    try:
+        return _loads(s)
+    except ValueError:
+        # Reraises the error as json would, or decodes input that json
+        # accepts but the backend does not
+        return _stdlib_loads(s)
+
+
+BACKEND = None
+_select_backend()
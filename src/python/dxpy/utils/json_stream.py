@@ -0,0 +1,170 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+"""This module contains JSONObjectStream, the incremental parser used by
+:func:`dxpy.DXHTTPRequest` to decode large responses while they arrive
+(see its *stream_json_array* argument).
+
+"""
+
+from __future__ import (print_function, unicode_literals)
+
+import codecs
+import json
+import re
+
+from ..compat import basestring
+
+_WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+_NUMBER_START_CHARS = '-0123456789'
+_NUMBER_END_CHARS = ',]} \t\n\r'
+
+
+class JSONObjectStream(object):
+    """
+    :param chunks: The serialized JSON object, in UTF-8 encoded pieces
+    :type chunks: iterable of bytes
+    :param array_key: Name of the top-level field whose elements are to be yielded one at a time
+    :type array_key: string
+
+    Iterating over the stream yields the elements of the array in the
+    field *array_key* of a JSON object as soon as each of them has been
+    received, without holding the rest of the array in memory. The
+    other top-level fields are stored in :attr:`fields` as they are
+    parsed; all of them are available once iteration has finished.
+
+    Raises :exc:`ValueError` if the input is not a JSON object or is
+    truncated. A stream can only be iterated over once.
+
+    Example::
+
+        stream = JSONObjectStream(response.iter_content(65536), "results")
+        for result in stream:
+            print(result["id"])
+        next_page = stream.fields["next"]
+
+    """
+
+    def __init__(self, chunks, array_key):
+        self.array_key = array_key
+        self.fields = {}
+        self._chunks = iter(chunks)
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self._json_decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        self._items = self._parse()
+
+    def __iter__(self):
+        return self._items
+
+    def close(self):
+        """
+        Stops parsing and closes the underlying input, if it has a
+        ``close`` method.
+        """
+        self._items.close()
+        close = getattr(self._chunks, 'close', None)
+        if close is not None:
+            close()
+
+    def _fill(self):
+        # Appends the next chunk to the buffer, dropping the text that
+        # has already been parsed. Returns False at the end of the input.
+        if self._eof:
+            return False
+        self._buf = self._buf[self._pos:]
+        self._pos = 0
+        try:
+            chunk = next(self._chunks)
+        except StopIteration:
+            self._eof = True
+            self._buf += self._text_decoder.decode(b'', final=True)
+            return False
+        self._buf += self._text_decoder.decode(chunk)
+        return True
+
+    def _skip_whitespace(self):
+        while True:
+            self._pos = _WHITESPACE_RE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return
+
+    def _next_char(self):
+        self._skip_whitespace()
+        if self._pos >= len(self._buf):
+            raise ValueError("Truncated JSON object")
+        return self._buf[self._pos]
+
+    def _expect(self, chars):
+        char = self._next_char()
+        if char not in chars:
+            raise ValueError("Expected one of {chars!r} but found {char!r}".format(chars=chars, char=char))
+        self._pos += 1
+        return char
+
+    def _decode_value(self):
+        self._skip_whitespace()
+        # Each failed attempt to decode waits for the available input to
+        # double, so that decoding a value that spans many chunks takes
+        # linear rather than quadratic time.
+        min_available = 0
+        while True:
+            available = len(self._buf) - self._pos
+            if self._eof or available >= min_available:
+                try:
+                    value, end = self._json_decoder.raw_decode(self._buf, self._pos)
+                except ValueError:
+                    if self._eof:
+                        raise
+                else:
+                    # A number is only complete once it is followed by a
+                    # delimiter: "1." or "1e" at the end of the buffer
+                    # decodes as 1, but may continue in the next chunk
+                    if (self._eof or self._buf[self._pos] not in _NUMBER_START_CHARS or
+                            (end < len(self._buf) and self._buf[end] in _NUMBER_END_CHARS)):
+                        self._pos = end
+                        return value
+                min_available = 2 * available
+            self._fill()
+
+    def _parse(self):
+        self._expect('{')
+        if self._next_char() == '}':
+            self._pos += 1
+        else:
+            while True:
+                key = self._decode_value()
+                if not isinstance(key, basestring):
+                    raise ValueError("Expected a string as the name of a field, found {key!r}".format(key=key))
+                self._expect(':')
+                if key == self.array_key and self._next_char() == '[':
+                    self._pos += 1
+                    if self._next_char() == ']':
+                        self._pos += 1
+                    else:
+                        while True:
+                            yield self._decode_value()
+                            if self._expect(',]') == ']':
+                                break
+                else:
+                    self.fields[key] = self._decode_value()
+                if self._expect(',}') == '}':
+                    break
+        self._skip_whitespace()
+        if self._pos < len(self._buf):
+            raise ValueError("Extra data after the end of the JSON object")
@@ -0,0 +1,167 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+"""
+Aggregation of the per-request records reported by
+:func:`dxpy.DXHTTPRequest` to hooks registered with
+:func:`dxpy.add_request_hook`.
+
+Setting the environment variable :envvar:`DX_REQUEST_METRICS` to "1"
+enables a :class:`RequestMetricsAggregator` when dxpy is imported and
+prints its summary to stderr when the process exits.
+
+.. envvar:: DX_REQUEST_METRICS
+
+   If set to "1", per-route request latency percentiles are printed to
+   stderr at exit
+"""
+
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+import atexit, math, random, re, sys, threading
+
+import dxpy
+
+_OBJECT_ID_RE = re.compile(r'\b([a-z]+)-[0-9A-Za-z]{24}\b')
+
+
+def normalize_route(route):
+    '''
+    Replaces object IDs in *route* with placeholders, so that for
+    example all "/file-xxxx/describe" requests are aggregated together.
+    '''
+    return _OBJECT_ID_RE.sub(r'\1-xxxx', route or "")
+
+
+def _percentile(sorted_values, fraction):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    index = max(0, int(math.ceil(fraction * len(sorted_values))) - 1)
+    return sorted_values[index]
+
+
+class _RouteStats(object):
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.seconds = 0.0
+        self.wait_503_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.latencies = []
+
+
+class RequestMetricsAggregator(object):
+    '''
+    :param max_samples: Maximum number of latencies to keep per route for computing percentiles
+    :type max_samples: int
+
+    Request hook (see :func:`dxpy.add_request_hook`) that accumulates
+    totals and latency percentiles per method and route. Once a route
+    has more than *max_samples* requests, percentiles are computed from
+    a uniform random sample of them.
+    '''
+
+    def __init__(self, max_samples=10000):
+        self.max_samples = max_samples
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        key = (record["method"], normalize_route(record["route"]))
+        with self._lock:
+            stats = self._routes.get(key)
+            if stats is None:
+                stats = self._routes[key] = _RouteStats()
+            stats.count += 1
+            if record["error"] is not None:
+                stats.errors += 1
+            stats.retries += record["retries"]
+            stats.bytes_sent += record["bytes_sent"] or 0
+            stats.bytes_received += record["bytes_received"] or 0
+            stats.seconds += record["seconds"]
+            stats.wait_503_seconds += record["wait_503_seconds"]
+            stats.encode_seconds += record["encode_seconds"]
+            stats.decode_seconds += record["decode_seconds"]
+            # Reservoir sampling keeps memory bounded for long-running
+            # processes
+            if len(stats.latencies) < self.max_samples:
+                stats.latencies.append(record["seconds"])
+            else:
+                index = random.randint(0, stats.count - 1)
+                if index < self.max_samples:
+                    stats.latencies[index] = record["seconds"]
+
+    def summary(self):
+        '''
+        :returns: Mapping from (method, route) to a dict of the totals for that route and its "p50", "p95", and "p99" latencies in seconds
+        :rtype: dict
+        '''
+        with self._lock:
+            result = {}
+            for key, stats in self._routes.items():
+                latencies = sorted(stats.latencies)
+                result[key] = {"count": stats.count,
+                               "errors": stats.errors,
+                               "retries": stats.retries,
+                               "bytes_sent": stats.bytes_sent,
+                               "bytes_received": stats.bytes_received,
+                               "seconds": stats.seconds,
+                               "wait_503_seconds": stats.wait_503_seconds,
+                               "encode_seconds": stats.encode_seconds,
+                               "decode_seconds": stats.decode_seconds,
+                               "p50": _percentile(latencies, 0.50),
+                               "p95": _percentile(latencies, 0.95),
+                               "p99": _percentile(latencies, 0.99)}
+            return result
+
+    def format_summary(self):
+        '''
+        :returns: The summary as a table, one line per route, slowest total time first
+        :rtype: string
+        '''
+        lines = ["{:<6} {:<40} {:>7} {:>6} {:>7} {:>8} {:>8} {:>8} {:>9} {:>9} {:>8} {:>8}".format(
+            "METHOD", "ROUTE", "COUNT", "ERRORS", "RETRIES", "P50(s)", "P95(s)", "P99(s)", "SENT", "RECEIVED",
+            "503(s)", "JSON(s)")]
+        summary = self.summary()
+        for (method, route), stats in sorted(summary.items(), key=lambda item: -item[1]["seconds"]):
+            lines.append("{:<6} {:<40} {:>7} {:>6} {:>7} {:>8.3f} {:>8.3f} {:>8.3f} {:>9} {:>9} {:>8.1f} {:>8.3f}".format(
+                method, route, stats["count"], stats["errors"], stats["retries"], stats["p50"], stats["p95"],
+                stats["p99"], stats["bytes_sent"], stats["bytes_received"], stats["wait_503_seconds"],
+                stats["encode_seconds"] + stats["decode_seconds"]))
+        return "\n".join(lines)
+
+
+def enable_request_metrics(dump_at_exit=True, file=None):
+    '''
+    :param dump_at_exit: If True, the summary is printed when the process exits
+    :type dump_at_exit: boolean
+    :param file: Stream to print the summary to (default: stderr)
+    :returns: The aggregator, which has been registered as a request hook
+    :rtype: :class:`RequestMetricsAggregator`
+    '''
+    aggregator = RequestMetricsAggregator()
+    dxpy.add_request_hook(aggregator)
+    if dump_at_exit:
+        def dump():
+            if aggregator.summary():
+                print(aggregator.format_summary(), file=file or sys.stderr)
+        atexit.register(dump)
+    return aggregator
@@ -0,0 +1,127 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+"""This module contains RetryCoordinator, which decides how long
+:func:`dxpy.DXHTTPRequest` waits between attempts and whether a failed
+request may be retried at all, coordinating all the threads of a
+process so that they do not retry in lockstep against an overloaded
+server.
+
+"""
+
+from __future__ import (print_function, unicode_literals, division)
+
+import collections
+import random
+import threading
+import time
+
+
+class RetryCoordinator(object):
+    """Shared retry policy for the requests made through one or more
+    sessions.
+
+    * Delays between retries use decorrelated jitter: each delay is
+      drawn uniformly between *base_delay* and three times the previous
+      delay, capped at *max_delay*.
+    * Retries draw from a token bucket holding at most *retry_budget*
+      tokens and refilled at *budget_refill_per_second*. When the bucket
+      is empty, failed requests are not retried, so a widespread outage
+      does not multiply the load on the server.
+    * When at least *breaker_threshold* 503 (Service Unavailable)
+      responses are received from one host within
+      *breaker_window_seconds*, the circuit for that host opens: every
+      request to it, new ones included, waits until the Retry-After
+      interval of the latest 503 has passed.
+
+    Waits after a 503 are lengthened by a random fraction (up to
+    *jitter_fraction*) of the interval, so that threads resume at
+    different times. All methods are thread safe.
+
+    """
+
+    def __init__(self, base_delay=1.0, max_delay=600, retry_budget=100, budget_refill_per_second=2.0,
+                 breaker_threshold=5, breaker_window_seconds=10.0, jitter_fraction=0.1):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_budget = retry_budget
+        self.budget_refill_per_second = budget_refill_per_second
+        self.breaker_threshold = breaker_threshold
+        self.breaker_window_seconds = breaker_window_seconds
+        self.jitter_fraction = jitter_fraction
+        self._lock = threading.Lock()
+        self._tokens = float(retry_budget)
+        self._tokens_updated = time.time()
+        self._recent_503s = collections.defaultdict(collections.deque)
+        self._circuit_open_until = {}
+
+    def get_retry_delay(self, previous_delay=None):
+        """
+        :param previous_delay: The delay before the previous retry of the same request, or None before the first retry
+        :returns: Number of seconds to wait before the next retry
+        """
+        upper = max(self.base_delay, (previous_delay or self.base_delay) * 3)
+        return min(self.max_delay, random.uniform(self.base_delay, upper))
+
+    def acquire_retry(self):
+        """
+        :returns: True if a retry may be performed (consuming one token of the retry budget), False if the budget is exhausted
+        """
+        with self._lock:
+            now = time.time()
+            self._tokens = min(float(self.retry_budget),
+                               self._tokens + (now - self._tokens_updated) * self.budget_refill_per_second)
+            self._tokens_updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def get_unavailable_wait(self, host, retry_after):
+        """
+        :param host: Scheme and host that returned a 503 response
+        :param retry_after: Number of seconds the server asked clients to wait
+        :returns: Number of seconds to wait before retrying the request
+
+        Records a 503 response from *host*, opening its circuit if 503s
+        are spiking.
+        """
+        wait = retry_after * (1 + random.uniform(0, self.jitter_fraction))
+        with self._lock:
+            now = time.time()
+            recent = self._recent_503s[host]
+            recent.append(now)
+            while recent and recent[0] < now - self.breaker_window_seconds:
+                recent.popleft()
+            if len(recent) >= self.breaker_threshold:
+                self._circuit_open_until[host] = max(self._circuit_open_until.get(host, 0), now + retry_after)
+        return wait
+
+    def get_circuit_wait(self, host):
+        """
+        :returns: Number of seconds a request to *host* should wait before being sent (0 if the circuit is closed)
+        """
+        with self._lock:
+            open_until = self._circuit_open_until.get(host)
+            if open_until is None:
+                return 0
+            remaining = open_until - time.time()
+            if remaining <= 0:
+                del self._circuit_open_until[host]
+                self._recent_503s.pop(host, None)
+                return 0
+        # Spread out the requests that were held back
+        return remaining * (1 + random.uniform(0, self.jitter_fraction))
@@ -94,6 +94,15 @@ class PrioritizingThreadPool(object):
         #     task.
         self._queues = {}
 
+    def shutdown(self, wait=True):
+        """Stops the worker threads, waiting for them to exit if *wait* is
+        True (see concurrent.futures.Executor.shutdown). Only call this
+        once all submitted tasks have completed; no more tasks may be
+        submitted afterwards.
+
+        """
+        self._pool.shutdown(wait=wait)
+
     def _submit_one(self, callable_, *args, **kwargs):
         """Starts the next task (which, when complete, will, in turn, start one
         more task when finished, which will, in turn, etc.). Returns a
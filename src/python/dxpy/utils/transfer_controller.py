@@ -0,0 +1,249 @@
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+"""This module contains AIMDTransferController, which chooses the chunk
+size and the number of concurrent requests for a bulk transfer (such as
+a DXFile read or write) based on the throughput and latency observed for
+the requests that have already completed.
+
+"""
+
+from __future__ import (print_function, unicode_literals)
+
+import collections
+import copy
+import threading
+import time
+
+
+class TransferStats(object):
+    """Snapshot of the measurements and current decisions of an
+    AIMDTransferController.
+
+    .. py:attribute:: chunk_size
+
+       Number of bytes the controller currently asks to be moved per
+       request.
+
+    .. py:attribute:: concurrency
+
+       Number of requests the controller currently allows to be in
+       flight at once.
+
+    .. py:attribute:: num_requests
+
+       Number of requests that completed successfully.
+
+    .. py:attribute:: num_failures
+
+       Number of requests that failed.
+
+    .. py:attribute:: bytes_transferred
+
+       Total number of bytes moved by successful requests.
+
+    .. py:attribute:: throughput
+
+       Estimated aggregate throughput, in bytes per second, over the
+       most recent evaluation window (None until the first window
+       completes).
+
+    .. py:attribute:: latency
+
+       Exponentially weighted moving average of the duration of a
+       single request, in seconds (None until a request completes).
+
+    .. py:attribute:: decisions
+
+       The most recent adjustments, as a list of (timestamp, chunk_size,
+       concurrency, reason) tuples, oldest first.
+
+    """
+
+    def __init__(self, chunk_size, concurrency):
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.num_requests = 0
+        self.num_failures = 0
+        self.bytes_transferred = 0
+        self.throughput = None
+        self.latency = None
+        self.decisions = collections.deque(maxlen=100)
+
+    def __repr__(self):
+        return ("<TransferStats chunk_size={chunk_size} concurrency={concurrency} requests={num_requests} "
+                "failures={num_failures} bytes={bytes_transferred} throughput={throughput} "
+                "latency={latency}>").format(**self.__dict__)
+
+
+class AIMDTransferController(object):
+    """Adjusts chunk size and concurrency of a transfer as its requests
+    complete.
+
+    Completed requests are grouped into windows of *concurrency*
+    requests. The aggregate throughput of a window is estimated as the
+    concurrency times the bytes moved per second of request time. (Wall
+    clock time is deliberately not used, so that a consumer that pauses
+    between reads is not mistaken for a congested link.) At the end of
+    each window:
+
+    * Concurrency is increased by one (additive increase) as long as
+      the window's throughput has not dropped noticeably below the best
+      throughput seen so far; otherwise it is halved (multiplicative
+      decrease). Any failed request also halves it.
+    * The chunk size is doubled if requests are finishing faster than
+      *target_request_seconds[0]* (so per-request overhead dominates),
+      and halved if they take longer than *target_request_seconds[1]*
+      (so a slow link is not tied up by a few huge requests).
+
+    Chunk sizes are always *min_chunk_size* times a power of two, and
+    chunk size times concurrency never exceeds *max_inflight_bytes*.
+
+    All methods are thread safe; requests may be recorded from worker
+    threads.
+
+    """
+
+    def __init__(self, initial_chunk_size, min_chunk_size, max_chunk_size, initial_concurrency, max_concurrency,
+                 max_inflight_bytes=None, target_request_seconds=(1.0, 10.0), throughput_tolerance=0.1,
+                 latency_smoothing=0.2):
+        if min_chunk_size <= 0 or max_chunk_size < min_chunk_size:
+            raise ValueError("Expected 0 < min_chunk_size <= max_chunk_size")
+        if max_concurrency < 1:
+            raise ValueError("Expected max_concurrency >= 1")
+        self._min_chunk_size = min_chunk_size
+        self._max_chunk_size = max_chunk_size
+        self._max_concurrency = max_concurrency
+        self._max_inflight_bytes = max_inflight_bytes
+        self._target_request_seconds = target_request_seconds
+        self._throughput_tolerance = throughput_tolerance
+        self._latency_smoothing = latency_smoothing
+        self._lock = threading.Lock()
+
+        chunk_size = min_chunk_size
+        while chunk_size * 2 <= min(initial_chunk_size, max_chunk_size):
+            chunk_size *= 2
+        self._stats = TransferStats(chunk_size, max(1, min(initial_concurrency, max_concurrency)))
+        self._enforce_inflight_limit()
+        self._best_throughput = None
+        self._reset_window()
+
+    @property
+    def chunk_size(self):
+        return self._stats.chunk_size
+
+    @property
+    def concurrency(self):
+        return self._stats.concurrency
+
+    def get_stats(self):
+        """
+        :rtype: :class:`TransferStats`
+
+        Returns a snapshot of the controller's measurements and decisions.
+        """
+        with self._lock:
+            return copy.deepcopy(self._stats)
+
+    def measure(self, callable_, num_bytes=None):
+        """
+        Returns a callable that invokes *callable_* with the same
+        arguments, records its outcome and duration, and returns its
+        result. The number of bytes moved is *num_bytes* or, if that is
+        None, the length of the result.
+        """
+        def fn(*args, **kwargs):
+            start_time = time.time()
+            try:
+                result = callable_(*args, **kwargs)
+            except BaseException:
+                self.record_failure()
+                raise
+            self.record_success(len(result) if num_bytes is None else num_bytes, time.time() - start_time)
+            return result
+        return fn
+
+    def record_success(self, num_bytes, seconds):
+        with self._lock:
+            stats = self._stats
+            stats.num_requests += 1
+            stats.bytes_transferred += num_bytes
+            if stats.latency is None:
+                stats.latency = seconds
+            else:
+                stats.latency += self._latency_smoothing * (seconds - stats.latency)
+
+            self._window_requests += 1
+            self._window_bytes += num_bytes
+            self._window_request_seconds += seconds
+            if self._window_requests >= stats.concurrency:
+                self._end_window()
+
+    def record_failure(self):
+        with self._lock:
+            self._stats.num_failures += 1
+            self._decrease_concurrency("request failed")
+            self._best_throughput = None
+            self._reset_window()
+
+    def _reset_window(self):
+        self._window_requests = 0
+        self._window_bytes = 0
+        self._window_request_seconds = 0.0
+
+    def _record_decision(self, reason):
+        stats = self._stats
+        stats.decisions.append((time.time(), stats.chunk_size, stats.concurrency, reason))
+
+    def _decrease_concurrency(self, reason):
+        stats = self._stats
+        if stats.concurrency > 1:
+            stats.concurrency = max(1, stats.concurrency // 2)
+            self._record_decision(reason)
+
+    def _enforce_inflight_limit(self):
+        stats = self._stats
+        if self._max_inflight_bytes is not None:
+            while stats.concurrency > 1 and stats.chunk_size * stats.concurrency > self._max_inflight_bytes:
+                stats.concurrency -= 1
+            while stats.chunk_size > self._min_chunk_size and stats.chunk_size > self._max_inflight_bytes:
+                stats.chunk_size //= 2
+
+    def _end_window(self):
+        stats = self._stats
+        request_seconds = max(self._window_request_seconds, 1e-6)
+        stats.throughput = stats.concurrency * self._window_bytes / request_seconds
+        mean_request_seconds = self._window_request_seconds / self._window_requests
+
+        if self._best_throughput is None or stats.throughput >= self._best_throughput * (1 - self._throughput_tolerance):
+            self._best_throughput = max(self._best_throughput or 0, stats.throughput)
+            if stats.concurrency < self._max_concurrency:
+                stats.concurrency += 1
+                self._record_decision("throughput holding at {:.0f} B/s".format(stats.throughput))
+        else:
+            self._decrease_concurrency("throughput dropped to {:.0f} B/s".format(stats.throughput))
+            # Start looking for a new optimum from here
+            self._best_throughput = stats.throughput
+
+        if mean_request_seconds < self._target_request_seconds[0] and stats.chunk_size * 2 <= self._max_chunk_size:
+            stats.chunk_size *= 2
+            self._record_decision("requests taking {:.2f}s".format(mean_request_seconds))
+        elif mean_request_seconds > self._target_request_seconds[1] and stats.chunk_size > self._min_chunk_size:
+            stats.chunk_size //= 2
+            self._record_decision("requests taking {:.2f}s".format(mean_request_seconds))
+
+        self._enforce_inflight_limit()
+        self._reset_window()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2013-2015 DNAnexus, Inc.
+#
+# This file is part of dx-toolkit (DNAnexus platform client libraries).
+#
+#   Licensed under the Apache License, Version 2.0 (the "License"); you may not
+#   use this file except in compliance with the License. You may obtain a copy
+#   of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#   WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#   License for the specific language governing permissions and limitations
+#   under the License.
+
+'''
+Compares the speed of the JSON backend selected by dxpy.utils.json_codec
+with that of the standard library on GTable row payloads: encoding rows
+as DXGTable.add_rows does, and decoding a /gtable-xxxx/get response.
+
+Rows are read from the GTable given on the command line, or otherwise
+generated to resemble those of a Mappings table.
+
+Usage: benchmark_json_codec.py [--rows N] [--repeat N] [gtable-xxxx]
+'''
+
+from __future__ import print_function, unicode_literals, division, absolute_import
+
+import argparse, json, random, timeit
+
+import dxpy
+from dxpy.utils import json_codec
+
+MAPPINGS_COLUMNS = ["chr", "lo", "hi", "negative_strand", "error_probability", "qc_fail", "duplicate", "cigar",
+                    "template_id", "read_group", "sequence", "name", "quality", "status_flags", "mate_id"]
+
+
+def generate_rows(num_rows):
+    rand = random.Random(0)
+    rows = []
+    for row_id in range(num_rows):
+        lo = rand.randint(0, 250000000)
+        sequence = "".join(rand.choice("ACGT") for i in range(100))
+        quality = "".join(chr(rand.randint(35, 74)) for i in range(100))
+        rows.append([row_id, "chr" + str(rand.randint(1, 22)), lo, lo + 100, rand.random() < 0.5,
+                     rand.randint(0, 60), False, rand.random() < 0.01, "100M", row_id // 2, 0, sequence,
+                     "read-{0}:{1}".format(row_id, rand.randint(0, 99999)), quality, rand.random(), -1])
+    return rows
+
+
+def get_rows(gtable_id, num_rows):
+    return dxpy.DXGTable(gtable_id).get_rows(starting=0, limit=num_rows)["data"]
+
+
+def best_time(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("gtable", nargs="?", help="ID of a GTable whose rows to use")
+    parser.add_argument("--rows", type=int, default=10000, help="Number of rows per payload")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timings of which to keep the best")
+    args = parser.parse_args()
+
+    rows = get_rows(args.gtable, args.rows) if args.gtable else generate_rows(args.rows)
+    response_body = json.dumps({"length": len(rows), "next": len(rows), "data": rows}).encode('utf-8')
+    assert json_codec.loads(response_body)["data"] == json.loads(response_body.decode('utf-8'))["data"]
+    assert json.loads(json_codec.dumps(rows)) == json.loads(json.dumps(rows))
+
+    print("Backend: {backend}; {n} rows, {size:.1f} MB per response".format(
+        backend=json_codec.BACKEND, n=len(rows), size=len(response_body) / 1024.0 / 1024))
+    print("{:<24} {:>10} {:>10} {:>8}".format("", "json (s)", "codec (s)", "speedup"))
+    benchmarks = [("encode rows (add_rows)",
+                   lambda: json.dumps(rows),
+                   lambda: json_codec.dumps(rows)),
+                  ("encode request body",
+                   lambda: json.dumps(rows).encode('utf-8'),
+                   lambda: json_codec.dumps_bytes(rows)),
+                  ("decode response (get)",
+                   lambda: json.loads(response_body.decode('utf-8')),
+                   lambda: json_codec.loads(response_body))]
+    for name, stdlib_fn, codec_fn in benchmarks:
+        stdlib_time, codec_time = best_time(stdlib_fn, args.repeat), best_time(codec_fn, args.repeat)
+        print("{:<24} {:>10.4f} {:>10.4f} {:>7.1f}x".format(name, stdlib_time, codec_time, stdlib_time / codec_time))
+
+
+if __name__ == '__main__':
+    main()
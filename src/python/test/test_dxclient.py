@@ -19,7 +19,7 @@
 
 from __future__ import print_function, unicode_literals, division, absolute_import
 
-import os, sys, unittest, json, tempfile, subprocess, csv, shutil, re, base64, random, time
+import os, sys, unittest, json, tempfile, subprocess, csv, shutil, re, base64, random, time, threading
 import pipes
 from contextlib import contextmanager
 import pexpect
@@ -954,6 +954,153 @@ class TestDXWhoami(DXTestCase):
         self.assertEqual(whoami_output, dxpy.whoami())
 
 
+class TestDXClientStartup(unittest.TestCase):
+    # Modules that are only needed by some subcommands, and should not be
+    # loaded by every invocation of dx
+    DEFERRED_MODULES = ['dxpy.cli.cp', 'dxpy.cli.daemon', 'dxpy.cli.download', 'dxpy.cli.exec_io', 'dxpy.cli.org',
+                        'dxpy.cli.upload', 'dxpy.cli.workflow', 'dxpy.scripts.dx_build_app', 'dxpy.utils.completer',
+                        'dxpy.utils.completion_cache', 'dxpy.utils.describe', 'dxpy.utils.local_exec_utils',
+                        'dxpy.utils.pretty_print', 'dxpy.utils.resolver', 'psutil']
+
+    def import_dx(self, code, python_args=()):
+        # Imports the dx module, as "dx pwd" would, in a new interpreter
+        # and with an empty configuration directory
+        user_conf_dir = tempfile.mkdtemp()
+        try:
+            python_path = [os.path.dirname(os.path.dirname(os.path.abspath(dxpy.__file__)))]
+            if 'PYTHONPATH' in os.environ:
+                python_path.append(os.environ['PYTHONPATH'])
+            env = override_environment(DX_USER_CONF_DIR=user_conf_dir, _ARGCOMPLETE=None,
+                                       PYTHONPATH=os.pathsep.join(python_path))
+            process = subprocess.Popen([sys.executable] + list(python_args) +
+                                       ['-c', "import sys; sys.argv = ['dx', 'pwd']; import dxpy.scripts.dx; " + code],
+                                       env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+            self.assertEqual(process.returncode, 0, stderr)
+            return stdout.decode('utf-8'), stderr.decode('utf-8')
+        finally:
+            shutil.rmtree(user_conf_dir)
+
+    def test_deferred_imports(self):
+        stdout, _ = self.import_dx("print('\\n'.join(sorted(sys.modules)))")
+        loaded_modules = set(stdout.split())
+        self.assertIn('dxpy.scripts.dx', loaded_modules)
+        for module in self.DEFERRED_MODULES:
+            self.assertNotIn(module, loaded_modules)
+
+    @unittest.skipUnless(testutil.TEST_BENCHMARKS and sys.version_info >= (3, 7),
+                         'skipping benchmark that requires python -X importtime')
+    def test_import_time(self):
+        # Budget for the time taken to import dxpy and the dx module, in
+        # milliseconds
+        budget = float(os.environ.get('DXTEST_STARTUP_BUDGET_MS', 1000))
+        _, stderr = self.import_dx("", python_args=['-X', 'importtime'])
+        # Lines look like "import time: <self us> | <cumulative us> | <name>",
+        # with the name indented by its depth in the import tree
+        import_time = 0
+        for line in stderr.splitlines():
+            if not line.startswith('import time:') or line.endswith('| imported package'):
+                continue
+            self_time, cumulative_time, name = line[len('import time:'):].split('|')
+            if name.startswith(' dxpy'):
+                import_time += int(cumulative_time)
+        self.assertGreater(import_time, 0)
+        self.assertLess(import_time / 1000.0, budget,
+                        'importing dx took {:.0f}ms, more than the budget of {:.0f}ms'.format(import_time / 1000.0,
+                                                                                              budget))
+
+
+class TestDXDaemon(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.temp_dir, 'daemon', 'dx.sock')
+        self.env = override_environment(DX_DAEMON_SOCKET=self.socket_path)
+
+    def tearDown(self):
+        with open(os.devnull, 'w') as devnull:
+            subprocess.call(['dx-daemon', 'stop'], env=self.env, stdout=devnull, stderr=devnull)
+        shutil.rmtree(self.temp_dir)
+
+    def run_dx(self, args):
+        process = subprocess.Popen(['dx'] + args, env=self.env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE)
+        stdout, stderr = process.communicate()
+        return process.returncode, stdout.decode('utf-8'), stderr.decode('utf-8')
+
+    def get_num_connections(self):
+        status = check_output(['dx-daemon', 'status'], env=self.env)
+        return int(re.search('accepted ([0-9]+) connections', status).group(1))
+
+    def test_dx_daemon(self):
+        self.assertEqual(subprocess.call(['dx-daemon', 'status'], env=self.env), 3)
+        commands = [['env'], ['--version'], ['nonexistent-command']]
+        in_process_results = [self.run_dx(command) for command in commands]
+        self.assertEqual(in_process_results[2][0], 2)
+
+        run('dx-daemon start', env=self.env)
+        with self.assertRaises(subprocess.CalledProcessError):
+            check_output(['dx-daemon', 'start'], env=self.env)
+        for command, in_process_result in zip(commands, in_process_results):
+            num_connections = self.get_num_connections()
+            self.assertEqual(self.run_dx(command), in_process_result)
+            # One connection for the command, and one for the status
+            self.assertEqual(self.get_num_connections(), num_connections + 2)
+
+        run('dx-daemon stop', env=self.env)
+        self.assertEqual(subprocess.call(['dx-daemon', 'status'], env=self.env), 3)
+        self.assertFalse(os.path.exists(self.socket_path))
+        self.assertEqual(self.run_dx(commands[0]), in_process_results[0])
+
+    def test_dx_daemon_reuses_connections(self):
+        try:
+            from http.server import HTTPServer, BaseHTTPRequestHandler
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+            from SocketServer import ThreadingMixIn
+        connections = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                connections.append(self.client_address)
+                BaseHTTPRequestHandler.setup(self)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers['Content-Length']))
+                body = b'{"id": "user-alice"}'
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        class Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        server = Server(('127.0.0.1', 0), Handler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        try:
+            self.env.update(DX_APISERVER_PROTOCOL='http', DX_APISERVER_HOST='127.0.0.1',
+                            DX_APISERVER_PORT=str(server.server_address[1]),
+                            DX_SECURITY_CONTEXT=json.dumps({'auth_token_type': 'Bearer', 'auth_token': 'x'}))
+            run('dx-daemon start', env=self.env)
+            for _i in range(3):
+                returncode, stdout, _ = self.run_dx(['api', 'system', 'whoami'])
+                self.assertEqual(returncode, 0)
+                self.assertEqual(json.loads(stdout), {'id': 'user-alice'})
+            # The commands share the connection kept open by the daemon
+            self.assertEqual(len(connections), 1)
+        finally:
+            server.shutdown()
+
+
 class TestDXClientUploadDownload(DXTestCase):
     def test_dx_upload_download(self):
         with self.assertSubprocessFailure(stderr_regexp='expected the path to be a non-empty string',
@@ -1121,6 +1268,24 @@ class TestDXClientUploadDownload(DXTestCase):
                 listing = run("dx ls /destdir/a").split("\n")
                 self.assertIn(os.path.basename(fd2.name), listing)
 
+    def test_dx_upload_recursive_parallel(self):
+        testdir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(testdir, "a", "b"))
+        os.makedirs(os.path.join(testdir, "a", "empty"))
+        for i in range(20):
+            with open(os.path.join(testdir, "a" if i % 2 else os.path.join("a", "b"), "f" + str(i)), "w") as fd:
+                fd.write("x" * i)
+        file_ids = run("dx upload -r --parallel 4 --wait --brief " + os.path.join(testdir, "a")).split()
+        self.assertEqual(len(file_ids), 20)
+        listing = run("dx ls a").split("\n")
+        self.assertIn("b/", listing)
+        self.assertIn("empty/", listing)
+        self.assertIn("f1", listing)
+        self.assertEqual(len(run("dx ls a/b").split()), 10)
+        with chdir(tempfile.mkdtemp()):
+            run("dx download -r a")
+            run("diff -r {orig} a".format(orig=os.path.join(testdir, "a")))
+
     @unittest.skipUnless(testutil.TEST_RUN_JOBS, "Skipping test that would run jobs")
     def test_dx_download_by_job_id_and_output_field(self):
         test_project_name = 'PTFM-13437'
@@ -1220,9 +1385,35 @@ dxpy.run()
             test_download_cmd(orig_dir, "dx download -r /")
             test_download_cmd(orig_dir, "dx download -r {}:/*".format(proj_id))
             test_download_cmd(orig_dir, "dx download -r *")
+            test_download_cmd(orig_dir, "dx download -r --parallel 4 /")
 
             shutil.rmtree(orig_dir)
 
+    def test_dx_download_parallel(self):
+        with temporary_project('test_proj', select=True) as temp_project:
+            for i in range(10):
+                dxpy.upload_string("x" * i, name="file" + str(i), project=temp_project.get_id(),
+                                   folder="/A", parents=True, wait_on_close=True)
+            testdir = tempfile.mkdtemp()
+            try:
+                with chdir(testdir):
+                    run("dx download -r --parallel 3 --no-progress A")
+                    self.assertEqual(sorted(os.listdir("A")), ["file" + str(i) for i in range(10)])
+                    for i in range(10):
+                        with open(os.path.join("A", "file" + str(i))) as fd:
+                            self.assertEqual(fd.read(), "x" * i)
+
+                    # A file that cannot be written does not stop the others
+                    shutil.rmtree("A")
+                    os.makedirs(os.path.join("A", "file3"))
+                    with self.assertSubprocessFailure(stderr_regexp="1 of 10 files could not be downloaded", exit_code=1):
+                        run("dx download -r -f --parallel 3 --no-progress A")
+                    self.assertEqual(len(os.listdir("A")), 10)
+                    with open(os.path.join("A", "file9")) as fd:
+                        self.assertEqual(fd.read(), "x" * 9)
+            finally:
+                shutil.rmtree(testdir)
+
     # Test download to stdout
     def test_download_to_stdout(self):
         data = "ABCD"
@@ -19,15 +19,20 @@
 
 from __future__ import print_function, unicode_literals, division, absolute_import
 
-import os, unittest, tempfile, filecmp, time, json, sys
+import os, unittest, tempfile, filecmp, time, json, sys, hashlib, io, shutil
 import requests
 import string
 import subprocess
 
 import dxpy
 import dxpy_testutil as testutil
+try:
+    import numpy
+except ImportError:
+    numpy = None
 from dxpy.exceptions import DXAPIError, DXFileError, DXError, DXJobFailureError, ServiceUnavailable, InvalidInput
 from dxpy.utils import pretty_print, warn
+from dxpy.compat import USING_PYTHON2
 from dxpy.utils.resolver import resolve_path, resolve_existing_path, ResolutionError
 
 def get_objects_from_listf(listf):
@@ -210,6 +215,84 @@ class TestDXFileFunctions(unittest.TestCase):
             dxpy.bindings.dxfile_functions._get_buffer_size_for_file(160 * 1024 * 1024 * 1024, file_is_mmapd=file_is_mmapd)
             dxpy.bindings.dxfile_functions._get_buffer_size_for_file(290 * 1024 * 1024 * 1024, file_is_mmapd=file_is_mmapd)
 
+    def test_write_at_offset(self):
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.truncate(10)
+            dxpy.bindings.dxfile_functions._write_at_offset(fh.fileno(), b"6789", 6)
+            dxpy.bindings.dxfile_functions._write_at_offset(fh.fileno(), b"012345", 0)
+            fh.seek(0)
+            self.assertEqual(fh.read(), b"0123456789")
+
+    def test_get_missing_chunk_ranges(self):
+        get_ranges = dxpy.bindings.dxfile_functions._get_missing_chunk_ranges
+        self.assertEqual(list(get_ranges(0, 4)), [])
+        self.assertEqual(list(get_ranges(10, 4)), [(0, 4), (4, 4), (8, 2)])
+        self.assertEqual(list(get_ranges(10, 4, [(0, 4), (8, 2)])), [(4, 4)])
+        self.assertEqual(list(get_ranges(10, 3, [(4, 4)])), [(0, 3), (3, 1), (8, 2)])
+        self.assertEqual(list(get_ranges(10, 4, [(0, 4), (4, 4), (8, 2)])), [])
+
+    def test_read_download_journal(self):
+        read_journal = dxpy.bindings.dxfile_functions._read_download_journal
+        file_id = "file-" + "0" * 24
+        journal = tempfile.NamedTemporaryFile(mode='w', delete=False)
+        try:
+            journal.write(json.dumps({"id": file_id, "size": 10}) + "\n")
+            journal.write("[0, 4]\n[8, 2]\n[4,")
+            journal.close()
+            self.assertEqual(read_journal(journal.name, file_id, 10), [(0, 4), (8, 2)])
+            self.assertIsNone(read_journal(journal.name, file_id, 11))
+            self.assertIsNone(read_journal(journal.name, "file-" + "1" * 24, 10))
+        finally:
+            os.remove(journal.name)
+        self.assertIsNone(read_journal(journal.name, file_id, 10))
+
+    def test_upload_part_headers(self):
+        try:
+            from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+        except ImportError:
+            from http.server import HTTPServer, BaseHTTPRequestHandler
+        import threading
+        received = []
+
+        class StorageHandler(BaseHTTPRequestHandler):
+            def do_PUT(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                received.append((self.headers.get('Content-Type'), body))
+                self.send_response(200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        server = HTTPServer(('127.0.0.1', 0), StorageHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        file_upload = dxpy.api.file_upload
+        dxpy.api.file_upload = lambda *args, **kwargs: {"url": "http://127.0.0.1:%d/" % server.server_port,
+                                                        "headers": {}}
+        try:
+            part_size = 5 * 1024 * 1024
+            data = b"a" * part_size + b"b" * part_size + b"c"
+            dxfile = dxpy.DXFile("file-" + "x" * 24, write_buffer_size=part_size)
+            dxfile.write(data)
+            dxfile.flush()
+        finally:
+            dxpy.api.file_upload = file_upload
+            server.shutdown()
+            thread.join()
+        # Whole parts are sent as they are, without a Content-Type
+        self.assertEqual(sorted(received), [(None, b"a" * part_size), (None, b"b" * part_size), (None, b"c")])
+
+    def test_get_md5_hexdigest(self):
+        data = b"foo\n" * 1000
+        expected = hashlib.md5(data).hexdigest()
+        self.assertEqual(dxpy.bindings.dxfile._get_md5_hexdigest(data), expected)
+        buf = io.BytesIO(data)
+        buf.seek(4)
+        self.assertEqual(dxpy.bindings.dxfile._get_md5_hexdigest(buf), hashlib.md5(data[4:]).hexdigest())
+        self.assertEqual(buf.tell(), 4)
+
     def test_job_detection(self):
         env = dict(os.environ, DX_JOB_ID='job-00000000000000000000')
         buffer_size = subprocess.check_output(
@@ -221,6 +304,40 @@ class TestDXFileFunctions(unittest.TestCase):
         self.assertEqual(int(buffer_size), 16 * 1024 * 1024)
 
 
+class TestDXFileBlockCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        import concurrent.futures
+        cache = dxpy.bindings.dxfile._BlockCache(max_bytes=20, block_size=10)
+        fetched = []
+
+        def fetch_fn(key):
+            def fetch():
+                fetched.append(key)
+                future = concurrent.futures.Future()
+                future.set_result(b"x" * 10)
+                return future
+            return fetch
+
+        for key in "a", "b", "a", "c", "a", "b":
+            cache.get_or_fetch(key, 10, fetch_fn(key))
+        # "b" was evicted when "c" was added, because "a" had just been used
+        self.assertEqual(fetched, ["a", "b", "c", "b"])
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+
+    def test_failed_blocks_are_refetched(self):
+        import concurrent.futures
+        cache = dxpy.bindings.dxfile._BlockCache(max_bytes=100, block_size=10)
+
+        def failing_fetch():
+            future = concurrent.futures.Future()
+            future.set_exception(DXFileError("oops"))
+            return future
+
+        self.assertIsNotNone(cache.get_or_fetch("a", 10, failing_fetch).exception())
+        self.assertIsNotNone(cache.get_or_fetch("a", 10, failing_fetch).exception())
+        self.assertEqual(cache.misses, 2)
+
+
 class TestDXFile(unittest.TestCase):
 
     '''
@@ -304,6 +421,70 @@ class TestDXFile(unittest.TestCase):
 
         self.assertTrue(filecmp.cmp(self.foo_file.name, self.new_file.name))
 
+    def test_download_dxfile_parallel(self):
+        data = (string.ascii_letters + string.digits + '._+') * 100003
+        self.dxfile = dxpy.upload_string(data, wait_on_close=True)
+
+        dxpy.download_dxfile(self.dxfile.get_id(), self.new_file.name, chunksize=1024 * 1024, parallel=True,
+                             max_inflight_bytes=3 * 1024 * 1024)
+        with open(self.new_file.name, 'rb') as fh:
+            self.assertEqual(fh.read(), data.encode('utf-8'))
+
+        # A description that is already known is not fetched again
+        desc = self.dxfile.describe()
+        records = []
+        dxpy.add_request_hook(records.append)
+        try:
+            dxpy.download_dxfile(self.dxfile.get_id(), self.new_file.name, chunksize=1024 * 1024, parallel=True,
+                                 describe_output=desc)
+        finally:
+            dxpy.remove_request_hook(records.append)
+        self.assertNotIn("/" + self.dxfile.get_id() + "/describe", [record["route"] for record in records])
+        with open(self.new_file.name, 'rb') as fh:
+            self.assertEqual(fh.read(), data.encode('utf-8'))
+
+    def test_download_dxfile_resume(self):
+        data = (string.ascii_letters + string.digits + '._+') * 100003
+        self.dxfile = dxpy.upload_string(data, wait_on_close=True)
+        journal_filename = self.new_file.name + dxpy.bindings.dxfile_functions.DOWNLOAD_JOURNAL_SUFFIX
+
+        # Simulate an interrupted download that only got the first 1 MB
+        with open(self.new_file.name, 'wb') as fh:
+            fh.write(data[:1024 * 1024].encode('utf-8'))
+            fh.write(b'\0' * (len(data) - 1024 * 1024))
+        with open(journal_filename, 'w') as fh:
+            fh.write(json.dumps({"id": self.dxfile.get_id(), "size": len(data)}) + "\n")
+            fh.write(json.dumps([0, 1024 * 1024]) + "\n")
+
+        dxpy.download_dxfile(self.dxfile.get_id(), self.new_file.name, chunksize=1024 * 1024, resume=True)
+        with open(self.new_file.name, 'rb') as fh:
+            self.assertEqual(fh.read(), data.encode('utf-8'))
+        self.assertFalse(os.path.exists(journal_filename))
+
+    def test_download_dxfile_with_file_cache(self):
+        self.dxfile = dxpy.upload_string(self.foo_str, wait_on_close=True)
+        cache_dir = tempfile.mkdtemp()
+        os.environ['DX_FILE_CACHE_DIR'] = cache_dir
+        try:
+            dxpy.download_dxfile(self.dxfile.get_id(), self.new_file.name)
+            self.assertTrue(filecmp.cmp(self.foo_file.name, self.new_file.name))
+            cached_filename = os.path.join(cache_dir, self.dxfile.get_id())
+            self.assertTrue(filecmp.cmp(self.foo_file.name, cached_filename))
+
+            # Subsequent reads are served from the cached copy
+            with open(cached_filename, 'wb') as fh:
+                fh.write(self.foo_str.upper().encode('utf-8'))
+            dxpy.download_dxfile(self.dxfile.get_id(), self.new_file.name)
+            with open(self.new_file.name, 'rb') as fh:
+                self.assertEqual(fh.read(), self.foo_str.upper().encode('utf-8'))
+            with dxpy.open_dxfile(self.dxfile.get_id()) as same_dxfile:
+                self.assertEqual(same_dxfile.read(3), self.foo_str.upper()[:3].encode('utf-8'))
+                same_dxfile.seek(1)
+                self.assertEqual(same_dxfile.read(), self.foo_str.upper()[1:].encode('utf-8'))
+        finally:
+            del os.environ['DX_FILE_CACHE_DIR']
+            shutil.rmtree(cache_dir)
+
     def test_upload_string_dxfile(self):
         self.dxfile = dxpy.upload_string(self.foo_str)
 
@@ -351,6 +532,22 @@ class TestDXFile(unittest.TestCase):
             buf = same_dxfile.read()
             self.assertEqual(self.foo_str[-1:], buf)
 
+    def test_write_read_dxfile_multipart(self):
+        part_size = 5 * 1024 * 1024
+        data = (string.ascii_letters + string.digits + '._+').encode('utf-8') * 200003
+        with dxpy.new_dxfile(write_buffer_size=part_size) as self.dxfile:
+            dxid = self.dxfile.get_id()
+            # Unaligned writes, a write spanning several parts, and a
+            # mutable buffer
+            self.dxfile.write(data[:1000])
+            self.dxfile.write(data[1000:1000 + 2 * part_size + 17])
+            self.dxfile.write(bytearray(data[1000 + 2 * part_size + 17:]))
+
+        with dxpy.open_dxfile(dxid) as same_dxfile:
+            same_dxfile.wait_on_close()
+            self.assertEqual(same_dxfile.describe()["size"], len(data))
+            self.assertEqual(same_dxfile.read(), data)
+
     def test_dxfile_sequential_optimization(self):
         # Make data longer than 128k to trigger the
         # first-sequential-read optimization
@@ -373,6 +570,25 @@ class TestDXFile(unittest.TestCase):
         finally:
             dxpy.set_job_id(previous_job_id)
 
+    def test_dxfile_read_cache(self):
+        data = (string.ascii_letters + string.digits + '._+').encode('utf-8') * 2017
+        file_id = dxpy.upload_string(data, wait_on_close=True).get_id()
+        dxpy.DXFile.set_read_cache_size(1024 * 1024, block_size=4096)
+        try:
+            fh = dxpy.DXFile(file_id)
+            self.assertEqual(fh.read(10000), data[:10000])
+            misses = dxpy.DXFile._read_cache.misses
+            for pos, length in (0, 100), (5000, 3000), (4095, 2), (50, 9000):
+                fh.seek(pos)
+                self.assertEqual(fh.read(length), data[pos:pos + length])
+                self.assertEqual(fh.tell(), pos + length)
+            # Everything re-read above was already cached
+            self.assertEqual(dxpy.DXFile._read_cache.misses, misses)
+            fh.seek(-5, 2)
+            self.assertEqual(fh.read(), data[-5:])
+        finally:
+            dxpy.DXFile.set_read_cache_size(0)
+
     def test_iter_dxfile(self):
         dxid = ""
         with dxpy.new_dxfile() as self.dxfile:
@@ -429,6 +645,52 @@ class TestDXFile(unittest.TestCase):
             self.assertNotEqual(url3, url4)
 
 
+class TestDXGTableFunctions(unittest.TestCase):
+    def test_integer_column_tokens(self):
+        get_tokens = dxpy.bindings.dxgtable._get_column_tokens
+        column = dxpy.DXGTable.make_column_desc("a", "uint32")
+        big = 4294967295
+        self.assertEqual(get_tokens([0, big], column, 0), ["0", str(big)])
+        if USING_PYTHON2:
+            self.assertEqual(get_tokens([long(1), long(big)], column, 0), ["1", str(big)])
+        self.assertEqual(get_tokens([1, 2.5], dxpy.DXGTable.make_column_desc("b", "double"), 0), ["1.0", "2.5"])
+        for values, typename in ([big + 1], "uint32"), ([-1], "uint8"), ([1 << 31], "int32"), ([1.0], "int64"):
+            with self.assertRaises(ValueError):
+                get_tokens(values, dxpy.DXGTable.make_column_desc("a", typename), 0)
+
+    def test_windowed_query_requests(self):
+        dxgtable = dxpy.DXGTable("gtable-" + "x" * 24)
+        requests = []
+        def describe(**kwargs):
+            requests.append("describe")
+            return {"indices": [{"name": "gri", "type": "genomic", "chr": "chr", "lo": "lo", "hi": "hi"}]}
+        def get_rows(query=None, columns=None, starting=None, limit=None, **kwargs):
+            requests.append(("get_rows", limit))
+            lo = query["parameters"]["coords"][1]
+            return {"data": [[i, "1", lo + i, lo + i + 1] for i in range(min(limit, 5))], "next": None}
+        dxgtable.describe, dxgtable.get_rows = describe, get_rows
+        dxgtable.get_col_names = lambda **kwargs: ["chr", "lo", "hi"]
+
+        # Small limits are fetched in one request, without windows
+        rows = list(dxgtable.iterate_query_rows(dxgtable.genomic_range_query("1", 0, 1000), limit=3, num_windows=4))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(requests, [("get_rows", 3)])
+
+        # The table is described once for all of the queries
+        del requests[:]
+        queries = [dxgtable.genomic_range_query(str(chrom), 0, 1000) for chrom in range(1, 4)]
+        rows = list(dxgtable.iterate_query_rows(queries, num_windows=4))
+        self.assertEqual(requests.count("describe"), 1)
+        self.assertEqual(len([request for request in requests if request != "describe"]), 12)
+
+    @unittest.skipIf(numpy is None, 'skipping test that requires NumPy')
+    def test_integer_array_column_tokens(self):
+        get_tokens = dxpy.bindings.dxgtable._get_column_tokens
+        for typename in "uint8", "int16", "uint16", "int32", "uint32", "int64":
+            column = dxpy.DXGTable.make_column_desc("a", typename)
+            values = numpy.array([0, 1, 100], dtype=dxpy.bindings.dxgtable.NUMPY_DTYPES[typename])
+            self.assertEqual(get_tokens(values, column, 0), ["0", "1", "100"])
+
 @unittest.skipUnless(testutil.TEST_GTABLE, 'skipping test that would create a GTable')
 class TestDXGTable(unittest.TestCase):
     """
@@ -649,6 +911,94 @@ class TestDXGTable(unittest.TestCase):
             counter += 1
         self.assertEqual(counter, 62)
 
+        self.assertEqual(list(self.dxgtable.iterate_rows(start=1, end=63, stream_json=True)),
+                         list(self.dxgtable.iterate_rows(start=1, end=63)))
+
+    def _new_table_for_batches(self):
+        self.dxgtable = dxpy.new_dxgtable(
+            [dxpy.DXGTable.make_column_desc("a", "string"),
+             dxpy.DXGTable.make_column_desc("b", "int32"),
+             dxpy.DXGTable.make_column_desc("c", "double")])
+        rows = [["row" + str(i), dxpy.NULL if i % 10 == 0 else i, i / 2.0] for i in range(100)]
+        self.dxgtable.add_rows(rows)
+        self.dxgtable.close(block=True)
+        self.dxgtable._read_row_buffer_size = 30
+        return rows
+
+    def test_iterate_row_batches(self):
+        rows = self._new_table_for_batches()
+        batches = list(self.dxgtable.iterate_row_batches(as_arrays=False))
+        self.assertEqual([len(batch["__id__"]) for batch in batches], [30, 30, 30, 10])
+        self.assertEqual(list(batches[0].keys()), ["__id__", "a", "b", "c"])
+        self.assertEqual(sum((batch["a"] for batch in batches), []), [row[0] for row in rows])
+        self.assertEqual(sum((batch["__id__"] for batch in batches), []), list(range(100)))
+
+        batches = list(self.dxgtable.iterate_row_batches(start=95, columns=["c", "a"], as_arrays=False))
+        self.assertEqual(batches, [{"c": [47.5, 48.0, 48.5, 49.0, 49.5],
+                                    "a": ["row95", "row96", "row97", "row98", "row99"]}])
+
+    def test_add_rows_from_columns(self):
+        self.dxgtable = dxpy.new_dxgtable(
+            [dxpy.DXGTable.make_column_desc("a", "string"),
+             dxpy.DXGTable.make_column_desc("b", "int32"),
+             dxpy.DXGTable.make_column_desc("c", "double")])
+        self.dxgtable.add_rows([["row0", 0, 0.5]])
+        self.dxgtable.add_rows_from_columns({"a": ["row1", "row2"], "b": [1, 2], "c": [1.5, 2]})
+        self.dxgtable.add_rows({"c": [3.5], "b": [dxpy.NULL], "a": ["row3"]})
+        expected = [["row0", 0, 0.5], ["row1", 1, 1.5], ["row2", 2, 2.0], ["row3", dxpy.NULL, 3.5]]
+        if numpy is not None:
+            self.dxgtable.add_rows_from_columns({"a": numpy.array(["row4"]),
+                                                 "b": numpy.ma.masked_array([4], mask=[True]),
+                                                 "c": numpy.array([4.5])})
+            expected.append(["row4", dxpy.NULL, 4.5])
+
+        with self.assertRaises(ValueError):
+            self.dxgtable.add_rows_from_columns({"a": ["x"], "b": [1]})
+        with self.assertRaises(ValueError):
+            self.dxgtable.add_rows_from_columns({"a": [1], "b": [1], "c": [1.0]})
+        with self.assertRaises(ValueError):
+            self.dxgtable.add_rows_from_columns({"a": ["x", "y"], "b": [1], "c": [1.0]})
+
+        self.dxgtable.close(block=True)
+        self.assertEqual(list(self.dxgtable.iterate_rows(columns=["a", "b", "c"])), expected)
+
+    def test_parallel_writer(self):
+        self.dxgtable = dxpy.new_dxgtable(
+            [dxpy.DXGTable.make_column_desc("a", "string"),
+             dxpy.DXGTable.make_column_desc("b", "int32")])
+        rows = [["row" + str(i), i] for i in range(250)]
+        with dxpy.DXGTableParallelWriter(self.dxgtable, num_processes=2, part_size=40) as writer:
+            writer.add_rows(rows[:100])
+            for row in rows[100:]:
+                writer.add_row(row)
+        self.dxgtable.wait_on_close()
+        self.assertEqual(list(self.dxgtable.iterate_rows(columns=["a", "b"])), rows)
+
+        # Errors in the workers are reraised in the parent, and the
+        # GTable is left open. The caller may also override always_retry.
+        self.dxgtable = dxpy.new_dxgtable([dxpy.DXGTable.make_column_desc("a", "string")])
+        with self.assertRaises(dxpy.exceptions.InvalidInput):
+            with dxpy.DXGTableParallelWriter(self.dxgtable, num_processes=2, part_size=10, validate=False,
+                                             always_retry=False) as writer:
+                writer.add_rows([[i] for i in range(100)])
+        self.assertEqual(self.dxgtable.describe()["state"], "open")
+        with self.assertRaises(dxpy.DXGTableError):
+            writer.add_row(["x"])
+
+    @unittest.skipIf(numpy is None, 'skipping test that requires NumPy')
+    def test_iterate_row_batches_as_arrays(self):
+        rows = self._new_table_for_batches()
+        batches = list(self.dxgtable.iterate_row_batches())
+        self.assertEqual(len(batches), 4)
+        self.assertEqual(batches[0]["__id__"].dtype, numpy.int64)
+        self.assertEqual(batches[0]["a"].dtype, numpy.object_)
+        self.assertEqual(batches[0]["b"].dtype, numpy.int32)
+        self.assertEqual(batches[0]["c"].dtype, numpy.float64)
+        b = numpy.ma.concatenate([batch["b"] for batch in batches])
+        self.assertEqual(b.count(), 90)
+        self.assertEqual(b.sum(), sum(i for i in range(100) if i % 10 != 0))
+        self.assertEqual(list(numpy.ma.concatenate([batch["a"] for batch in batches])), [row[0] for row in rows])
+
     def test_gri(self):
         data10 = [['chr2', 22, 28, 'j'],
                   ['chr1',  0,  3, 'a'],
@@ -735,6 +1085,19 @@ class TestDXGTable(unittest.TestCase):
             result_num += 1
         self.assertEqual(3, result_num)
 
+        # Testing iterate_query_rows with concurrent queries and windows
+        genomic_queries = [dxpy.DXGTable.genomic_range_query('chr1', 0, 30),
+                           dxpy.DXGTable.genomic_range_query('chr2', 0, 30)]
+        expected = [row[0] for query in genomic_queries for row in self.dxgtable.iterate_query_rows(query)]
+        self.assertEqual(len(expected), 10)
+        for num_windows in [None, 1, 3, 50]:
+            self.assertEqual([row[0] for row in self.dxgtable.iterate_query_rows(genomic_queries,
+                                                                                num_windows=num_windows)],
+                             expected)
+        self.assertEqual(list(self.dxgtable.iterate_query_rows(genomic_queries[0], columns=['quux'], num_windows=4)),
+                         [[row] for row in 'abcdefghi'])
+        self.assertEqual(len(list(self.dxgtable.iterate_query_rows(genomic_queries, num_windows=4, limit=4))), 4)
+
     def test_lexicographic(self):
         lex_index = dxpy.DXGTable.lexicographic_index([
                 dxpy.DXGTable.lexicographic_index_column("a", case_sensitive=False),
@@ -955,6 +1318,20 @@ class TestDXRecord(unittest.TestCase):
         dxrecord.unhide()
         self.assertEqual(dxrecord.describe()["hidden"], False)
 
+    def test_describe_cache(self):
+        dxrecord = dxpy.new_dxrecord(name="foo", close=True)
+        dxpy.DXDataObject.set_describe_cache_size(100)
+        try:
+            cache = dxpy.DXDataObject._describe_cache
+            self.assertEqual(dxpy.DXRecord(dxrecord.get_id()).describe()["name"], "foo")
+            self.assertEqual(dxpy.DXRecord(dxrecord.get_id()).describe()["name"], "foo")
+            self.assertEqual((cache.hits, cache.misses), (1, 1))
+            dxpy.DXRecord(dxrecord.get_id()).rename("bar")
+            self.assertEqual(dxpy.DXRecord(dxrecord.get_id()).describe()["name"], "bar")
+            self.assertEqual((cache.hits, cache.misses), (1, 2))
+        finally:
+            dxpy.DXDataObject.set_describe_cache_size(0)
+
     def test_rename_dxrecord(self):
         dxrecord = dxpy.new_dxrecord()
         dxrecord.rename("newname")
@@ -1081,6 +1458,28 @@ class TestDXAppletJob(unittest.TestCase):
                 dxjob = dxpy.DXJob()
                 dxjob.set_id(bad_value)
 
+    def test_wait_on_all(self):
+        dxapplet = dxpy.DXApplet()
+        dxapplet.new(name="test_applet",
+                     dxapi="1.04",
+                     inputSpec=[],
+                     outputSpec=[],
+                     runSpec={"code": "sleep 1200", "interpreter": "bash"})
+        dxjobs = [dxapplet.run({}) for _i in range(3)]
+        for dxjob in dxjobs:
+            dxjob.terminate()
+
+        with self.assertRaises(DXJobFailureError):
+            for _job in dxpy.iterate_finished_executions(dxjobs, min_interval=1):
+                pass
+
+        finished = []
+        with self.assertRaises(DXJobFailureError):
+            dxpy.wait_on_all([dxjob.get_id() for dxjob in dxjobs], callback=finished.append, fail_fast=False,
+                             min_interval=1, timeout=120)
+        self.assertEqual(sorted(job.get_id() for job in finished), sorted(job.get_id() for job in dxjobs))
+        self.assertTrue(all(job._desc["state"] == "terminated" for job in finished))
+
     def test_run_dxapplet_and_job_metadata(self):
         dxapplet = dxpy.DXApplet()
         dxapplet.new(name="test_applet",
@@ -1151,6 +1550,91 @@ def main():
 
         dxjob.terminate()
 
+class TestExecutionFunctions(unittest.TestCase):
+    def test_wait_on_all_searches(self):
+        execution_functions = dxpy.bindings.dxexecution_functions
+        # Five jobs under one root, five others in project-1, and one in
+        # project-2, which finish after the given number of checks
+        jobs = [dxpy.DXJob("job-%024d" % i) for i in range(11)]
+        roots = ["job-%024d" % 0] * 5 + [job.get_id() for job in jobs[5:]]
+        projects = ["project-1"] * 10 + ["project-2"]
+        checks_to_finish = [2] * 5 + [3] * 6
+        # The job in project-2 is described on every check
+        checks = [0]
+        requests = []
+
+        def get_desc(i):
+            return {"id": jobs[i].get_id(), "state": "done" if checks[0] >= checks_to_finish[i] else "running",
+                    "rootExecution": roots[i], "project": projects[i], "created": 1000 + i}
+
+        def find_executions(root_execution=None, project=None, **kwargs):
+            requests.append(("find", root_execution or project))
+            return [{"id": jobs[i].get_id(), "describe": get_desc(i)} for i in range(len(jobs))
+                    if root_execution in (None, roots[i]) and project in (None, projects[i])]
+
+        def describe_many(handlers, **kwargs):
+            checks[0] += 1
+            requests.extend(("describe", handler.get_id()) for handler in handlers)
+            descs = [get_desc(jobs.index(handler)) for handler in handlers]
+            for handler, desc in zip(handlers, descs):
+                handler._desc = desc
+            return descs
+
+        orig_find_executions, orig_describe_many = dxpy.find_executions, execution_functions.describe_many
+        dxpy.find_executions, execution_functions.describe_many = find_executions, describe_many
+        try:
+            finished = [job.get_id() for job in dxpy.iterate_finished_executions(jobs, min_interval=0)]
+        finally:
+            dxpy.find_executions, execution_functions.describe_many = orig_find_executions, orig_describe_many
+        self.assertEqual(sorted(finished[:6]), sorted(job.get_id() for job in jobs[:5] + jobs[10:]))
+        self.assertEqual(sorted(finished[6:]), [job.get_id() for job in jobs[5:10]])
+        # After the first check, only the job in project-2 is described
+        self.assertEqual(len([request for request in requests if request[0] == "describe"]), 11 + 2)
+        self.assertEqual(requests.count(("describe", jobs[10].get_id())), 3)
+        self.assertEqual(requests.count(("find", roots[0])), 2)
+        self.assertEqual(requests.count(("find", "project-1")), 3)
+
+class TestDescribeMany(unittest.TestCase):
+    def _describe_many_requests(self, error):
+        object_functions = dxpy.bindings.dxdataobject_functions
+        records = [dxpy.DXRecord("record-%024d" % i) for i in range(3)]
+        requests = []
+
+        def DXHTTPRequest(route, input_params, **kwargs):
+            requests.append(route)
+            raise error
+
+        def describe_one(handler, fields, default_fields, **kwargs):
+            requests.append(handler.get_id())
+            handler._desc = {"id": handler.get_id()}
+            return handler._desc
+
+        orig_request, orig_describe_one = dxpy.DXHTTPRequest, object_functions._describe_one
+        dxpy.DXHTTPRequest, object_functions._describe_one = DXHTTPRequest, describe_one
+        try:
+            for _i in range(2):
+                descs = dxpy.describe_many(records)
+                self.assertEqual([desc["id"] for desc in descs], [record.get_id() for record in records])
+        finally:
+            dxpy.DXHTTPRequest, object_functions._describe_one = orig_request, orig_describe_one
+            object_functions._batch_describe_unsupported = False
+        return requests
+
+    def test_missing_object(self):
+        error = dxpy.exceptions.ResourceNotFound({"error": {"type": "ResourceNotFound",
+                                                            "message": "record-000000000000000000000002 not found"}},
+                                                 404)
+        # The batch describe is still tried on each call
+        self.assertEqual(self._describe_many_requests(error).count("/system/describeDataObjects"), 2)
+
+    def test_unknown_route(self):
+        error = dxpy.exceptions.ResourceNotFound({"error": {"type": "ResourceNotFound",
+                                                            "message": "The specified URL could not be found"}},
+                                                 404)
+        self.assertEqual(self._describe_many_requests(error).count("/system/describeDataObjects"), 1)
+        error = InvalidInput({"error": {"type": "InvalidInput", "message": "Unknown route"}}, 404)
+        self.assertEqual(self._describe_many_requests(error).count("/system/describeDataObjects"), 1)
+
 class TestDXWorkflow(unittest.TestCase):
     default_inst_type = "mem2_hdd2_x2"
 
@@ -1821,6 +2305,47 @@ class TestDXSearch(unittest.TestCase):
         # self.assertEqual(len(list(query(created_after="60s"))), 0)
         # self.assertEqual(len(list(query(created_before="60s"))), 1)
 
+    def test_find_data_objs_with_prefetch_and_time_shards(self):
+        record_ids = []
+        for i in range(8):
+            record_ids.append(dxpy.new_dxrecord(name='find_sharded').get_id())
+            time.sleep(0.1)
+
+        def query(**kwargs):
+            return [result["id"] for result in
+                    dxpy.search.find_data_objects(name='find_sharded', project=self.proj_id, first_page_size=3,
+                                                  **kwargs)]
+
+        unsplit = query()
+        self.assertEqual(sorted(unsplit), sorted(record_ids))
+        self.assertEqual(query(prefetch=True), unsplit)
+        self.assertEqual(sorted(query(time_shards=4)), sorted(record_ids))
+        self.assertEqual(sorted(query(time_shards=3, shard_field="modified")), sorted(record_ids))
+        self.assertEqual(len(query(time_shards=4, limit=5)), 5)
+
+        # Windows are yielded oldest first
+        created = dxpy.DXRecord(record_ids[4]).describe()["created"]
+        results = query(time_shards=[created])
+        self.assertEqual(sorted(results[:4]), sorted(record_ids[:4]))
+        self.assertEqual(sorted(results[4:]), sorted(record_ids[4:]))
+
+        with self.assertRaises(DXError):
+            list(dxpy.search.find_data_objects(name='find_sharded', time_shards=4))
+
+    def test_find_data_objs_with_stream_json(self):
+        record_ids = [dxpy.new_dxrecord(name='find_streamed').get_id() for i in range(8)]
+
+        def query(**kwargs):
+            return [result["id"] for result in
+                    dxpy.search.find_data_objects(name='find_streamed', project=self.proj_id, first_page_size=3,
+                                                  **kwargs)]
+
+        self.assertEqual(query(stream_json=True), query())
+        self.assertEqual(sorted(query(stream_json=True)), sorted(record_ids))
+        self.assertEqual(len(query(stream_json=True, limit=5)), 5)
+        with self.assertRaises(DXError):
+            query(stream_json=True, prefetch=True)
+
     def test_find_data_objs_in_workspace(self):
         old_workspace = dxpy.WORKSPACE_ID
         dxpy.WORKSPACE_ID = self.proj_id
@@ -2050,6 +2575,53 @@ class TestHTTPResponses(unittest.TestCase):
             dxpy.DXHTTPRequest('http://localhost:20406', {}, prepend_srv=False, always_retry=False, max_retries=1)
         self.assertTrue(dxpy._is_retryable_exception(exception_cm.exception))
 
+    def test_request_hook(self):
+        records = []
+        dxpy.add_request_hook(records.append)
+        try:
+            dxpy.api.system_find_projects({'limit': 1})
+            with self.assertRaises(DXAPIError):
+                dxpy.api.file_describe('file-000000000000000000000000')
+        finally:
+            dxpy.remove_request_hook(records.append)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]["route"], "/system/findProjects")
+        self.assertEqual(records[0]["status"], 200)
+        self.assertIsNone(records[0]["error"])
+        self.assertGreater(records[0]["seconds"], 0)
+        self.assertGreater(records[0]["bytes_sent"], 0)
+        self.assertIsInstance(records[1]["error"], DXAPIError)
+        self.assertEqual(records[1]["status"], 404)
+
+    def test_connection_reuse(self):
+        dxpy.api.system_find_projects({'limit': 1})
+        stats_before = dxpy.get_connection_pool_stats()
+        for _i in range(3):
+            dxpy.api.system_find_projects({'limit': 1})
+        stats = dxpy.get_connection_pool_stats()
+        self.assertEqual(stats["requests"] - stats_before["requests"], 3)
+        self.assertGreater(stats["hits"], stats_before["hits"])
+
+    def test_connection_pool_size(self):
+        session = dxpy.SESSION_HANDLERS[os.getpid()]
+        try:
+            dxpy.set_connection_pool_options(pool_maxsize=3)
+            self.assertEqual(session.get_adapter('https://example.com')._pool_maxsize, 3)
+            dxpy.set_connection_pool_options()
+            adapter = session.get_adapter('https://example.com')
+            maxsize = adapter._pool_maxsize
+            self.assertGreaterEqual(maxsize, dxpy.DEFAULT_CONNECTION_POOL_SIZE)
+            pool = adapter.get_connection('https://example.com')
+            dxpy.reserve_connection_pool_capacity(maxsize)
+            # The adapter and its existing pool are kept; only pools
+            # created afterwards are larger
+            self.assertIs(session.get_adapter('https://example.com'), adapter)
+            self.assertGreater(adapter._pool_maxsize, maxsize)
+            self.assertIs(adapter.get_connection('https://example.com'), pool)
+            self.assertGreater(adapter.get_connection('https://example.org').pool.maxsize, maxsize)
+        finally:
+            dxpy.set_connection_pool_options()
+
 
 class TestDataobjectFunctions(unittest.TestCase):
     def setUp(self):
@@ -2084,6 +2656,20 @@ class TestDataobjectFunctions(unittest.TestCase):
         self.assertTrue(dxpy.is_dxlink({"$dnanexus_link": {"id": None}}))
         self.assertTrue(dxpy.is_dxlink({"$dnanexus_link": {"job": None}}))
 
+    def test_describe_many(self):
+        records = [dxpy.new_dxrecord(project=self.proj_id, name="record " + str(i)) for i in range(5)]
+        handlers = [dxpy.DXRecord(record.get_id(), project=self.proj_id) for record in records]
+        descs = dxpy.describe_many(handlers[:3] + [records[3].get_id(), dxpy.dxlink(records[4]), self.proj_id],
+                                   fields={"name"})
+        self.assertEqual([desc["name"] for desc in descs[:5]], ["record " + str(i) for i in range(5)])
+        self.assertEqual(descs[5]["id"], self.proj_id)
+        # Handlers that were passed in do not need to be described again
+        self.assertEqual(handlers[0]._desc, descs[0])
+        self.assertEqual(handlers[0].name, "record 0")
+
+        with self.assertRaises(DXAPIError):
+            dxpy.describe_many([records[0].get_id(), "record-000000000000000000000000"])
+
     def test_get_handler(self):
         dxpy.set_workspace_id(self.second_proj_id)
 
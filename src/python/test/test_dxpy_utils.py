@@ -19,12 +19,20 @@
 
 from __future__ import print_function, unicode_literals, division, absolute_import
 
-import unittest, time, json, re, os
+import unittest, time, json, re, os, shutil, tempfile, collections, pickle
 import dxpy
 from dxpy import AppError, AppInternalError, DXFile, DXRecord
 from dxpy.utils import (describe, exec_utils, genomic_utils, response_iterator, get_futures_threadpool, DXJSONEncoder,
                         normalize_timedelta, normalize_time_input, config)
 from dxpy.utils.exec_utils import DXExecDependencyInstaller
+from dxpy.utils.transfer_controller import AIMDTransferController
+from dxpy.utils.file_cache import DXFileCache
+from dxpy.utils.completion_cache import DXCompletionCache
+from dxpy.utils.request_metrics import RequestMetricsAggregator, normalize_route
+from dxpy.utils.retry_coordinator import RetryCoordinator
+from dxpy.utils.describe_cache import DescribeCache
+from dxpy.utils.json_stream import JSONObjectStream
+from dxpy.utils import json_codec
 from dxpy.compat import USING_PYTHON2
 
 # TODO: unit tests for dxpy.utils.get_field_from_jbor, get_job_from_jbor, is_job_ref
@@ -67,6 +75,14 @@ class TestErrorSanitizing(unittest.TestCase):
         self.assertEqual(exec_utils._format_exception_message(ValueError("foo")), "ValueError: foo")
         self.assertEqual(exec_utils._format_exception_message(AppError("foo")), "foo")
 
+    def test_pickling_api_errors(self):
+        error = dxpy.exceptions.InvalidInput({"error": {"type": "InvalidInput", "message": "Bad row",
+                                                        "details": {"row": 3}}}, 422)
+        unpickled = pickle.loads(pickle.dumps(error))
+        self.assertIsInstance(unpickled, dxpy.exceptions.InvalidInput)
+        self.assertEqual(str(unpickled), str(error))
+        self.assertEqual(unpickled.code, 422)
+
 class TestGenomicUtils(unittest.TestCase):
     def test_reverse_complement(self):
         self.assertEqual(b"TTTTAAACCG", genomic_utils.reverse_complement(b"CGGTTTAAAA"))
@@ -105,6 +121,391 @@ class TestResponseIterator(unittest.TestCase):
         for i, res in enumerate(response_iterator(tasks2(), get_futures_threadpool(5), num_retries=2, retry_after=0.1)):
             self.assertEqual(i, res)
 
+    def test_dynamic_max_active_tasks(self):
+        limits = [1]
+        def task(i):
+            return i
+
+        def tasks():
+            for i in range(20):
+                if i == 5:
+                    limits[0] = 4
+                yield task, [i], {}
+
+        results = list(response_iterator(tasks(), get_futures_threadpool(4), max_active_tasks=lambda: limits[0]))
+        self.assertEqual(results, list(range(20)))
+
+    def test_connection_reservation(self):
+        capacity = dxpy._connection_pool_capacity
+        thread_pool = get_futures_threadpool(4)
+        self.assertEqual(dxpy._connection_pool_capacity, capacity + 4)
+        self.assertEqual(thread_pool.submit(lambda: 1).result(), 1)
+        thread_pool.shutdown()
+        thread_pool.shutdown()
+        self.assertEqual(dxpy._connection_pool_capacity, capacity)
+        # Pools whose workers make no requests reserve nothing
+        get_futures_threadpool(4, reserve_connections=False).shutdown()
+        self.assertEqual(dxpy._connection_pool_capacity, capacity)
+
+class TestTransferController(unittest.TestCase):
+    def test_chunk_size_bounds(self):
+        controller = AIMDTransferController(initial_chunk_size=100, min_chunk_size=16, max_chunk_size=64,
+                                            initial_concurrency=2, max_concurrency=4)
+        self.assertEqual(controller.chunk_size, 64)
+        self.assertEqual(controller.concurrency, 2)
+        for _i in range(100):
+            controller.record_success(64, 0.001)
+        self.assertEqual(controller.chunk_size, 64)
+        self.assertEqual(controller.concurrency, 4)
+
+    def test_slow_requests_shrink_chunks(self):
+        controller = AIMDTransferController(initial_chunk_size=1024, min_chunk_size=16, max_chunk_size=1024,
+                                            initial_concurrency=1, max_concurrency=1,
+                                            target_request_seconds=(0.01, 0.1))
+        for _i in range(3):
+            controller.record_success(1024, 1.0)
+        self.assertEqual(controller.chunk_size, 128)
+        self.assertEqual(len(controller.get_stats().decisions), 3)
+
+    def test_failure_halves_concurrency(self):
+        controller = AIMDTransferController(initial_chunk_size=16, min_chunk_size=16, max_chunk_size=16,
+                                            initial_concurrency=8, max_concurrency=8)
+        controller.record_failure()
+        self.assertEqual(controller.concurrency, 4)
+        controller.record_failure()
+        controller.record_failure()
+        controller.record_failure()
+        self.assertEqual(controller.concurrency, 1)
+        stats = controller.get_stats()
+        self.assertEqual(stats.num_failures, 4)
+        self.assertEqual(stats.num_requests, 0)
+
+    def test_inflight_limit(self):
+        controller = AIMDTransferController(initial_chunk_size=16, min_chunk_size=16, max_chunk_size=1024,
+                                            initial_concurrency=4, max_concurrency=8, max_inflight_bytes=128)
+        for _i in range(100):
+            controller.record_success(controller.chunk_size, 0.001)
+            self.assertLessEqual(controller.chunk_size * controller.concurrency, 128)
+
+    def test_measure(self):
+        controller = AIMDTransferController(initial_chunk_size=16, min_chunk_size=16, max_chunk_size=16,
+                                            initial_concurrency=1, max_concurrency=1)
+        self.assertEqual(controller.measure(lambda x: x * 2)(b"ab"), b"abab")
+        with self.assertRaises(ZeroDivisionError):
+            controller.measure(lambda: 1 // 0)()
+        stats = controller.get_stats()
+        self.assertEqual((stats.num_requests, stats.bytes_transferred, stats.num_failures), (1, 4, 1))
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.cache = DXFileCache(os.path.join(self.tempdir, "cache"), max_bytes=10)
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def write_local_file(self, contents):
+        fd, filename = tempfile.mkstemp(dir=self.tempdir)
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(contents)
+        return filename
+
+    def test_store_and_copy(self):
+        self.assertIsNone(self.cache.open("file-1", 4))
+        self.cache.store("file-1", 4, self.write_local_file(b"abcd"))
+        with self.cache.open("file-1", 4) as fh:
+            self.assertEqual(fh.read(), b"abcd")
+        # Entries whose size does not match are ignored
+        self.assertIsNone(self.cache.open("file-1", 5))
+
+        dest = os.path.join(self.tempdir, "dest")
+        self.assertTrue(self.cache.copy_to("file-1", 4, dest))
+        with open(dest, 'rb') as fh:
+            self.assertEqual(fh.read(), b"abcd")
+        self.assertFalse(self.cache.copy_to("file-2", 4, dest))
+
+    def test_lru_eviction(self):
+        self.cache.store("file-1", 4, self.write_local_file(b"1111"))
+        self.cache.store("file-2", 4, self.write_local_file(b"2222"))
+        os.utime(self.cache._path_for("file-1"), (0, 0))
+        os.utime(self.cache._path_for("file-2"), (1, 1))
+        # Opening file-1 makes it the most recently used entry
+        self.cache.open("file-1", 4).close()
+        self.cache.store("file-3", 4, self.write_local_file(b"3333"))
+        self.assertIsNone(self.cache.open("file-2", 4))
+        self.assertIsNotNone(self.cache.open("file-1", 4))
+        self.assertIsNotNone(self.cache.open("file-3", 4))
+        # Files larger than the whole cache are never stored
+        self.cache.store("file-4", 11, self.write_local_file(b"x" * 11))
+        self.assertIsNone(self.cache.open("file-4", 11))
+        self.assertEqual(sorted(name for name in os.listdir(self.cache.cache_dir) if not name.startswith(".")),
+                         ["file-1", "file-3"])
+
+    def test_handler_construction_is_offline(self):
+        # Constructing handlers must not look at the file cache (or
+        # describe the file) before the first read
+        f = DXFile()
+        self.assertIsNone(f.get_id())
+        f = DXFile("file-" + "x"*24, project="project-" + "y"*24)
+        self.assertEqual(f.get_id(), "file-" + "x"*24)
+        self.assertFalse(f._file_cache_checked)
+        f.set_ids("file-" + "z"*24)
+        self.assertIsNone(f._file_cache_fh)
+
+class TestCompletionCache(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.cache = DXCompletionCache(os.path.join(self.tempdir, "cache"), ttl=30, max_staleness=3600)
+        self.fetches = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def fetch(self, value):
+        def fetch():
+            self.fetches.append(value)
+            return value
+        return fetch
+
+    def set_age(self, kind, params, age):
+        path = self.cache._path_for(kind, params)
+        with open(path) as fh:
+            entry = json.load(fh)
+        entry["time"] -= age
+        with open(path, "w") as fh:
+            json.dump(entry, fh)
+        os.utime(path, (entry["time"], entry["time"]))
+
+    def test_fresh_and_expired_entries(self):
+        self.assertEqual(self.cache.get("folder", ["project-1", "/"], self.fetch(["a"])), ["a"])
+        self.assertEqual(self.cache.get("folder", ["project-1", "/"], self.fetch(["b"])), ["a"])
+        # Listings are keyed by their parameters
+        self.assertEqual(self.cache.get("folder", ["project-1", "/x"], self.fetch(["c"])), ["c"])
+        self.assertEqual(self.fetches, [["a"], ["c"]])
+        # Entries past the maximum staleness are fetched before returning
+        self.set_age("folder", ["project-1", "/"], 7200)
+        self.assertEqual(self.cache.get("folder", ["project-1", "/"], self.fetch(["d"])), ["d"])
+        self.assertEqual(self.cache.get("folder", ["project-1", "/"], self.fetch(["e"])), ["d"])
+        # Peeking returns stale entries without fetching them
+        self.set_age("folder", ["project-1", "/"], 60)
+        self.assertEqual(self.cache.peek("folder", ["project-1", "/"]), ["d"])
+        self.assertIsNone(self.cache.peek("folder", ["project-2", "/"]))
+        self.assertEqual(self.fetches, [["a"], ["c"], ["d"]])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "Background refreshes require os.fork")
+    def test_stale_while_revalidate(self):
+        self.cache.get("apps", [], self.fetch(["app1"]))
+        self.set_age("apps", [], 60)
+        # The stale list is returned right away while the new one is fetched in the background
+        self.assertEqual(self.cache.get("apps", [], lambda: time.sleep(0.5) or ["app1", "app2"]), ["app1"])
+        # The refresh is done once its marker is removed, after the new
+        # list has been stored
+        marker = self.cache._path_for("apps", []) + ".refreshing"
+        deadline = time.time() + 20
+        while time.time() < deadline and os.path.exists(marker):
+            time.sleep(0.1)
+        self.assertFalse(os.path.exists(marker))
+        self.assertEqual(self.cache.get("apps", [], self.fetch(["app3"])), ["app1", "app2"])
+        self.assertEqual(self.fetches, [["app1"]])
+
+class TestRetryCoordinator(unittest.TestCase):
+    def test_retry_delay(self):
+        coordinator = RetryCoordinator(base_delay=1, max_delay=20)
+        delay = None
+        for _i in range(50):
+            next_delay = coordinator.get_retry_delay(delay)
+            self.assertGreaterEqual(next_delay, 1)
+            self.assertLessEqual(next_delay, min(20, 3 * (delay or 1)))
+            delay = next_delay
+
+    def test_retry_budget(self):
+        coordinator = RetryCoordinator(retry_budget=3, budget_refill_per_second=0)
+        self.assertEqual([coordinator.acquire_retry() for _i in range(4)], [True, True, True, False])
+
+    def test_circuit_breaker(self):
+        coordinator = RetryCoordinator(breaker_threshold=3, breaker_window_seconds=60, jitter_fraction=0)
+        self.assertEqual(coordinator.get_unavailable_wait("https://a", 0.2), 0.2)
+        coordinator.get_unavailable_wait("https://a", 0.2)
+        self.assertEqual(coordinator.get_circuit_wait("https://a"), 0)
+        coordinator.get_unavailable_wait("https://a", 0.2)
+        self.assertGreater(coordinator.get_circuit_wait("https://a"), 0)
+        self.assertEqual(coordinator.get_circuit_wait("https://b"), 0)
+        time.sleep(0.3)
+        self.assertEqual(coordinator.get_circuit_wait("https://a"), 0)
+
+class TestDescribeCache(unittest.TestCase):
+    def test_expiry(self):
+        cache = DescribeCache(max_entries=10, ttl=0.2)
+        cache.put("record-1", {}, {"id": "record-1", "state": "open", "name": "a"})
+        self.assertIsNone(cache.get("record-1", {}))
+        # Without the state, the object may not be closed
+        cache.put("record-1", {"fields": {"name": True}}, {"name": "a"})
+        self.assertIsNone(cache.get("record-1", {"fields": {"name": True}}))
+        cache.put("record-1", {}, {"id": "record-1", "state": "closed", "name": "a"})
+        cache.put("record-1", {"fields": {"size": True}}, {"id": "record-1", "state": "closed", "size": 1})
+        desc = cache.get("record-1", {})
+        self.assertEqual(desc["name"], "a")
+        # Callers get their own copy
+        desc["name"] = "b"
+        self.assertEqual(cache.get("record-1", {})["name"], "a")
+        self.assertIsNone(cache.get("record-1", {"project": "project-1"}))
+        time.sleep(0.3)
+        # Mutable fields expire; immutable fields of closed objects do not
+        self.assertIsNone(cache.get("record-1", {}))
+        self.assertEqual(cache.get("record-1", {"fields": {"size": True}})["size"], 1)
+        self.assertEqual((cache.hits, cache.misses), (3, 4))
+
+    def test_eviction_and_invalidation(self):
+        cache = DescribeCache(max_entries=2)
+        for dxid in ["record-1", "record-2"]:
+            cache.put(dxid, {}, {"id": dxid, "state": "closed"})
+        cache.get("record-1", {})
+        cache.put("record-3", {}, {"id": "record-3", "state": "closed"})
+        self.assertIsNone(cache.get("record-2", {}))
+        self.assertIsNotNone(cache.get("record-1", {}))
+        cache.invalidate("record-1")
+        self.assertIsNone(cache.get("record-1", {}))
+        self.assertIsNotNone(cache.get("record-3", {}))
+
+    def test_handler_requests_state(self):
+        requests = []
+        def describe(dxid, describe_input, **kwargs):
+            requests.append(describe_input)
+            desc = {"state": "closed", "size": 1}
+            return {field: desc[field] for field in describe_input["fields"]}
+        DXFile.set_describe_cache_size(10)
+        try:
+            dxfile = DXFile("file-" + "x"*24)
+            dxfile._describe = describe
+            for _ in range(2):
+                self.assertEqual(dxfile.describe(fields={"size"}), {"size": 1})
+            self.assertEqual([request["fields"] for request in requests], [{"size": True, "state": True}])
+        finally:
+            DXFile.set_describe_cache_size(0)
+
+class TestJSONObjectStream(unittest.TestCase):
+    def chunks(self, text, size):
+        data = text.encode('utf-8')
+        return (data[i:i + size] for i in range(0, len(data), size))
+
+    def test_stream(self):
+        response = {"length": 100, "data": [[i, "r\u00e9\"%d" % i, i * 1.5, None, True, {"a": [1]}] for i in range(100)],
+                    "next": 12345}
+        for indent in None, 2:
+            text = json.dumps(response, indent=indent)
+            for size in 1, 2, 3, 7, 4096:
+                stream = JSONObjectStream(self.chunks(text, size), "data")
+                self.assertEqual(list(stream), response["data"])
+                self.assertEqual(stream.fields, {"length": 100, "next": 12345})
+
+        stream = JSONObjectStream(self.chunks('{"data": [], "next": null}', 1), "data")
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.fields, {"next": None})
+        stream = JSONObjectStream(self.chunks(' { "data" : null } ', 1), "data")
+        self.assertEqual(list(stream), [])
+        self.assertEqual(stream.fields, {"data": None})
+
+    def test_split_at_every_offset(self):
+        response = {"data": [1.5, -2e-3, 10, 0, "x", [3.25], {"a": -7}], "z": 6.02e23, "y": -1}
+        data = json.dumps(response).encode('utf-8')
+        for i in range(len(data) + 1):
+            stream = JSONObjectStream([data[:i], data[i:]], "data")
+            self.assertEqual(list(stream), response["data"])
+            self.assertEqual(stream.fields, {"z": 6.02e23, "y": -1})
+
+    def test_invalid_input(self):
+        for text in '{"data": [1, 2', '{"data": [1, 2]', '[1]', '{"data": [1 2]}', '{"data": []} x', '{1: 2}', '':
+            with self.assertRaises(ValueError):
+                list(JSONObjectStream(self.chunks(text, 2), "data"))
+
+    def test_close(self):
+        closed = []
+        def chunks():
+            try:
+                for chunk in self.chunks(json.dumps({"data": list(range(1000))}), 10):
+                    yield chunk
+            finally:
+                closed.append(True)
+        stream = JSONObjectStream(chunks(), "data")
+        self.assertEqual(next(iter(stream)), 0)
+        stream.close()
+        self.assertEqual(closed, [True])
+
+class TestJSONCodec(unittest.TestCase):
+    def setUp(self):
+        self.backend = json_codec.BACKEND
+
+    def tearDown(self):
+        json_codec.use_backend(self.backend)
+
+    def test_codec(self):
+        rows = [[i, "chr1", i * 100, 0.1 + i, None, i % 2 == 0, "r\u00e9ad"] for i in range(100)]
+        for backend in json_codec.BACKENDS:
+            try:
+                json_codec.use_backend(backend)
+            except ImportError:
+                continue
+            self.assertEqual(json.loads(json_codec.dumps(rows)), rows)
+            self.assertEqual(json.loads(json_codec.dumps_bytes(rows).decode('utf-8')), rows)
+            # The text output must be safe to send as a request body
+            json_codec.dumps(rows).encode('ascii')
+            self.assertEqual(json_codec.loads(json.dumps(rows)), rows)
+            self.assertEqual(json_codec.loads(json.dumps(rows).encode('utf-8')), rows)
+            self.assertEqual(json.loads(json_codec.dumps({"a": [1]}, indent=2)), {"a": [1]})
+
+            # Values or input the backend may not support
+            self.assertEqual(json_codec.loads(json_codec.dumps(2**70)), 2**70)
+            self.assertEqual(json_codec.loads(json_codec.dumps({1: 2})), {"1": 2})
+            self.assertEqual(json.loads(json_codec.dumps_bytes({"a": DXRecord("record-B55ZF5kZKQGz1Xxyb5FQ0003")},
+                                                               default=exec_utils.DXJSONEncoder().default)),
+                             {"a": {"$dnanexus_link": "record-B55ZF5kZKQGz1Xxyb5FQ0003"}})
+            with self.assertRaises(TypeError):
+                json_codec.dumps(object())
+            with self.assertRaises(ValueError):
+                json_codec.loads('{"a": ')
+            self.assertEqual(list(json_codec.loads('{"b": 1, "a": 2, "c": 3}',
+                                                   object_pairs_hook=collections.OrderedDict).keys()),
+                             ["b", "a", "c"])
+
+        with self.assertRaises(ValueError):
+            json_codec.use_backend("nonexistent")
+
+class TestRequestMetrics(unittest.TestCase):
+    def make_record(self, route, seconds, **kwargs):
+        record = {"method": "POST", "route": route, "status": 200, "bytes_sent": 10, "bytes_received": 20,
+                  "seconds": seconds, "retries": 0, "wait_503_seconds": 0, "encode_seconds": 0.0,
+                  "decode_seconds": 0.0, "error": None}
+        record.update(kwargs)
+        return record
+
+    def test_normalize_route(self):
+        self.assertEqual(normalize_route("/file-B55ZF5kZKQGz1Xxyb5FQ0003/describe"), "/file-xxxx/describe")
+        self.assertEqual(normalize_route("/system/findDataObjects"), "/system/findDataObjects")
+        self.assertEqual(normalize_route(None), "")
+
+    def test_aggregation(self):
+        aggregator = RequestMetricsAggregator()
+        for i in range(1, 101):
+            aggregator(self.make_record("/file-B55ZF5kZKQGz1Xxyb5FQ000%d/describe" % (i % 2), i / 100.0))
+        aggregator(self.make_record("/system/whoami", 1.0, retries=2, error=ValueError(), status=None))
+        summary = aggregator.summary()
+        describe_stats = summary[("POST", "/file-xxxx/describe")]
+        self.assertEqual(describe_stats["count"], 100)
+        self.assertEqual(describe_stats["bytes_received"], 2000)
+        self.assertAlmostEqual(describe_stats["p50"], 0.50)
+        self.assertAlmostEqual(describe_stats["p95"], 0.95)
+        self.assertAlmostEqual(describe_stats["p99"], 0.99)
+        whoami_stats = summary[("POST", "/system/whoami")]
+        self.assertEqual((whoami_stats["errors"], whoami_stats["retries"]), (1, 2))
+        self.assertEqual(len(aggregator.format_summary().splitlines()), 3)
+
+    def test_sampling_is_bounded(self):
+        aggregator = RequestMetricsAggregator(max_samples=10)
+        for i in range(100):
+            aggregator(self.make_record("/system/whoami", 1.0))
+        self.assertEqual(len(aggregator._routes[("POST", "/system/whoami")].latencies), 10)
+        self.assertEqual(aggregator.summary()[("POST", "/system/whoami")]["p99"], 1.0)
+
 class TestDXUtils(unittest.TestCase):
     def test_dxjsonencoder(self):
         f = DXFile("file-" + "x"*24, project="project-" + "y"*24)